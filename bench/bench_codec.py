@@ -0,0 +1,110 @@
+"""Per-file cost of inbound parsing and outbound serialization, legacy path vs WorkorderCodec.
+
+Usage: PYTHONPATH=src python bench/bench_codec.py [--files 2000]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from routes.costumer_routes import WorkorderCodec, orjson
+from schemas.customer_schema import CustomerSystemWorkorderSchema
+
+
+def legacy_decode(path: str) -> CustomerSystemWorkorderSchema:
+    with open(path, "r") as json_file:
+        data = json.load(json_file)
+        return CustomerSystemWorkorderSchema(
+            orderNo=data.get("orderNo", 0),
+            isActive=data.get("isActive", True),
+            isCanceled=data.get("isCanceled", False),
+            isDeleted=data.get("isDeleted", False),
+            isDone=data.get("isDone", False),
+            isOnHold=data.get("isOnHold", False),
+            isPending=data.get("isPending", False),
+            isSynced=False,
+            summary=data.get("summary", ""),
+            creationDate=data.get("creationDate", ""),
+            lastUpdateDate=data.get("lastUpdateDate", ""),
+            deletedDate=None if "deletedDate" not in data else data.get("deletedDate", None),
+        )
+
+
+def legacy_encode(path: str, workorder: CustomerSystemWorkorderSchema) -> None:
+    with open(path, "w", encoding="utf-8") as json_file:
+        json.dump(workorder.model_dump(mode="json"), json_file, ensure_ascii=False, indent=4)
+
+
+def codec_decode(codec: WorkorderCodec, path: str) -> CustomerSystemWorkorderSchema:
+    with open(path, "rb") as json_file:
+        return codec.decode(json_file.read())
+
+
+def codec_encode(codec: WorkorderCodec, path: str, workorder: CustomerSystemWorkorderSchema) -> None:
+    with open(path, "wb") as json_file:
+        json_file.write(codec.encode(workorder))
+
+
+def write_inbound_files(directory: str, count: int) -> list[str]:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    paths = []
+    for order_no in range(1, count + 1):
+        path = os.path.join(directory, f"{order_no}.json")
+        with open(path, "w") as json_file:
+            json.dump(
+                {
+                    "orderNo": order_no,
+                    "isCanceled": False,
+                    "isDeleted": False,
+                    "isDone": order_no % 3 == 0,
+                    "isOnHold": False,
+                    "isPending": order_no % 3 == 1,
+                    "summary": f"Example workorder #{order_no}",
+                    "creationDate": (base + timedelta(minutes=order_no)).isoformat(),
+                    "lastUpdateDate": (base + timedelta(minutes=order_no, hours=1)).isoformat(),
+                    "deletedDate": None,
+                },
+                json_file,
+            )
+        paths.append(path)
+    return paths
+
+
+def measure(label: str, function, items) -> None:
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed / len(items) * 1e6:8.1f} us/file")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        inbound = write_inbound_files(directory, args.files)
+        workorders = [legacy_decode(path) for path in inbound]
+        outbound = [(os.path.join(directory, f"out-{w.orderNo}.json"), w) for w in workorders]
+
+        codecs = {"codec (pydantic-core)": WorkorderCodec(use_orjson=False)}
+        if orjson is not None:
+            codecs["codec (orjson)"] = WorkorderCodec(use_orjson=True)
+
+        print(f"Inbound parse ({args.files} files)")
+        measure("legacy json.load + schema", legacy_decode, inbound)
+        for label, codec in codecs.items():
+            measure(label, lambda path: codec_decode(codec, path), inbound)
+
+        print(f"Outbound serialization ({args.files} files)")
+        measure("legacy model_dump + json.dump", lambda item: legacy_encode(*item), outbound)
+        for label, codec in codecs.items():
+            measure(label, lambda item: codec_encode(codec, *item), outbound)
+
+
+if __name__ == "__main__":
+    main()
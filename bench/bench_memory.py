@@ -0,0 +1,76 @@
+"""Bytes per order held by each representation of a workorder.
+
+Usage: PYTHONPATH=src python bench/bench_memory.py [--records 100000]
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from payload_translator.payload_translator import PayloadTranslator
+from schemas.customer_schema import CustomerSystemWorkorderSchema
+
+SUMMARIES = ["Replace bearing", "Inspect motor", "Lubricate conveyor", "Calibrate sensor", "Check vibration"]
+
+
+def inbound_documents(count: int) -> list[bytes]:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        json.dumps({
+            "orderNo": order_no,
+            "isActive": True,
+            "isCanceled": order_no % 5 == 0,
+            "isDeleted": False,
+            "isDone": order_no % 5 == 1,
+            "isOnHold": order_no % 5 == 2,
+            "isPending": order_no % 5 == 3,
+            "isSynced": False,
+            "summary": SUMMARIES[order_no % len(SUMMARIES)],
+            "creationDate": (base + timedelta(minutes=order_no)).isoformat(),
+            "lastUpdateDate": (base + timedelta(minutes=order_no, hours=1)).isoformat(),
+            "deletedDate": None,
+        }).encode()
+        for order_no in range(count)
+    ]
+
+
+def measure(label: str, build, count: int):
+    """Build the objects while tracing allocations and report the bytes they keep alive per order."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<40} {(after - before) / count:8.0f} bytes/order")
+    return objects
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    translator = PayloadTranslator()
+    raw = inbound_documents(args.records)
+    print(f"Representations of {args.records} orders")
+    dicts = measure("raw dict (json.loads)", lambda: [json.loads(document) for document in raw], args.records)
+    customers = measure(
+        "CustomerSystemWorkorderSchema",
+        lambda: [CustomerSystemWorkorderSchema(**document) for document in dicts],
+        args.records,
+    )
+    tracos = measure(
+        "TracOSWorkorderSchema",
+        lambda: [translator.from_costumer_to_tracos(payload=customer) for customer in customers],
+        args.records,
+    )
+    measure("TracOSWorkorderSchema.model_dump()", lambda: [workorder.model_dump() for workorder in tracos], args.records)
+    records = measure("WorkorderRecord", lambda: [translator.to_record(customer) for customer in customers], args.records)
+    measure("record_to_tracos document", lambda: [translator.record_to_tracos(record) for record in records], args.records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Outbound write cost per format: one JSON file per order vs NDJSON segments (plain, gzip, zstd).
+
+Usage: PYTHONPATH=src python bench/bench_outbound.py [--orders 20000] [--batch-size 100]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import customer_workorders  # noqa: E402
+from routes.costumer_routes import IOHelper  # noqa: E402
+from routes.outbound_segments import OutboundSegmentWriter, zstandard  # noqa: E402
+from schemas.customer_schema import CustomerSystemWorkorderSchema  # noqa: E402
+
+
+def directory_usage(directory: str) -> tuple[int, int]:
+    """(files, bytes) in the directory."""
+    names = os.listdir(directory)
+    return len(names), sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+
+
+async def write_files(io_helper: IOHelper, directory: str, batches) -> None:
+    for batch in batches:
+        await io_helper.write_many([(os.path.join(directory, f"{workorder.orderNo}.json"), workorder) for workorder in batch])
+
+
+async def append_segments(io_helper: IOHelper, writer: OutboundSegmentWriter, batches) -> None:
+    for batch in batches:
+        await io_helper.append_ndjson(writer, batch)
+    await io_helper.seal_segment(writer)
+
+
+async def run_benchmark(args) -> None:
+    workorders = [CustomerSystemWorkorderSchema(**document) for document in customer_workorders(args.orders, args.seed)]
+    batches = [workorders[index:index + args.batch_size] for index in range(0, len(workorders), args.batch_size)]
+    io_helper = IOHelper()
+    formats = ["json files", "ndjson", "ndjson gzip"] + (["ndjson zstd"] if zstandard is not None else [])
+
+    print(f"{args.orders} orders, batches of {args.batch_size}")
+    print(f"{'format':<14} {'orders/s':>10} {'files':>8} {'MB':>8}")
+    for name in formats:
+        directory = tempfile.mkdtemp(prefix="tracos-outbound-")
+        try:
+            start = time.perf_counter()
+            if name == "json files":
+                await write_files(io_helper, directory, batches)
+            else:
+                compression = name.split()[1] if " " in name else "none"
+                await append_segments(io_helper, OutboundSegmentWriter(directory, compression=compression), batches)
+            elapsed = time.perf_counter() - start
+            files, size = directory_usage(directory)
+            print(f"{name:<14} {args.orders / elapsed:10.0f} {files:8d} {size / 1024 / 1024:8.2f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    IOHelper.shutdown_executor()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
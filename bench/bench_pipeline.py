@@ -0,0 +1,192 @@
+"""Per-stage throughput, latency percentiles and peak RSS of the sync pipeline on seeded data.
+
+Usage: PYTHONPATH=src python bench/bench_pipeline.py [--orders 1000] [--seed 42]
+       [--backend mongomock|mongod] [--concurrency 16] [--chunk-size 10000] [--json results.json]
+
+The orders flow through the stages chunk by chunk (read, translate, insert,
+query, write, mark-synced, then mark-synced again with one update_many per
+batch, whose latencies are per update_many call), so 1M orders fit in memory.
+`mongomock` needs the mongomock-motor package; `mongod` uses MONGO_URI and a
+separate database (--database).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import customer_workorders, tracos_workorders, write_inbound_files  # noqa: E402
+
+STAGES = ("read", "translate", "insert", "query", "write", "mark-synced", "mark-synced (batched)")
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies = array("d")
+        self.elapsed = 0.0
+        self.orders = 0
+        self.peak_rss_mb = 0.0
+
+    def report(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "orders": self.orders,
+            "throughput": self.orders / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the process so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def timed_stage(stats: StageStats, items: list, call, concurrency: int, orders: int | None = None) -> list:
+    """Run `call` on every item with bounded concurrency, recording each call's latency."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            start = time.perf_counter()
+            result = call(item)
+            if asyncio.iscoroutine(result):
+                result = await result
+            stats.latencies.append(time.perf_counter() - start)
+            return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(item) for item in items))
+    stats.elapsed += time.perf_counter() - start
+    stats.orders += len(items) if orders is None else orders
+    stats.peak_rss_mb = peak_rss_mb()
+    return results
+
+
+def make_client(backend: str):
+    if backend == "mongomock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("The mongomock backend needs the mongomock-motor package (pip install mongomock-motor).")
+        return AsyncMongoMockClient()
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+
+
+async def run_benchmark(args) -> dict[str, dict]:
+    from payload_translator.payload_translator import PayloadTranslator
+    from routes.costumer_routes import CostumerERPRoute, IOHelper
+    from services.tracos_service import TracOsService
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="tracos-bench-")
+    inbound_dir = os.path.join(workdir, "inbound")
+    outbound_dir = os.path.join(workdir, "outbound")
+    os.makedirs(outbound_dir, exist_ok=True)
+    os.environ["DATA_INBOUND_DIR"] = inbound_dir
+    os.environ["DATA_OUTBOUND_DIR"] = outbound_dir
+    os.environ["MONGO_DATABASE"] = args.database
+
+    print(f"Generating {args.orders} inbound files in {inbound_dir} (seed {args.seed})...")
+    write_inbound_files(inbound_dir, customer_workorders(args.orders, args.seed))
+
+    tracos_service = TracOsService(client=make_client(args.backend))
+    await tracos_service.collection.drop()
+    await tracos_service.ensure_indexes()
+    print(f"Loading {args.orders} seeded TracOS documents...")
+    seeded = list(tracos_workorders(args.orders, args.seed, start=args.orders + 1))
+    for start in range(0, len(seeded), args.chunk_size):
+        await tracos_service.collection.insert_many(seeded[start:start + args.chunk_size])
+    del seeded
+
+    route = CostumerERPRoute(tracos_service=tracos_service)
+    translator = PayloadTranslator()
+    stats = {stage: StageStats() for stage in STAGES}
+    ack_batch_size = int(os.getenv("SYNC_ACK_BATCH_SIZE", "500"))
+    try:
+        for start in range(1, args.orders + 1, args.chunk_size):
+            numbers = list(range(start, min(start + args.chunk_size, args.orders + 1)))
+            customers = await timed_stage(stats["read"], numbers, route.get_costumer_workorder_by_order_number, args.concurrency)
+            tracos = await timed_stage(
+                stats["translate"], customers, lambda payload: translator.from_costumer_to_tracos(payload=payload), 1
+            )
+            # Customer "deleted" orders have no Tracos status and are dropped by the translator.
+            tracos = [workorder for workorder in tracos if workorder is not None]
+            numbers = [workorder.number for workorder in tracos]
+            await timed_stage(stats["insert"], tracos, tracos_service.upsert_workorder, args.concurrency)
+            queried = await timed_stage(stats["query"], numbers, tracos_service.get_workorder_by_number, args.concurrency)
+            await timed_stage(
+                stats["write"],
+                queried,
+                lambda workorder: route.IOHelper.write_json(
+                    file_path=os.path.join(outbound_dir, f"{workorder.number}.json"),
+                    data=translator.from_tracos_to_costumer(payload=workorder),
+                ),
+                args.concurrency,
+            )
+            await timed_stage(stats["mark-synced"], numbers, tracos_service.update_workorder, args.concurrency)
+            # Unsynced again (untimed), so the batched variant performs the same real writes.
+            await tracos_service.collection.update_many(
+                {"number": {"$in": numbers}}, {"$set": {"isSynced": False, "syncedAt": None}}
+            )
+            acks = [(workorder.number, workorder.updatedAt) for workorder in tracos]
+            batches = [acks[index:index + ack_batch_size] for index in range(0, len(acks), ack_batch_size)]
+            await timed_stage(
+                stats["mark-synced (batched)"], batches, tracos_service.mark_workorders_synced, args.concurrency,
+                orders=len(numbers),
+            )
+            del customers, tracos, queried
+    finally:
+        await tracos_service.collection.drop()
+        IOHelper.shutdown_executor()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {stage: stage_stats.report() for stage, stage_stats in stats.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000, help="e.g. 1000, 100000 or 1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("mongomock", "mongod"), default="mongomock")
+    parser.add_argument("--database", default="tractian_bench", help="Database used (and dropped) by the benchmark.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workdir", default=None, help="Folder for the generated files (a temp folder by default).")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated files.")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"\n{args.orders} orders, backend {args.backend}, concurrency {args.concurrency}")
+    print(f"{'stage':<24} {'orders/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for stage, report in results.items():
+        print(
+            f"{stage:<24} {report['throughput']:10.0f} {report['p50_ms']:9.3f} "
+            f"{report['p99_ms']:9.3f} {report['peak_rss_mb']:12.1f}"
+        )
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump({"orders": args.orders, "seed": args.seed, "backend": args.backend, "stages": results}, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
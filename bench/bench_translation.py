@@ -0,0 +1,85 @@
+"""Per-record vs batch translation cost in PayloadTranslator.
+
+Usage: PYTHONPATH=src python bench/bench_translation.py [--records 20000]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from payload_translator.payload_translator import PayloadTranslator
+from schemas.customer_schema import CustomerSystemWorkorderSchema
+from schemas.tracos_schema import TracOSWorkorderSchema
+
+STATUSES = ["pending", "in_progress", "completed", "on_hold", "cancelled"]
+
+
+def customer_workorders(count: int) -> list[CustomerSystemWorkorderSchema]:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        CustomerSystemWorkorderSchema(
+            orderNo=order_no,
+            isActive=True,
+            isCanceled=order_no % 5 == 0,
+            isDeleted=False,
+            isDone=order_no % 5 == 1,
+            isOnHold=order_no % 5 == 2,
+            isPending=order_no % 5 == 3,
+            isSynced=False,
+            summary=f"Example workorder #{order_no}",
+            creationDate=base + timedelta(minutes=order_no),
+            lastUpdateDate=base + timedelta(minutes=order_no, hours=1),
+        )
+        for order_no in range(count)
+    ]
+
+
+def tracos_workorders(count: int) -> list[TracOSWorkorderSchema]:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        TracOSWorkorderSchema(
+            _id=ObjectId(),
+            number=number,
+            status=STATUSES[number % len(STATUSES)],
+            title=f"Workorder {number}",
+            description=f"Example workorder #{number}",
+            createdAt=base + timedelta(minutes=number),
+            updatedAt=base + timedelta(minutes=number, hours=1),
+        )
+        for number in range(count)
+    ]
+
+
+def measure(label: str, function, count: int, repeat: int = 5) -> None:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    elapsed = min(timings)
+    print(f"{label:<40} {elapsed / count * 1e6:8.2f} us/record")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    translator = PayloadTranslator()
+    customers = customer_workorders(args.records)
+    tracos = tracos_workorders(args.records)
+
+    print(f"Customer -> TracOS ({args.records} records)")
+    measure("from_costumer_to_tracos (per record)", lambda: [translator.from_costumer_to_tracos(payload=p) for p in customers], args.records)
+    measure("translate_batch_to_tracos", lambda: translator.translate_batch_to_tracos(customers), args.records)
+    measure("translate_batch_to_tracos (columnar)", lambda: translator.translate_batch_to_tracos(customers, columnar=True), args.records)
+
+    print(f"TracOS -> Customer ({args.records} records)")
+    measure("from_tracos_to_costumer (per record)", lambda: [translator.from_tracos_to_costumer(payload=p) for p in tracos], args.records)
+    measure("translate_batch_to_customer", lambda: translator.translate_batch_to_customer(tracos), args.records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Deterministic synthetic workorders: inbound customer files and TracOS documents.
+
+Usage: python bench/datagen.py --orders 100000 [--seed 42] [--inbound-dir data/bench/inbound]
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+from bson import ObjectId
+
+BASE_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Rough mix of a maintenance backlog: most orders open or done, few on hold,
+# cancelled or deleted.
+CUSTOMER_STATUS_WEIGHTS = {
+    "pending": 30,
+    "in_progress": 25,
+    "completed": 30,
+    "on_hold": 8,
+    "cancelled": 5,
+    "deleted": 2,
+}
+TRACOS_STATUS_WEIGHTS = {"pending": 30, "in_progress": 25, "completed": 32, "on_hold": 8, "cancelled": 5}
+DELETED_TRACOS_RATIO = 0.02
+
+SUMMARIES = [
+    "Replace worn bearing on conveyor {n}",
+    "Inspect motor {n} for abnormal vibration",
+    "Lubricate gearbox of line {n}",
+    "Calibrate pressure sensor {n}",
+    "Clean cooling fan of compressor {n}",
+    "Tighten loose belt on pump {n}",
+]
+
+
+def _pick(rng: random.Random, weights: dict[str, int]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def customer_workorders(count: int, seed: int = 42, start: int = 1) -> Iterator[dict]:
+    """Inbound customer workorders numbered start..start+count-1, identical for a given seed."""
+    rng = random.Random(seed)
+    for order_no in range(start, start + count):
+        status = _pick(rng, CUSTOMER_STATUS_WEIGHTS)
+        created = BASE_DATE + timedelta(minutes=rng.randrange(0, 60 * 24 * 180), microseconds=rng.randrange(1_000_000))
+        updated = created + timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+        yield {
+            "orderNo": order_no,
+            "isActive": True,
+            "isCanceled": status == "cancelled",
+            "isDeleted": status == "deleted",
+            "isDone": status == "completed",
+            "isOnHold": status == "on_hold",
+            "isPending": status == "pending",
+            "isSynced": False,
+            "summary": rng.choice(SUMMARIES).format(n=rng.randrange(1, 500)),
+            "creationDate": created.isoformat(),
+            "lastUpdateDate": updated.isoformat(),
+            "deletedDate": updated.isoformat() if status == "deleted" else None,
+        }
+
+
+def tracos_workorders(count: int, seed: int = 42, start: int = 1) -> Iterator[dict]:
+    """TracOS documents numbered start..start+count-1, all waiting to be synced."""
+    rng = random.Random(seed + 1)
+    for number in range(start, start + count):
+        created = BASE_DATE + timedelta(minutes=rng.randrange(0, 60 * 24 * 180))
+        updated = created + timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+        deleted = rng.random() < DELETED_TRACOS_RATIO
+        yield {
+            "_id": ObjectId(rng.randbytes(12)),
+            "number": number,
+            "status": _pick(rng, TRACOS_STATUS_WEIGHTS),
+            "title": f"Example workorder #{number}",
+            "description": rng.choice(SUMMARIES).format(n=rng.randrange(1, 500)),
+            "createdAt": created,
+            "updatedAt": updated,
+            "deleted": deleted,
+            "deletedAt": updated if deleted else None,
+            "isSynced": False,
+            "syncedAt": None,
+        }
+
+
+def write_inbound_files(directory: str, workorders) -> int:
+    """Write each workorder to `{orderNo}.json` in the directory and return how many were written."""
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for workorder in workorders:
+        with open(os.path.join(directory, f"{workorder['orderNo']}.json"), "w") as json_file:
+            json.dump(workorder, json_file)
+        written += 1
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--inbound-dir", default="data/bench/inbound")
+    args = parser.parse_args()
+
+    written = write_inbound_files(args.inbound_dir, customer_workorders(args.orders, args.seed))
+    print(f"Wrote {written} inbound workorders to {args.inbound_dir} (seed {args.seed}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,758 @@
 """Entrypoint for the application."""
 
+import argparse
 import asyncio
+import os
+import signal
+from contextlib import nullcontext
 
-from routes.costumer_routes import CostumerERPRoute
+from routes.costumer_routes import CostumerERPRoute, IOHelper
+from routes.inbound_discovery import InboundDiscovery
+from routes.inbound_watcher import InboundWatcher
 from payload_translator.payload_translator import PayloadTranslator
-from services.tracos_service import TracOsService
+from services.tracos_service import QueryPlanError, TracOsService
+from services.sync_ack_buffer import SyncAckBuffer
+from services.mongo_client import close_mongo_client, get_mongo_client
+from services.sync_state_service import SyncStateService
+from services.workorder_cache import WorkorderCache, as_stored
+from services.resilience import retry_counts
+from services.dead_letter_store import DeadLetterStore
+from pipeline.pipeline_runner import SKIPPED, PipelineRunner, PipelineSummary, StageLimiter
+from pipeline.checkpoints import OrderedCheckpoint
+from pipeline.outbound_watcher import OutboundWatcher
+from pipeline.staged_pipeline import Stage, StagedPipeline
+from pipeline.sharding import Shard, run_shards
+from observability.metrics import metrics
+
+async def dead_letter(dead_letters, order_no: int, stage: str, error: str, payload=None):
+    if dead_letters is not None:
+        await dead_letters.record(order_no, stage, error, payload)
+
+
+async def process_workorder(order_no: int, costumer_route, payload_translator, tracos_service, stage_limiter=None, dead_letters=None, skip_unchanged=True):
+    """Process a single workorder through the complete pipeline, dead-lettering it if it fails."""
+    try:
+        return await _process_workorder(
+            order_no, costumer_route, payload_translator, tracos_service, stage_limiter, dead_letters, skip_unchanged
+        )
+    except Exception as e:
+        await dead_letter(dead_letters, order_no, "process", repr(e))
+        raise
+
+
+async def _process_workorder(order_no: int, costumer_route, payload_translator, tracos_service, stage_limiter, dead_letters, skip_unchanged):
+    def stage(name: str):
+        return stage_limiter.stage(name) if stage_limiter else nullcontext()
 
-async def process_workorder(order_no: int, costumer_route, payload_translator, tracos_service):
-    """Process a single workorder through the complete pipeline."""
-    
     print(f"\n--- Processing workorder {order_no} ---")
-    
 
-    costumer_workorder = await costumer_route.get_costumer_workorder_by_order_number(order_no)
+
+    async with stage("read"):
+        costumer_workorder = await costumer_route.get_costumer_workorder_by_order_number(order_no)
     if not costumer_workorder:
         print(f"Workorder {order_no} not found in customer system.")
+        await dead_letter(dead_letters, order_no, "read", "Not found or invalid in the customer system")
         return False
 
+    if skip_unchanged:
+        async with stage("mongo"):
+            fingerprints = await tracos_service.get_sync_fingerprints([order_no])
+        if payload_translator.is_unchanged(costumer_workorder, fingerprints.get(order_no)):
+            print(f"Workorder {order_no} unchanged since the last sync, skipping.")
+            return SKIPPED
 
-    tracos_payload = payload_translator.from_costumer_to_tracos(payload=costumer_workorder)
+    with metrics.timer("stage_seconds", stage="translate"):
+        tracos_payload = payload_translator.from_costumer_to_tracos(payload=costumer_workorder)
     if not tracos_payload:
         print(f"Failed to translate customer workorder {order_no} to Tracos format.")
+        await dead_letter(dead_letters, order_no, "translate", "No Tracos translation", costumer_workorder)
         return False
 
-    inserted_workorder = await tracos_service.insert_workorder(tracos_payload)
-    if not inserted_workorder:
+    async with stage("mongo"):
+        stored_workorder = await tracos_service.upsert_workorder(tracos_payload)
+    if not stored_workorder:
         print(f"Failed to insert workorder {order_no} into Tracos (MongoDB).")
+        await dead_letter(dead_letters, order_no, "upsert", "Upsert into Tracos failed", costumer_workorder)
         return False
 
+    if tracos_service.sample_for_verification([stored_workorder]):
+        async with stage("mongo"):
+            stored_workorder = (await tracos_service.verify_workorders([stored_workorder])).get(order_no)
+        if not stored_workorder:
+            print(f"Workorder {order_no} not found in Tracos (MongoDB).")
+            await dead_letter(dead_letters, order_no, "query", "Not found in Tracos after the upsert", costumer_workorder)
+            return False
 
-    queried_workorder = await tracos_service.get_workorder_by_number(order_no)
-    if not queried_workorder:
-        print(f"Workorder {order_no} not found in Tracos (MongoDB).")
-        return False
+    if await export_workorder(stored_workorder, costumer_route, payload_translator, stage_limiter):
+        print(f"Workorder {order_no} processed and recorded in outbound folder.")
+        return True
+    await dead_letter(dead_letters, order_no, "export", "Writing the outbound file failed", costumer_workorder)
+    return False
 
 
-    translated_costumer_workorder = payload_translator.from_tracos_to_costumer(payload=queried_workorder)
+async def read_tracos_workorders(order_numbers, costumer_route, payload_translator, tracos_service, summary, chunk_size: int, dead_letters=None):
+    """Read and translate changed inbound workorders in concurrent chunks, yielding TracOS documents.
 
-    result = await costumer_route.post_costumer_workorder(translated_costumer_workorder)
-    if result:
-        print(f"Workorder {order_no} processed and recorded in outbound folder.")
-        return True
+    Each chunk is packed into compact records as soon as it is read, so only
+    the records and the TracOS documents of the chunk are kept alive.
+    """
+
+    async def read_chunk(chunk):
+        workorders = await costumer_route.get_costumer_workorders_by_order_numbers(chunk)
+        records = []
+        for order_no, costumer_workorder in zip(chunk, workorders):
+            if not costumer_workorder:
+                print(f"Workorder {order_no} not found in customer system.")
+                summary.record(False, order_no)
+                await dead_letter(dead_letters, order_no, "read", "Not found or invalid in the customer system")
+                continue
+            records.append(payload_translator.to_record(costumer_workorder))
+        del workorders
+        fingerprints = await tracos_service.get_sync_fingerprints([record.number for record in records])
+        for record in records:
+            if payload_translator.is_record_unchanged(record, fingerprints.get(record.number)):
+                summary.record(SKIPPED, record.number)
+                continue
+            tracos_document = payload_translator.record_to_tracos(record)
+            if not tracos_document:
+                print(f"Failed to translate customer workorder {record.number} to Tracos format.")
+                summary.record(False, record.number)
+                await dead_letter(dead_letters, record.number, "translate", "No Tracos translation", record.to_customer())
+                continue
+            yield tracos_document
+
+    chunk = []
+    if hasattr(order_numbers, "__aiter__"):
+        async for order_no in order_numbers:
+            chunk.append(order_no)
+            if len(chunk) >= chunk_size:
+                async for tracos_document in read_chunk(chunk):
+                    yield tracos_document
+                chunk = []
     else:
-        print(f"Failed to record workorder {order_no} in outbound folder.")
+        for order_no in order_numbers:
+            chunk.append(order_no)
+            if len(chunk) >= chunk_size:
+                async for tracos_document in read_chunk(chunk):
+                    yield tracos_document
+                chunk = []
+    if chunk:
+        async for tracos_document in read_chunk(chunk):
+            yield tracos_document
+
+
+async def ingest_workorders_in_bulk(order_numbers, costumer_route, payload_translator, tracos_service, concurrency: int, batch_size=None, dead_letters=None):
+    """Ingest inbound workorders into TracOS with batched bulk upserts."""
+    summary = PipelineSummary()
+    results = await tracos_service.bulk_upsert_workorders(
+        read_tracos_workorders(
+            order_numbers, costumer_route, payload_translator, tracos_service, summary, concurrency, dead_letters
+        ),
+        batch_size=batch_size,
+    )
+    status_counts = {}
+    for result in results:
+        status_counts[result.status] = status_counts.get(result.status, 0) + 1
+        if result.status == "error":
+            print(f"Failed to upsert workorder {result.number} into Tracos (MongoDB): {result.error}")
+            await dead_letter(dead_letters, result.number, "upsert", result.error or "Bulk upsert failed")
+        summary.record(result.status != "error", result.number)
+    print(f"Bulk upsert results: {status_counts}")
+    return summary
+
+
+async def sync_workorders_in_stages(order_numbers, costumer_route, payload_translator, tracos_service, concurrency=None, dead_letters=None, summary=None):
+    """Sync inbound workorders through independent read, translate, mongo and write stages.
+
+    Each stage has its own workers and batch size (PIPELINE_<STAGE>_CONCURRENCY
+    and PIPELINE_<STAGE>_BATCH_SIZE), so files are read while earlier orders
+    are being upserted or written. The fingerprint lookup, the upsert and the
+    synced acknowledgement each cost one call per batch, and every batch is
+    translated in one pass each way (`translate_batch_to_tracos` /
+    `translate_batch_to_customer`). Upserted orders are exported without being
+    read back, except the TRACOS_VERIFY_SAMPLE_RATE share checked by one find
+    per batch.
+    """
+    read_concurrency = concurrency or int(os.getenv("PIPELINE_CONCURRENCY", "16"))
+
+    async def read(order_nos, summary):
+        workorders = await costumer_route.get_costumer_workorders_by_order_numbers(order_nos)
+        read_workorders = []
+        for order_no, costumer_workorder in zip(order_nos, workorders):
+            if not costumer_workorder:
+                print(f"Workorder {order_no} not found in customer system.")
+                summary.record(False, order_no)
+                await dead_letter(dead_letters, order_no, "read", "Not found or invalid in the customer system")
+            else:
+                read_workorders.append(costumer_workorder)
+        return read_workorders
+
+    async def translate(costumer_workorders, summary):
+        fingerprints = await tracos_service.get_sync_fingerprints(
+            [costumer_workorder.orderNo for costumer_workorder in costumer_workorders]
+        )
+        changed = []
+        for costumer_workorder in costumer_workorders:
+            order_no = costumer_workorder.orderNo
+            if payload_translator.is_unchanged(costumer_workorder, fingerprints.get(order_no)):
+                print(f"Workorder {order_no} unchanged since the last sync, skipping.")
+                summary.record(SKIPPED, order_no)
+                continue
+            changed.append(costumer_workorder)
+        translated = []
+        for costumer_workorder, tracos_payload in zip(changed, payload_translator.translate_batch_to_tracos(changed)):
+            order_no = costumer_workorder.orderNo
+            if not tracos_payload:
+                print(f"Failed to translate customer workorder {order_no} to Tracos format.")
+                summary.record(False, order_no)
+                await dead_letter(dead_letters, order_no, "translate", "No Tracos translation", costumer_workorder)
+                continue
+            translated.append((costumer_workorder, tracos_payload))
+        return translated
+
+    async def upsert(pairs, summary):
+        results = await tracos_service.bulk_upsert_workorders([tracos_payload for _, tracos_payload in pairs])
+        errors = {result.number: result.error for result in results if result.status == "error"}
+        upserted = []
+        for costumer_workorder, tracos_payload in pairs:
+            if tracos_payload.number in errors:
+                print(f"Failed to insert workorder {tracos_payload.number} into Tracos (MongoDB): {errors[tracos_payload.number]}")
+                summary.record(False, tracos_payload.number)
+                await dead_letter(dead_letters, tracos_payload.number, "upsert", errors[tracos_payload.number] or "Upsert into Tracos failed", costumer_workorder)
+            else:
+                # The stored fields are the upserted ones; only the _id of an updated workorder
+                # differs, and neither the verification nor the outbound translation uses it.
+                upserted.append((costumer_workorder, as_stored(tracos_payload, isSynced=False, syncedAt=None)))
+        sampled = tracos_service.sample_for_verification([stored_workorder for _, stored_workorder in upserted])
+        if not sampled:
+            return upserted
+        verified = await tracos_service.verify_workorders(sampled)
+        sampled_numbers = {workorder.number for workorder in sampled}
+        checked = []
+        for costumer_workorder, stored_workorder in upserted:
+            order_no = costumer_workorder.orderNo
+            if order_no in sampled_numbers:
+                stored_workorder = verified.get(order_no)
+                if stored_workorder is None:
+                    print(f"Workorder {order_no} not found in Tracos (MongoDB).")
+                    summary.record(False, order_no)
+                    await dead_letter(dead_letters, order_no, "query", "Not found in Tracos after the upsert", costumer_workorder)
+                    continue
+            checked.append((costumer_workorder, stored_workorder))
+        return checked
+
+    async def write(pairs, summary):
+        results = await costumer_route.post_costumer_workorders(
+            payload_translator.translate_batch_to_customer([stored_workorder for _, stored_workorder in pairs])
+        )
+        for (costumer_workorder, _), result in zip(pairs, results):
+            order_no = costumer_workorder.orderNo
+            if not result:
+                print(f"Failed to record workorder {order_no} in outbound folder.")
+                summary.record(False, order_no)
+                await dead_letter(dead_letters, order_no, "export", "Writing the outbound file failed", costumer_workorder)
+                continue
+            print(f"Workorder {order_no} processed and recorded in outbound folder.")
+            summary.record(True, order_no)
+        return ()
+
+    def dead_letter_batch(stage_name, number_of):
+        async def on_error(batch, error):
+            for item in batch:
+                await dead_letter(dead_letters, number_of(item), stage_name, repr(error))
+        return on_error
+
+    def order_no_of(costumer_workorder):
+        return costumer_workorder.orderNo
+
+    def order_no_of_pair(pair):
+        return pair[0].orderNo
+
+    pipeline = StagedPipeline([
+        Stage.from_env("read", read, concurrency=read_concurrency, batch_size=1,
+                       on_error=dead_letter_batch("read", int)),
+        Stage.from_env("translate", translate, concurrency=1, batch_size=100, number_of=order_no_of,
+                       on_error=dead_letter_batch("translate", order_no_of)),
+        Stage.from_env("mongo", upsert, concurrency=4, batch_size=200, number_of=order_no_of_pair,
+                       on_error=dead_letter_batch("upsert", order_no_of_pair)),
+        Stage.from_env("write", write, concurrency=4, batch_size=100, number_of=order_no_of_pair,
+                       on_error=dead_letter_batch("export", order_no_of_pair)),
+    ])
+    return await pipeline.run(order_numbers, summary)
+
+
+async def export_workorder(tracos_workorder, costumer_route, payload_translator, stage_limiter=None):
+    """Translate a TracOS workorder and record it in the outbound folder."""
+    translated_costumer_workorder = payload_translator.from_tracos_to_costumer(payload=tracos_workorder)
+    async with (stage_limiter.stage("write") if stage_limiter else nullcontext()):
+        result = await costumer_route.post_costumer_workorder(translated_costumer_workorder)
+    if not result:
+        print(f"Failed to record workorder {tracos_workorder.number} in outbound folder.")
         return False
+    return True
 
-async def main():
 
-    costumer_route = CostumerERPRoute()
-    payload_translator = PayloadTranslator()
-    tracos_service = TracOsService()
+async def export_unsynced_workorders(costumer_route, payload_translator, tracos_service, sync_state, concurrency=None, stage_limiter=None, batch_size=None, resume=True):
+    """Stream every unsynced TracOS workorder to the outbound folder.
+
+    The position of the last workorder below which everything was exported
+    is saved as the "outbound" checkpoint every SYNC_CHECKPOINT_INTERVAL
+    workorders, so an interrupted export resumes right after it. The
+    checkpoint is cleared once the whole stream was exported.
+    """
+    checkpoint = await sync_state.get_checkpoint("outbound") if resume else None
+    after_id = checkpoint["_id"] if checkpoint else None
+    if after_id is not None:
+        print(f"Resuming the outbound export after workorder _id {after_id}...")
+    else:
+        print("Exporting unsynced workorders to the outbound folder...")
 
+    tracker = OrderedCheckpoint()
+    save_lock = asyncio.Lock()
+    checkpoint_interval = int(os.getenv("SYNC_CHECKPOINT_INTERVAL", "1000"))
 
-    workorder_numbers = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-    
-    print(f"Starting to process {len(workorder_numbers)} workorders...")
- 
-    successful_count = 0
-    failed_count = 0
-    
-    for order_no in workorder_numbers:
+    async def positioned_workorders():
+        async for tracos_workorder in tracos_service.iter_unsynced_workorders(batch_size=batch_size, after_id=after_id):
+            position = {"_id": tracos_workorder.id, "updatedAt": tracos_workorder.updatedAt}
+            yield tracker.register(position), tracos_workorder
+
+    async def export(item):
+        sequence, tracos_workorder = item
         try:
-            success = await process_workorder(order_no, costumer_route, payload_translator, tracos_service)
-            if success:
-                successful_count += 1
-            else:
-                failed_count += 1
-        except Exception as e:
-            print(f"Error processing workorder {order_no}: {str(e)}")
-            failed_count += 1
+            return await export_workorder(tracos_workorder, costumer_route, payload_translator, stage_limiter)
+        finally:
+            tracker.complete(sequence)
+            if tracker.advanced_since_save >= checkpoint_interval:
+                async with save_lock:
+                    if tracker.advanced_since_save >= checkpoint_interval:
+                        tracker.advanced_since_save = 0
+                        await sync_state.save_checkpoint("outbound", tracker.position)
+
+    runner = PipelineRunner(process=export, concurrency=concurrency, flow="outbound")
+    summary = await runner.run(positioned_workorders())
+    await sync_state.clear_checkpoint("outbound")
+    print(f"Exported {summary.successful} workorders, {summary.failed} failed.")
+    return summary
+
+
+async def replay_dead_letters(dead_letters, costumer_route, payload_translator, tracos_service, concurrency=None, stage_limiter=None):
+    """Reprocess only the dead-lettered workorders, then drop the ones that went through from the store.
+
+    Orders are read again from the inbound folder and pushed through the
+    pipeline even if they look unchanged; orders failing again are
+    dead-lettered with their new error.
+    """
+    pending = dead_letters.pending()
+    if not pending:
+        print(f"No dead-lettered workorders in {dead_letters.path}.")
+        return PipelineSummary()
+    print(f"Replaying {len(pending)} dead-lettered workorders from {dead_letters.path}...")
+
+    replayed = []
+
+    async def replay(order_no):
+        outcome = await process_workorder(
+            order_no, costumer_route, payload_translator, tracos_service, stage_limiter,
+            dead_letters=dead_letters, skip_unchanged=False,
+        )
+        if outcome:
+            replayed.append(order_no)
+        return outcome
+
+    runner = PipelineRunner(process=replay, concurrency=concurrency)
+    summary = await runner.run(sorted(pending))
+    remaining = dead_letters.resolve(replayed)
+    print(f"{len(replayed)} workorders replayed, {remaining} still dead-lettered.")
+    return summary
+
+
+def inbound_failures_recovered(summary: PipelineSummary, dead_letters) -> bool:
+    """Whether every failed inbound workorder is in the dead-letter store, so the discovery watermark may advance.
+
+    Failures are matched by orderNo: a failure recorded without one, or whose
+    dead letter could not be written, holds the watermark back.
+    """
+    return summary.failed_numbers <= dead_letters.recorded_numbers
+
+
+async def commit_inbound_when_drained(watcher, summary: PipelineSummary, dead_letters, interval: float | None = None):
+    """Save the discovery watermark of --watch-inbound every time the orders yielded so far were all processed.
 
+    Runs until cancelled, checking every INBOUND_COMMIT_INTERVAL seconds, so a
+    killed daemon only rescans what changed since its last drained batch.
+    """
+    interval = interval or float(os.getenv("INBOUND_COMMIT_INTERVAL", "5"))
+    committed = 0
+    while True:
+        await asyncio.sleep(interval)
+        if (
+            watcher.idle
+            and watcher.yielded != committed
+            and summary.total == watcher.yielded
+            and inbound_failures_recovered(summary, dead_letters)
+        ):
+            watcher.discovery.commit()
+            committed = watcher.yielded
+
+
+async def seal_expired_segments(costumer_route):
+    """Seal the NDJSON segment of a watch mode every time it gets OUTBOUND_SEGMENT_MAX_AGE seconds old.
+
+    Runs until cancelled. Without it a quiet daemon would keep its last
+    segment, and with fsync the acknowledgements of its workorders, until it
+    stops.
+    """
+    writer = costumer_route.segment_writer
+    if writer is None or writer.max_age <= 0:
+        return
+    while True:
+        await asyncio.sleep(writer.max_age / 2)
+        await costumer_route.seal_expired_segment()
+
+
+async def cancel_task(task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def stop_on_signals() -> asyncio.Event:
+    """Return an event that is set on SIGINT or SIGTERM, for the long-running modes."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    return stop_event
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Synchronize workorders between the customer ERP and TracOS.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Number of workorders processed concurrently (defaults to PIPELINE_CONCURRENCY or 16).",
+    )
+    parser.add_argument(
+        "--order-numbers",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Process only these order numbers instead of discovering new or changed inbound files.",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Ingest inbound workorders with batched bulk upserts, then export every unsynced workorder.",
+    )
+    parser.add_argument(
+        "--export",
+        action="store_true",
+        help="Only export unsynced TracOS workorders to the outbound folder.",
+    )
+    parser.add_argument(
+        "--diagnose",
+        action="store_true",
+        help="Ensure the workorder indexes and fail if any service query falls back to a collection scan.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Workorders per bulk write in --bulk mode (defaults to MONGO_BULK_BATCH_SIZE or 1000).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rescan every inbound file, ignoring the discovery watermark, and ignore the outbound resume position.",
+    )
+    parser.add_argument(
+        "--watch-outbound",
+        action="store_true",
+        help="Keep running and export TracOS workorders as soon as they change, until interrupted.",
+    )
+    parser.add_argument(
+        "--watch-inbound",
+        action="store_true",
+        help="Keep running and process inbound files as soon as they are created or modified, until interrupted.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Only reprocess the workorders recorded in the dead-letter store (DEAD_LETTER_PATH) by earlier runs.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Shard the inbound workorders by orderNo %% N across N processes (defaults to 1, no sharding).",
+    )
+    parser.add_argument(
+        "--metrics-output",
+        default=None,
+        help="Enable metrics and write them to this file at the end of the run (.json for a JSON summary, else Prometheus text).",
+    )
+    args = parser.parse_args(argv)
+    if args.watch_inbound and (args.bulk or args.order_numbers):
+        parser.error("--watch-inbound cannot be combined with --bulk or --order-numbers")
+    if args.replay and (args.bulk or args.export or args.order_numbers or args.watch_inbound or args.watch_outbound):
+        parser.error("--replay cannot be combined with --bulk, --export, --order-numbers or the watch modes")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and (args.export or args.diagnose or args.watch_outbound or args.watch_inbound or args.replay):
+        parser.error("--workers only applies to the inbound sync (optionally with --order-numbers or --bulk)")
+    return args
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    configure_metrics(args)
+    try:
+        if args.workers > 1:
+            await run_sharded(args)
+        else:
+            await run(args)
+    finally:
+        close_mongo_client()
+        IOHelper.shutdown_executor()
+        export_metrics()
+
+
+def configure_metrics(args: argparse.Namespace, shard: Shard | None = None):
+    """Enable metrics for --metrics-output; every shard process writes a file of its own."""
+    if not args.metrics_output:
+        return
+    output_path = args.metrics_output
+    if shard is not None:
+        root, extension = os.path.splitext(output_path)
+        output_path = f"{root}.{shard.suffix}{extension}"
+    metrics.configure(enabled=True, output_path=output_path)
+
+
+def export_metrics():
+    path = metrics.export()
+    if path:
+        print(f"Metrics written to {path}")
+
+
+def run_shard(args: argparse.Namespace, shard: Shard) -> tuple[int, int, int, int]:
+    """Entry point of a --workers process; returns its (successful, failed, skipped, retries) counts."""
+    async def run_in_process():
+        try:
+            return await run(args, shard)
+        finally:
+            close_mongo_client()
+            IOHelper.shutdown_executor()
+            export_metrics()
+
+    configure_metrics(args, shard)
+
+    summary = asyncio.run(run_in_process())
+    return summary.successful, summary.failed, summary.skipped, summary.retries
+
+
+async def run_sharded(args: argparse.Namespace):
+    """Sync the inbound workorders in --workers processes, then export once from this one."""
+    print(f"Starting {args.workers} workers, each handling the orders with orderNo % {args.workers} equal to its index...")
+    results = await run_shards(run_shard, args, args.workers)
+
+    summary = PipelineSummary()
+    crashed = []
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            print(f"Worker {index} crashed: {str(result)}")
+            crashed.append(index)
+            continue
+        successful, failed, skipped, retries = result
+        summary.successful += successful
+        summary.failed += failed
+        summary.skipped += skipped
+        summary.retries += retries
+
+    if args.bulk:
+        export_summary = await run(argparse.Namespace(**{**vars(args), "bulk": False, "export": True, "workers": 1}))
+        summary.failed += export_summary.failed
+        summary.retries += export_summary.retries
+
+    print_summary(summary)
+    if crashed:
+        print(f"Workers {crashed} crashed, their workorders were not all processed.")
+        raise SystemExit(1)
+
+
+def print_summary(summary: PipelineSummary):
     print(f"\n--- Processing Complete ---")
-    print(f"Successfully processed: {successful_count} workorders")
-    print(f"Failed to process: {failed_count} workorders")
-    print(f"Total workorders: {len(workorder_numbers)}")
+    print(f"Successfully processed: {summary.successful} workorders")
+    print(f"Failed to process: {summary.failed} workorders")
+    print(f"Skipped (unchanged): {summary.skipped} workorders")
+    print(f"Total workorders: {summary.total}")
+    print(f"Retried operations: {summary.retries}")
+
+
+def retries_since(baseline: dict[str, int]) -> int:
+    """Transient-error retries made by MongoDB and disk calls since `baseline` (a retry_counts() snapshot)."""
+    return sum(count - baseline.get(name, 0) for name, count in retry_counts().items())
+
+
+async def run(args: argparse.Namespace, shard: Shard | None = None):
+    payload_translator = PayloadTranslator()
+    tracos_service = TracOsService(client=get_mongo_client(), cache=WorkorderCache.from_env())
+    ack_buffer = SyncAckBuffer(tracos_service)
+    costumer_route = CostumerERPRoute(tracos_service=tracos_service, ack_buffer=ack_buffer)
+    stage_limiter = StageLimiter.from_env()
+    sync_state = SyncStateService(client=get_mongo_client())
+    dead_letters = DeadLetterStore()
+    retry_baseline = retry_counts()
+
+    await tracos_service.ensure_indexes()
+    await costumer_route.recover_outbound()
+
+    if args.diagnose:
+        try:
+            await tracos_service.verify_query_plans()
+        except QueryPlanError as e:
+            print(f"Query plan check failed: {str(e)}")
+            raise SystemExit(1)
+        print("Every query shape is served by an index.")
+        return
+
+    if args.export:
+        async with ack_buffer:
+            summary = await export_unsynced_workorders(
+                costumer_route,
+                payload_translator,
+                tracos_service,
+                sync_state,
+                concurrency=args.concurrency,
+                stage_limiter=stage_limiter,
+                batch_size=args.batch_size,
+                resume=not args.full,
+            )
+            await costumer_route.flush_outbound()
+        summary.retries = retries_since(retry_baseline)
+        print(f"\n--- Export Complete ---")
+        print(f"Successfully exported: {summary.successful} workorders")
+        print(f"Failed to export: {summary.failed} workorders")
+        print(f"Retried operations: {summary.retries}")
+        return summary
+
+    if args.watch_outbound:
+        watcher = OutboundWatcher(
+            tracos_service,
+            export=lambda tracos_workorder: export_workorder(
+                tracos_workorder, costumer_route, payload_translator, stage_limiter
+            ),
+            sync_state=sync_state,
+        )
+        print("Watching TracOS for changed workorders, press Ctrl+C to stop...")
+        async with ack_buffer:
+            sealer = asyncio.create_task(seal_expired_segments(costumer_route))
+            try:
+                await watcher.run(stop_on_signals())
+            finally:
+                await cancel_task(sealer)
+            await costumer_route.flush_outbound()
+        print(f"\n--- Watch Stopped ---")
+        print(f"Successfully exported: {watcher.exported} workorders")
+        print(f"Failed to export: {watcher.failed} workorders")
+        return
+
+    if args.replay:
+        async with ack_buffer:
+            summary = await replay_dead_letters(
+                dead_letters, costumer_route, payload_translator, tracos_service,
+                concurrency=args.concurrency, stage_limiter=stage_limiter,
+            )
+            await costumer_route.flush_outbound()
+        summary.retries = retries_since(retry_baseline)
+        print_summary(summary)
+        return summary
+
+    discovery = None
+    watcher = None
+
+    if args.order_numbers:
+        workorder_numbers = [order_no for order_no in args.order_numbers if shard is None or shard.owns(order_no)]
+        print(f"Starting to process {len(workorder_numbers)} workorders...")
+    elif args.watch_inbound:
+        discovery = InboundDiscovery(rescan=args.full)
+        watcher = InboundWatcher(discovery)
+        workorder_numbers = watcher.watch(stop_on_signals())
+        print(f"Watching {discovery.inbound_dir} for new or changed workorders, press Ctrl+C to stop...")
+    else:
+        discovery = InboundDiscovery(shard=shard, rescan=args.full)
+        workorder_numbers = discovery.discover()
+        print(f"Starting to process new or changed workorders from {discovery.inbound_dir}...")
+
+    concurrency = args.concurrency or int(os.getenv("PIPELINE_CONCURRENCY", "16"))
+    async with ack_buffer:
+        if args.bulk:
+            summary = await ingest_workorders_in_bulk(
+                workorder_numbers,
+                costumer_route,
+                payload_translator,
+                tracos_service,
+                concurrency=concurrency,
+                batch_size=args.batch_size,
+                dead_letters=dead_letters,
+            )
+            if shard is None:
+                export_summary = await export_unsynced_workorders(
+                    costumer_route,
+                    payload_translator,
+                    tracos_service,
+                    sync_state,
+                    concurrency=concurrency,
+                    stage_limiter=stage_limiter,
+                    batch_size=args.batch_size,
+                    resume=not args.full,
+                )
+                summary.failed += export_summary.failed
+        else:
+            summary = PipelineSummary()
+            background = []
+            if watcher is not None:
+                background.append(asyncio.create_task(commit_inbound_when_drained(watcher, summary, dead_letters)))
+                background.append(asyncio.create_task(seal_expired_segments(costumer_route)))
+            try:
+                await sync_workorders_in_stages(
+                    workorder_numbers,
+                    costumer_route,
+                    payload_translator,
+                    tracos_service,
+                    concurrency=concurrency,
+                    dead_letters=dead_letters,
+                    summary=summary,
+                )
+            finally:
+                for task in background:
+                    await cancel_task(task)
+        await costumer_route.flush_outbound()
+    summary.retries = retries_since(retry_baseline)
+
+    # Failed workorders recorded in the dead-letter store are recovered with --replay, so they
+    # do not hold back the watermark; any other failure leaves it for a rerun to pick up.
+    if inbound_failures_recovered(summary, dead_letters):
+        if discovery is not None:
+            discovery.commit()
+        if summary.failed:
+            print(f"{summary.failed} failed workorders recorded in {dead_letters.path}, run with --replay to retry them.")
+    else:
+        print("Inbound watermark not advanced because some workorders failed.")
+
+    if tracos_service.cache is not None:
+        stats = tracos_service.cache.stats()
+        print(f"TracOS cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, {stats['expirations']} expirations.")
+    if shard is not None:
+        print(
+            f"Worker {shard.index} done: {summary.successful} processed, {summary.failed} failed, "
+            f"{summary.skipped} skipped, {summary.retries} retries."
+        )
+    else:
+        print_summary(summary)
+    return summary
 
 
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds, in seconds."""
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given quantile (inf past the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            self.metrics.inc("errors", timer=self.name, **self.labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        return self.__exit__(exc_type, exc, traceback)
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class Metrics:
+    """Counters and latency histograms for the sync, exported at the end of a run.
+
+    Disabled by default: `timer()` then returns a shared no-op context manager
+    and `inc()`/`observe()` return immediately, so instrumented code pays one
+    attribute check. Enable it with METRICS_ENABLED=true; METRICS_OUTPUT picks
+    the export file (`.json` for a JSON summary, anything else for the
+    Prometheus text format).
+    """
+    def __init__(self, enabled: bool = False, namespace: str = "workorder_sync", output_path: str | None = None):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.output_path = output_path
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(
+            enabled=os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes"),
+            output_path=os.getenv("METRICS_OUTPUT") or None,
+        )
+
+    def configure(self, enabled: bool | None = None, output_path: str | None = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if output_path is not None:
+            self.output_path = output_path
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Add to a counter (e.g. inc("workorders", outcome="failed"))."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a latency, in seconds, in a histogram."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels):
+        """Context manager (sync or async) recording the duration of its block in a histogram."""
+        if not self.enabled:
+            return _NOOP_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """Decorator timing every call of a function or coroutine function."""
+        def decorator(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await function(*args, **kwargs)
+                    with _Timer(self, name, labels):
+                        return await function(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, name, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def to_json(self) -> dict[str, Any]:
+        """Summary with every counter and the count, sum, mean, p50 and p99 of every histogram."""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        "p50": histogram.quantile(0.50),
+                        "p99": histogram.quantile(0.99),
+                    }
+                    for (name, labels), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{self.namespace}_{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, float("inf")), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str | None = None) -> str | None:
+        """Write the metrics to `path` (or METRICS_OUTPUT) and return the path written, if any."""
+        path = path or self.output_path
+        if not self.enabled or not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        content = json.dumps(self.to_json(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as metrics_file:
+            metrics_file.write(content)
+        os.replace(temp_path, path)
+        logger.info(f"Metrics written to {path}.")
+        return path
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+metrics = Metrics.from_env()
@@ -1,11 +1,20 @@
 from schemas.customer_schema import CustomerSystemWorkorderSchema
 from schemas.tracos_schema import TracOSWorkorderSchema
+from schemas.workorder_record import WorkorderRecord
 from bson import ObjectId
+from datetime import datetime, timezone
+import hashlib
+from itertools import product
+from types import SimpleNamespace
+from typing import get_args
 import logging
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
 logger = logging.getLogger(__name__)
 
+TRACOS_STATUSES = frozenset(get_args(TracOSWorkorderSchema.model_fields["status"].annotation))
+TRACOS_COLUMNS = ("_id", "number", "status", "title", "description", "createdAt", "updatedAt", "deleted", "deletedAt", "isSynced", "syncedAt", "contentHash")
+
 
 class PayloadTranslator: 
     """Class to translate payloads between different formats."""
@@ -27,7 +36,8 @@ class PayloadTranslator:
                 updatedAt=payload.lastUpdateDate.astimezone().isoformat().replace('+00:00', 'Z'),
                 deleted=True if payload.isDeleted else False,
                 deletedAt=payload.deletedDate.astimezone().isoformat().replace('+00:00', 'Z') if payload.deletedDate else None,
-                isSynced=payload.isSynced
+                isSynced=payload.isSynced,
+                contentHash=self.content_hash(payload)
             )
         except ValidationError as e:
             logger.error(f"The workorder you're trying to insert is not valid: {e}")
@@ -55,6 +65,74 @@ class PayloadTranslator:
         )
 
 
+    def is_unchanged(self, payload: CustomerSystemWorkorderSchema, stored: dict | None) -> bool:
+        """Whether the stored TracOS fingerprint (contentHash, updatedAt) already reflects this workorder.
+
+        A stored workorder that was never exported (isSynced false, e.g. its
+        outbound write failed) is not unchanged: it still has to go through.
+        """
+        if not stored or stored.get("isSynced") is not True:
+            return False
+        return (
+            stored.get("contentHash") == self.content_hash(payload)
+            and same_instant(stored.get("updatedAt"), payload.lastUpdateDate)
+        )
+
+    def to_record(self, payload: CustomerSystemWorkorderSchema) -> WorkorderRecord:
+        """Pack a validated customer workorder, with its content hash, into a compact record."""
+        return WorkorderRecord.from_customer(payload, content_hash=bytes.fromhex(self.content_hash(payload)))
+
+    def is_record_unchanged(self, record: WorkorderRecord, stored: dict | None) -> bool:
+        """`is_unchanged` for a compact record."""
+        if not stored or stored.get("isSynced") is not True or record.content_hash is None:
+            return False
+        return (
+            stored.get("contentHash") == record.content_hash.hex()
+            and same_instant(stored.get("updatedAt"), record.updated_at)
+        )
+
+    def record_to_tracos(self, record: WorkorderRecord) -> dict | None:
+        """Build the Tracos document of a compact record directly, without any model.
+
+        Returns None, like `from_costumer_to_tracos`, when the flags map to no
+        valid Tracos status.
+        """
+        status = STATUS_BY_FLAGS[record.status_flags]
+        if status not in TRACOS_STATUSES:
+            logger.error(f"Workorder {record.number} has no valid Tracos status: {status}")
+            return None
+        return {
+            "_id": ObjectId(),
+            "number": record.number,
+            "status": status,
+            "title": f"Workorder {record.number}",
+            "description": record.summary,
+            "createdAt": record.created_at,
+            "updatedAt": record.updated_at,
+            "deleted": record.flag("isDeleted"),
+            "deletedAt": record.deleted_at,
+            "isSynced": record.flag("isSynced"),
+            "syncedAt": None,
+            "contentHash": record.content_hash.hex() if record.content_hash else None,
+        }
+
+    @staticmethod
+    def content_hash(payload: CustomerSystemWorkorderSchema) -> str:
+        """Stable hash of the customer workorder content, with dates normalized to UTC."""
+        deleted_date = to_utc(payload.deletedDate).isoformat() if payload.deletedDate else ""
+        content = "\x1f".join((
+            str(payload.orderNo),
+            "".join("1" if flag else "0" for flag in (
+                payload.isActive, payload.isCanceled, payload.isDeleted,
+                payload.isDone, payload.isOnHold, payload.isPending,
+            )),
+            payload.summary,
+            to_utc(payload.creationDate).isoformat(),
+            to_utc(payload.lastUpdateDate).isoformat(),
+            deleted_date,
+        ))
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
     @staticmethod
     def get_tracos_status(
         payload: CustomerSystemWorkorderSchema
@@ -73,3 +151,106 @@ class PayloadTranslator:
         else:
             return "in_progress"
 
+    def translate_batch_to_tracos(
+        self, payloads: list[CustomerSystemWorkorderSchema], columnar: bool = False
+    ) -> list[TracOSWorkorderSchema | None] | dict[str, list]:
+        """Translate many validated customer workorders to Tracos format in one pass.
+
+        Statuses come from a precomputed lookup table and dates are converted
+        to UTC datetimes directly, then the whole batch is validated with a
+        single TypeAdapter call. Like `from_costumer_to_tracos`, workorders
+        without a valid Tracos status come back as None. With `columnar=True`
+        the valid records are returned as one list per Mongo field instead,
+        without building any model.
+        """
+        logger.info(f"Translating {len(payloads)} customer system workorders to Tracos format.")
+        documents = []
+        for payload in payloads:
+            status = STATUS_BY_FLAGS[
+                (payload.isCanceled, payload.isDeleted, payload.isDone, payload.isOnHold, payload.isPending)
+            ]
+            if status not in TRACOS_STATUSES:
+                logger.error(f"Workorder {payload.orderNo} has no valid Tracos status: {status}")
+                documents.append(None)
+                continue
+            documents.append({
+                "_id": ObjectId(),
+                "number": payload.orderNo,
+                "status": status,
+                "title": f"Workorder {payload.orderNo}",
+                "description": payload.summary,
+                "createdAt": to_utc(payload.creationDate),
+                "updatedAt": to_utc(payload.lastUpdateDate),
+                "deleted": payload.isDeleted,
+                "deletedAt": to_utc(payload.deletedDate) if payload.deletedDate else None,
+                "isSynced": payload.isSynced,
+                "syncedAt": None,
+                "contentHash": self.content_hash(payload),
+            })
+
+        valid_documents = [document for document in documents if document is not None]
+        if columnar:
+            return {
+                column: [document[column] for document in valid_documents]
+                for column in TRACOS_COLUMNS
+            }
+        validated = iter(TRACOS_LIST_ADAPTER.validate_python(valid_documents))
+        return [None if document is None else next(validated) for document in documents]
+
+    def translate_batch_to_customer(
+        self, payloads: list[TracOSWorkorderSchema]
+    ) -> list[CustomerSystemWorkorderSchema]:
+        """Translate many validated Tracos workorders to customer system format in one pass."""
+        logger.info(f"Translating {len(payloads)} Tracos workorders to customer system format.")
+        documents = []
+        for payload in payloads:
+            is_canceled, is_done, is_on_hold, is_pending = CUSTOMER_FLAGS_BY_STATUS[payload.status]
+            documents.append({
+                "orderNo": payload.number,
+                "isActive": True,
+                "isCanceled": is_canceled,
+                "isDeleted": payload.deleted,
+                "isDone": is_done,
+                "isOnHold": is_on_hold,
+                "isPending": is_pending,
+                "isSynced": True,
+                "summary": payload.description,
+                "creationDate": payload.createdAt,
+                "lastUpdateDate": payload.updatedAt,
+            })
+        return CUSTOMER_LIST_ADAPTER.validate_python(documents)
+
+
+def to_utc(value: datetime) -> datetime:
+    """Normalize a datetime to UTC (naive values are taken as local time, like astimezone())."""
+    return value.astimezone(timezone.utc)
+
+
+def same_instant(stored: datetime | None, value: datetime) -> bool:
+    """Compare a datetime read back from MongoDB (naive UTC, millisecond precision) with a local one."""
+    if stored is None:
+        return False
+    if stored.tzinfo is None:
+        stored = stored.replace(tzinfo=timezone.utc)
+    return _to_utc_millis(stored) == _to_utc_millis(value)
+
+
+def _to_utc_millis(value: datetime) -> datetime:
+    value = to_utc(value)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+TRACOS_LIST_ADAPTER = TypeAdapter(list[TracOSWorkorderSchema])
+CUSTOMER_LIST_ADAPTER = TypeAdapter(list[CustomerSystemWorkorderSchema])
+
+CUSTOMER_FLAGS_BY_STATUS = {
+    status: (status == "cancelled", status == "completed", status == "on_hold", status == "pending")
+    for status in TRACOS_STATUSES
+}
+
+STATUS_BY_FLAGS = {
+    flags: PayloadTranslator.get_tracos_status(
+        SimpleNamespace(isCanceled=flags[0], isDeleted=flags[1], isDone=flags[2], isOnHold=flags[3], isPending=flags[4])
+    )
+    for flags in product((False, True), repeat=5)
+}
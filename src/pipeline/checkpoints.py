@@ -0,0 +1,33 @@
+from typing import Any
+
+
+class OrderedCheckpoint:
+    """Resume position of an ordered stream processed out of order by concurrent workers.
+
+    Items are registered in stream order and completed in any order; the
+    position only advances past an item once every earlier item completed,
+    so resuming from it never skips unfinished work.
+    """
+    def __init__(self):
+        self._next_sequence = 0
+        self._completed_up_to = -1
+        self._positions: dict[int, Any] = {}
+        self._completed: set[int] = set()
+        self.position: Any = None
+        self.advanced_since_save = 0
+
+    def register(self, position: Any) -> int:
+        """Register the next item of the stream and return its sequence number."""
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._positions[sequence] = position
+        return sequence
+
+    def complete(self, sequence: int) -> None:
+        """Mark an item as done and advance the position over the finished prefix."""
+        self._completed.add(sequence)
+        while self._completed_up_to + 1 in self._completed:
+            self._completed_up_to += 1
+            self._completed.remove(self._completed_up_to)
+            self.position = self._positions.pop(self._completed_up_to)
+            self.advanced_since_save += 1
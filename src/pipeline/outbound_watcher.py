@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from pymongo.errors import OperationFailure
+
+from pipeline.checkpoints import OrderedCheckpoint
+from observability.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingChange:
+    __slots__ = ("workorder", "first_seen", "last_seen", "sequences", "attempts", "retry_at")
+
+    def __init__(self, workorder, now: float, sequence: int):
+        self.workorder = workorder
+        self.first_seen = now
+        self.last_seen = now
+        self.sequences = [sequence]
+        self.attempts = 0
+        self.retry_at = now
+
+
+class OutboundWatcher:
+    """Push TracOS workorder changes to the outbound folder as they happen.
+
+    Changes come from the collection change stream, or from polling the
+    unsynced queue on servers without change streams. They are debounced per
+    workorder number: a workorder is exported once it has been quiet for
+    `debounce` seconds, and at the latest `max_latency` seconds after its first
+    pending change. The change stream resume token is saved after every flush
+    so a restart picks up where the previous process stopped. A failed export
+    is queued again with an exponential backoff (up to `MAX_RETRY_DELAY`
+    seconds) and the token never moves past it until it went through.
+    """
+    CHECKPOINT = "outbound_stream"
+    MAX_RETRY_DELAY = 30.0
+
+    def __init__(
+        self,
+        tracos_service,
+        export: Callable[[Any], Awaitable[bool]],
+        sync_state=None,
+        debounce: float | None = None,
+        max_latency: float | None = None,
+    ):
+        self.tracos_service = tracos_service
+        self.export = export
+        self.sync_state = sync_state
+        self.debounce = debounce if debounce is not None else int(os.getenv("OUTBOUND_DEBOUNCE_MS", "200")) / 1000
+        self.max_latency = max_latency if max_latency is not None else int(os.getenv("OUTBOUND_MAX_LATENCY_MS", "1000")) / 1000
+        self.dedup_size = int(os.getenv("OUTBOUND_DEDUP_SIZE", "100000"))
+        self.exported = 0
+        self.failed = 0
+        self._pending: dict[int, _PendingChange] = {}
+        self._last_exported: OrderedDict[int, Any] = OrderedDict()
+        self._checkpoint = OrderedCheckpoint()
+        self._flush_lock = asyncio.Lock()
+
+    async def run(self, stop_event: asyncio.Event, source: AsyncIterator | None = None) -> None:
+        """Consume changes until `stop_event` is set, then export whatever is still pending."""
+        source = source if source is not None else self._changes()
+        consumer = asyncio.create_task(self._consume(source))
+        flusher = asyncio.create_task(self._flush_periodically())
+        stopper = asyncio.create_task(stop_event.wait())
+        try:
+            await asyncio.wait({consumer, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (consumer, flusher, stopper):
+                task.cancel()
+            await asyncio.gather(consumer, flusher, stopper, return_exceptions=True)
+            await self.flush(force=True)
+        if consumer.done() and not consumer.cancelled() and consumer.exception():
+            raise consumer.exception()
+
+    async def _changes(self) -> AsyncIterator:
+        resume_token = None
+        if self.sync_state is not None:
+            checkpoint = await self.sync_state.get_checkpoint(self.CHECKPOINT)
+            resume_token = checkpoint.get("token") if checkpoint else None
+        try:
+            async for change in self.tracos_service.watch_unsynced_workorders(resume_token=resume_token):
+                yield change
+        except OperationFailure as e:
+            logger.warning(f"Change streams are unavailable, falling back to polling: {e}")
+            async for change in self.tracos_service.poll_unsynced_workorders():
+                yield change
+
+    async def _consume(self, source: AsyncIterator) -> None:
+        async for token, workorder in source:
+            self.add(token, workorder)
+
+    def add(self, token, workorder) -> None:
+        """Queue a changed workorder, coalescing it with pending changes of the same number."""
+        if token is None and self._last_exported.get(workorder.number) == workorder.updatedAt:
+            return
+        sequence = self._checkpoint.register({"token": token} if token is not None else None)
+        now = asyncio.get_running_loop().time()
+        pending = self._pending.get(workorder.number)
+        metrics.inc("outbound_changes", coalesced=pending is not None)
+        if pending is None:
+            self._pending[workorder.number] = _PendingChange(workorder, now, sequence)
+        else:
+            pending.workorder = workorder
+            pending.last_seen = now
+            pending.sequences.append(sequence)
+
+    async def _flush_periodically(self) -> None:
+        tick = max(min(self.debounce, self.max_latency) / 2, 0.01)
+        while True:
+            await asyncio.sleep(tick)
+            await self.flush()
+
+    async def flush(self, force: bool = False) -> None:
+        """Export the workorders whose debounce window or latency budget has elapsed."""
+        async with self._flush_lock:
+            now = asyncio.get_running_loop().time()
+            due = [
+                number
+                for number, pending in self._pending.items()
+                if force
+                or now >= pending.retry_at
+                and (now - pending.last_seen >= self.debounce or now - pending.first_seen >= self.max_latency)
+            ]
+            if not due:
+                return
+            changes = [self._pending.pop(number) for number in due]
+            results = await asyncio.gather(
+                *(self.export(change.workorder) for change in changes), return_exceptions=True
+            )
+            now = asyncio.get_running_loop().time()
+            for change, result in zip(changes, results):
+                if result is True:
+                    self.exported += 1
+                    metrics.inc("workorders", flow="outbound", outcome="successful")
+                    self._remember_export(change.workorder)
+                    for sequence in change.sequences:
+                        self._checkpoint.complete(sequence)
+                else:
+                    self.failed += 1
+                    metrics.inc("workorders", flow="outbound", outcome="failed")
+                    logger.error(f"Failed to export workorder {change.workorder.number}: {result}")
+                    self._requeue(change, now)
+            await self._save_resume_token()
+
+    def _requeue(self, change: _PendingChange, now: float) -> None:
+        """Queue a failed export again, leaving its changes uncompleted so the resume token stays behind them."""
+        newer = self._pending.get(change.workorder.number)
+        if newer is not None:
+            # A newer change of the workorder arrived during the export and supersedes it.
+            newer.sequences.extend(change.sequences)
+            return
+        change.attempts += 1
+        change.retry_at = now + min(self.debounce * 2 ** change.attempts, self.MAX_RETRY_DELAY)
+        self._pending[change.workorder.number] = change
+
+    def _remember_export(self, workorder) -> None:
+        self._last_exported[workorder.number] = workorder.updatedAt
+        self._last_exported.move_to_end(workorder.number)
+        while len(self._last_exported) > self.dedup_size:
+            self._last_exported.popitem(last=False)
+
+    async def _save_resume_token(self) -> None:
+        if self.sync_state is None or not self._checkpoint.advanced_since_save:
+            return
+        self._checkpoint.advanced_since_save = 0
+        if self._checkpoint.position is not None:
+            await self.sync_state.save_checkpoint(self.CHECKPOINT, self._checkpoint.position)
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+from contextlib import nullcontext
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, Union
+
+from observability.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+SKIPPED = "skipped"
+
+
+class PipelineSummary:
+    """Counters describing the outcome of a pipeline run."""
+    def __init__(self, flow: str = "inbound"):
+        self.flow = flow
+        self.successful = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retries = 0
+        # orderNos of the failed workorders; None stands for a failure recorded without one.
+        self.failed_numbers: set[int | None] = set()
+
+    @property
+    def total(self) -> int:
+        return self.successful + self.failed + self.skipped
+
+    def record(self, outcome, number: int | None = None) -> None:
+        """Record the outcome of a single workorder (True, False or SKIPPED), by orderNo when known."""
+        if outcome == SKIPPED:
+            self.skipped += 1
+            metrics.inc("workorders", flow=self.flow, outcome="skipped")
+        elif outcome:
+            self.successful += 1
+            metrics.inc("workorders", flow=self.flow, outcome="successful")
+        else:
+            self.failed += 1
+            self.failed_numbers.add(number)
+            metrics.inc("workorders", flow=self.flow, outcome="failed")
+
+
+class StageLimiter:
+    """Per-stage concurrency limits (e.g. disk reads, Mongo calls, outbound writes)."""
+    def __init__(self, limits: Dict[str, int] | None = None):
+        self._semaphores = {
+            stage: asyncio.Semaphore(limit) for stage, limit in (limits or {}).items()
+        }
+
+    @classmethod
+    def from_env(cls) -> "StageLimiter":
+        """Build the limiter from the PIPELINE_LIMIT_<STAGE> variables.
+
+        They are not PIPELINE_<STAGE>_CONCURRENCY, which sets the worker count
+        of the staged inbound sync instead.
+        """
+        limits = {}
+        for stage in ("read", "mongo", "write"):
+            value = os.getenv(f"PIPELINE_LIMIT_{stage.upper()}")
+            if value:
+                limits[stage] = int(value)
+        return cls(limits)
+
+    def stage(self, name: str):
+        """Return an async context manager bounding (and, with metrics enabled, timing) the given stage."""
+        semaphore = self._semaphores.get(name)
+        if metrics.enabled:
+            return _TimedStage(semaphore, metrics.timer("stage_seconds", stage=name))
+        return semaphore if semaphore is not None else nullcontext()
+
+
+class _TimedStage:
+    """Time a stage once its semaphore is acquired, so queueing is not counted as work."""
+    def __init__(self, semaphore: asyncio.Semaphore | None, timer):
+        self.semaphore = semaphore
+        self.timer = timer
+
+    async def __aenter__(self):
+        if self.semaphore is not None:
+            await self.semaphore.acquire()
+        self.timer.__enter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        try:
+            self.timer.__exit__(exc_type, exc, traceback)
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+        return False
+
+
+class PipelineRunner:
+    """Process workorders concurrently with a bounded pool of worker tasks."""
+    def __init__(
+        self,
+        process: Callable[[Any], Awaitable[Any]],
+        concurrency: int | None = None,
+        queue_size: int | None = None,
+        flow: str = "inbound",
+    ):
+        self.process = process
+        self.flow = flow
+        self.concurrency = concurrency or int(os.getenv("PIPELINE_CONCURRENCY", "16"))
+        self.queue_size = queue_size or int(
+            os.getenv("PIPELINE_QUEUE_SIZE", str(self.concurrency * 2))
+        )
+
+    async def run(self, items: Union[Iterable, AsyncIterable]) -> PipelineSummary:
+        """Feed items to the workers and wait until every one has been processed.
+
+        The queue is bounded, so a fast producer (e.g. a directory scan) is
+        paused while the workers are busy instead of buffering the whole batch.
+        """
+        summary = PipelineSummary(self.flow)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [
+            asyncio.create_task(self._worker(queue, summary))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            await self._produce(items, queue)
+        finally:
+            for _ in workers:
+                await queue.put(_STOP)
+            await asyncio.gather(*workers)
+        return summary
+
+    @staticmethod
+    async def _produce(items: Union[Iterable, AsyncIterable], queue: asyncio.Queue) -> None:
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+
+    async def _worker(self, queue: asyncio.Queue, summary: PipelineSummary) -> None:
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            try:
+                with metrics.timer("workorder_seconds", flow=self.flow):
+                    outcome = await self.process(item)
+            except Exception as e:
+                print(f"Error processing workorder {item}: {str(e)}")
+                outcome = False
+            summary.record(outcome)
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Shard:
+    """One of `count` disjoint slices of the order numbers, selected by orderNo % count."""
+    def __init__(self, index: int, count: int):
+        if not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index} of {count}.")
+        self.index = index
+        self.count = count
+
+    def owns(self, order_no: int) -> bool:
+        return order_no % self.count == self.index
+
+    @property
+    def suffix(self) -> str:
+        """Name suffix of the files kept per shard (discovery watermark, metrics output)."""
+        return f"shard{self.index}of{self.count}"
+
+    def __repr__(self) -> str:
+        return f"Shard({self.index}, {self.count})"
+
+
+async def run_shards(target: Callable[[Any, Shard], Any], args: Any, count: int) -> list:
+    """Run `target(args, shard)` for every shard in its own spawned process.
+
+    Each process has its own event loop and MongoDB client. The results are
+    returned in shard order; a shard that raised is returned as its exception.
+    """
+    loop = asyncio.get_running_loop()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=count, mp_context=context) as pool:
+        futures = [
+            loop.run_in_executor(pool, target, args, Shard(index, count))
+            for index in range(count)
+        ]
+        return await asyncio.gather(*futures, return_exceptions=True)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, List, Union
+
+from observability.metrics import metrics
+from pipeline.pipeline_runner import PipelineSummary
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Stage:
+    """One step of a StagedPipeline, run by `concurrency` workers on batches of up to `batch_size` items.
+
+    `handle(batch, summary)` returns the items to pass to the next stage and
+    records in `summary`, by orderNo, the outcome of the items it drops
+    (skipped, failed, or done for the last stage). If it raises, the items it
+    had not recorded yet are counted as failed and passed to
+    `on_error(items, error)`, if given. `number_of(item)` gives the orderNo of
+    an item, the item itself by default.
+    """
+    def __init__(
+        self,
+        name: str,
+        handle: Callable[[List[Any], PipelineSummary], Awaitable[Iterable[Any]]],
+        concurrency: int = 1,
+        batch_size: int = 1,
+        queue_size: int | None = None,
+        on_error: Callable[[List[Any], Exception], Awaitable[None]] | None = None,
+        number_of: Callable[[Any], int] | None = None,
+    ):
+        if concurrency < 1 or batch_size < 1:
+            raise ValueError(f"Stage {name} needs a concurrency and a batch size of at least 1")
+        self.name = name
+        self.handle = handle
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.queue_size = queue_size or 2 * concurrency * batch_size
+        self.on_error = on_error
+        self.number_of = number_of or (lambda item: item)
+
+    @classmethod
+    def from_env(cls, name: str, handle, concurrency: int = 1, batch_size: int = 1, **kwargs) -> "Stage":
+        """Read PIPELINE_<NAME>_CONCURRENCY and PIPELINE_<NAME>_BATCH_SIZE over the given defaults."""
+        prefix = f"PIPELINE_{name.upper()}"
+        return cls(
+            name,
+            handle,
+            concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+            batch_size=int(os.getenv(f"{prefix}_BATCH_SIZE", str(batch_size))),
+            **kwargs,
+        )
+
+
+class _BatchSummary:
+    """The summary seen by a handler, remembering which orderNos it recorded for its batch."""
+    def __init__(self, summary: PipelineSummary):
+        self.summary = summary
+        self.recorded: set = set()
+
+    def record(self, outcome, number: int | None = None) -> None:
+        self.summary.record(outcome, number)
+        self.recorded.add(number)
+
+
+class StagedPipeline:
+    """Stages connected by bounded queues, each with its own workers and batch size.
+
+    Every stage feeds the next through an asyncio.Queue sized by the consuming
+    stage, so a slow stage applies backpressure upstream while the others keep
+    working (e.g. files are read while the previous batch is being upserted).
+    Workers batch whatever is already queued, up to the stage batch size, so
+    batches grow under load without delaying a lone item.
+    """
+    def __init__(self, stages: List[Stage], flow: str = "inbound"):
+        if not stages:
+            raise ValueError("A staged pipeline needs at least one stage")
+        self.stages = stages
+        self.flow = flow
+
+    async def run(self, items: Union[Iterable, AsyncIterable], summary: PipelineSummary | None = None) -> PipelineSummary:
+        """Feed items to the first stage and wait until every stage has drained.
+
+        Outcomes are recorded in `summary` when given, so the caller can follow
+        a long-running pipeline.
+        """
+        summary = summary if summary is not None else PipelineSummary(self.flow)
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        workers = [
+            [
+                asyncio.create_task(
+                    self._worker(stage, queues[index], queues[index + 1] if index + 1 < len(queues) else None, summary)
+                )
+                for _ in range(stage.concurrency)
+            ]
+            for index, stage in enumerate(self.stages)
+        ]
+        try:
+            await self._produce(items, queues[0])
+        finally:
+            for _ in workers[0]:
+                await queues[0].put(_STOP)
+            for index, stage_workers in enumerate(workers):
+                await asyncio.gather(*stage_workers)
+                if index + 1 < len(workers):
+                    for _ in workers[index + 1]:
+                        await queues[index + 1].put(_STOP)
+        return summary
+
+    @staticmethod
+    async def _produce(items: Union[Iterable, AsyncIterable], queue: asyncio.Queue) -> None:
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+
+    async def _worker(
+        self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue | None, summary: PipelineSummary
+    ) -> None:
+        stopped = False
+        while not stopped:
+            item = await inbox.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            while len(batch) < stage.batch_size:
+                try:
+                    item = inbox.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stopped = True
+                    break
+                batch.append(item)
+
+            batch_summary = _BatchSummary(summary)
+            try:
+                with metrics.timer("stage_seconds", stage=stage.name):
+                    forwarded = await stage.handle(batch, batch_summary)
+            except Exception as e:
+                failed = [item for item in batch if stage.number_of(item) not in batch_summary.recorded]
+                logger.error(f"Stage {stage.name} failed on a batch of {len(batch)}: {e!r}")
+                print(f"Error in stage {stage.name} for {len(failed)} workorders: {str(e)}")
+                for item in failed:
+                    summary.record(False, stage.number_of(item))
+                if stage.on_error is not None and failed:
+                    await stage.on_error(failed, e)
+                continue
+            if outbox is not None:
+                for item in forwarded or ():
+                    await outbox.put(item)
@@ -1,22 +1,49 @@
 from datetime import datetime
 import os
-import json
 import logging
-from typing import List, Union
+from typing import Any, List, Union
 import asyncio
-from schemas.customer_schema import CustomerSystemWorkorderSchema # Changed this line
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from schemas.customer_schema import CustomerInboundWorkorderSchema, CustomerSystemWorkorderSchema
 
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 from services.tracos_service import TracOsService
+from services.resilience import Resilience, get_resilience, is_transient_error
+from routes.outbound_segments import OutboundSegmentWriter
+from observability.metrics import metrics
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
  
 class CostumerERPRoute:
-    def __init__(self):
+    """Customer ERP folders: inbound files to read and outbound workorders to record.
+
+    Outbound workorders are written one `{orderNo}.json` file each
+    (OUTBOUND_FORMAT=json, the default) or appended to rotating NDJSON
+    segments (OUTBOUND_FORMAT=ndjson, see OutboundSegmentWriter).
+    """
+    OUTBOUND_FORMATS = ("json", "ndjson")
+
+    def __init__(self, tracos_service: TracOsService | None = None, ack_buffer=None, outbound_format: str | None = None):
         self.client_get_url = str(os.getenv("DATA_INBOUND_DIR", "data/inbound"))
         self.client_post_url =  str(os.getenv("DATA_OUTBOUND_DIR", "data/outbound"))
         self.IOHelper = IOHelper()
-        self.tracos_service = TracOsService()
+        self.tracos_service = tracos_service or TracOsService()
+        self.ack_buffer = ack_buffer
+        self.outbound_format = outbound_format or os.getenv("OUTBOUND_FORMAT", "json")
+        if self.outbound_format not in self.OUTBOUND_FORMATS:
+            raise ValueError(f"Invalid outbound format {self.outbound_format!r}, expected one of {self.OUTBOUND_FORMATS}")
+        self.segment_writer = None
+        if self.outbound_format == "ndjson":
+            self.segment_writer = OutboundSegmentWriter(
+                self.client_post_url, fsync=self.IOHelper.fsync_mode != "none"
+            )
 
     async def get_costumer_workorder_by_order_number(
         self, orderNo: int
@@ -30,6 +57,13 @@ class CostumerERPRoute:
             return None
         return json_file
 
+    async def get_costumer_workorders_by_order_numbers(
+        self, orderNos: List[int]
+    ) -> List[CustomerSystemWorkorderSchema | None]:
+        """Fetch many workorders from the customer system, overlapping the file reads."""
+        full_paths = [os.path.join(self.client_get_url, f"{orderNo}.json") for orderNo in orderNos]
+        return await self.IOHelper.read_many(full_paths)
+
     async def post_costumer_workorder(
         self, workorder: CustomerSystemWorkorderSchema
     ) -> dict: 
@@ -38,56 +72,250 @@ class CostumerERPRoute:
             return None
 
         try:
-            full_path = os.path.join(self.client_post_url, f"{workorder.orderNo}.json")
-            logger.info("Inserting json file in Client's ERP...")
-            await self.IOHelper.write_json(
-                file_path=full_path,
-                data=workorder
-            )
-            await self.tracos_service.update_workorder(
-                number=workorder.orderNo
-            )
+            ack = (workorder.orderNo, workorder.lastUpdateDate)
+            if self.segment_writer is not None:
+                written = await self.IOHelper.append_ndjson(
+                    self.segment_writer, [workorder], acks=[ack] if self._holds_acks else None
+                )
+            else:
+                full_path = os.path.join(self.client_post_url, f"{workorder.orderNo}.json")
+                logger.info("Inserting json file in Client's ERP...")
+                written = await self.IOHelper.write_json(
+                    file_path=full_path,
+                    data=workorder,
+                    ack=ack if self._holds_acks else None,
+                )
+            if not written:
+                return None
+            if self._holds_acks:
+                await self._acknowledge(self._take_durable_acks())
+            elif self.ack_buffer is not None:
+                await self.ack_buffer.add(*ack)
+            else:
+                await self.tracos_service.update_workorder(
+                    number=workorder.orderNo
+                )
             return workorder.model_dump(mode="json")
         except Exception as e:
             logger.error(f"Error inserting json file: {str(e)}")
             return None
 
+    async def post_costumer_workorders(
+        self, workorders: List[CustomerSystemWorkorderSchema]
+    ) -> List[dict | None]:
+        """Write a batch of workorders to the outbound folder concurrently and acknowledge the written ones.
+
+        Without an ack buffer the batch is marked as synced with a single bulk write.
+        """
+        acks = [(workorder.orderNo, workorder.lastUpdateDate) for workorder in workorders]
+        if self.segment_writer is not None:
+            appended = await self.IOHelper.append_ndjson(
+                self.segment_writer, workorders, acks=acks if self._holds_acks else None
+            )
+            written = [appended] * len(workorders)
+        else:
+            written = await self.IOHelper.write_many(
+                [(os.path.join(self.client_post_url, f"{workorder.orderNo}.json"), workorder) for workorder in workorders],
+                acks=acks if self._holds_acks else None,
+            )
+        results = []
+        synced = []
+        for workorder, ack, ok in zip(workorders, acks, written):
+            if not ok:
+                results.append(None)
+                continue
+            if not self._holds_acks:
+                synced.append(ack)
+            results.append(workorder.model_dump(mode="json"))
+        if self._holds_acks:
+            synced = self._take_durable_acks()
+        await self._acknowledge(synced)
+        return results
+
+    @property
+    def _holds_acks(self) -> bool:
+        """Whether acks wait for the fsync covering their write: a group fsync, or the seal of a fsynced segment."""
+        if self.segment_writer is not None:
+            return self.segment_writer.fsync
+        return self.IOHelper.fsync_mode == "group"
+
+    def _take_durable_acks(self) -> List[tuple[int, datetime]]:
+        acks = self.IOHelper.take_durable_acks()
+        if self.segment_writer is not None:
+            acks.extend(self.segment_writer.take_sealed_acks())
+        return acks
+
+    async def _acknowledge(self, acks: List[tuple[int, datetime]]) -> None:
+        if not acks:
+            return
+        if self.ack_buffer is not None:
+            for number, updated_at in acks:
+                await self.ack_buffer.add(number, updated_at)
+        else:
+            await self.tracos_service.mark_workorders_synced(acks)
+
+    async def flush_outbound(self) -> None:
+        """Make every outbound file written so far durable (group-commit mode) and seal the open NDJSON segment.
+
+        The acknowledgements held until their writes were fsynced are
+        released here.
+        """
+        await self.IOHelper.flush_group_commit()
+        if self.segment_writer is not None:
+            await self.IOHelper.seal_segment(self.segment_writer)
+        await self._acknowledge(self._take_durable_acks())
+
+    async def recover_outbound(self) -> None:
+        """Seal the NDJSON segments left in the outbound folder by interrupted runs, before writing new ones."""
+        if self.segment_writer is not None:
+            await self.IOHelper.recover_segments(self.segment_writer)
+
+    async def seal_expired_segment(self) -> None:
+        """Seal the open NDJSON segment once it is OUTBOUND_SEGMENT_MAX_AGE seconds old and acknowledge its workorders.
+
+        Called periodically by the watch modes, whose segments would otherwise
+        only be sealed when the daemon stops.
+        """
+        if self.segment_writer is None:
+            return
+        if await self.IOHelper.seal_expired_segment(self.segment_writer) is not None and self._holds_acks:
+            await self._acknowledge(self._take_durable_acks())
+
+
+class WorkorderCodec:
+    """Parse inbound files straight into the schema and serialize outbound ones.
+
+    Parsing and serialization run in pydantic-core. orjson can be enabled for
+    the JSON step when installed (`use_orjson` / JSON_CODEC_ORJSON=true), but
+    it is off by default because the extra dict round trip makes it slower
+    than pydantic-core for these small documents (see bench/bench_codec.py).
+    Outbound files are compact unless `pretty` is set.
+    """
+    _inbound_adapter = TypeAdapter(CustomerInboundWorkorderSchema)
+    _outbound_list_adapter = TypeAdapter(List[CustomerSystemWorkorderSchema])
+
+    def __init__(self, pretty: bool | None = None, use_orjson: bool | None = None):
+        if pretty is None:
+            pretty = os.getenv("OUTBOUND_JSON_PRETTY", "false").lower() == "true"
+        if use_orjson is None:
+            use_orjson = os.getenv("JSON_CODEC_ORJSON", "false").lower() == "true"
+        self.pretty = pretty
+        self.use_orjson = use_orjson and orjson is not None
+
+    def decode(self, raw: bytes) -> CustomerSystemWorkorderSchema:
+        """Validate an inbound file payload; inbound workorders are never synced."""
+        if self.use_orjson:
+            workorder = self._inbound_adapter.validate_python(orjson.loads(raw))
+        else:
+            workorder = self._inbound_adapter.validate_json(raw)
+        workorder.isSynced = False
+        return workorder
+
+    def encode(
+        self, data: Union[CustomerSystemWorkorderSchema, List[CustomerSystemWorkorderSchema]]
+    ) -> bytes:
+        """Serialize one workorder or a list of workorders to JSON bytes."""
+        if self.use_orjson:
+            option = orjson.OPT_INDENT_2 if self.pretty else 0
+            return orjson.dumps(IOHelper.convert_to_payload_json(data), option=option)
+        indent = 4 if self.pretty else None
+        if isinstance(data, list):
+            return self._outbound_list_adapter.dump_json(data, indent=indent)
+        return data.model_dump_json(indent=indent).encode("utf-8")
+
+    def encode_line(self, workorder: CustomerSystemWorkorderSchema) -> bytes:
+        """Serialize one workorder as a compact NDJSON line, whatever `pretty` is."""
+        if self.use_orjson:
+            return orjson.dumps(workorder.model_dump(mode="json"), option=orjson.OPT_APPEND_NEWLINE)
+        return workorder.model_dump_json().encode("utf-8") + b"\n"
 
 
 class IOHelper:
-    @staticmethod
-    async def read_json(file_path: str) -> CustomerSystemWorkorderSchema:
+    """File I/O for the customer ERP folders, run off the event loop.
+
+    Writes are atomic (temp file + rename). `fsync_mode` picks the durability:
+    "none" (rename only), "file" (fsync the file), "dir" (fsync the file and
+    its directory) or "group" (fsync every `fsync_group_size` files). In
+    group mode a write may carry an `ack`, handed back by `take_durable_acks()`
+    once the fsync covering its file completed.
+    Transient disk errors (EAGAIN, EBUSY, timeouts) are retried through
+    `resilience`.
+    """
+    _executor: ThreadPoolExecutor | None = None
+    FSYNC_MODES = ("none", "file", "dir", "group")
+
+    def __init__(
+        self,
+        fsync_mode: str | None = None,
+        fsync_group_size: int | None = None,
+        codec: "WorkorderCodec | None" = None,
+        resilience: Resilience | None = None,
+    ):
+        self.codec = codec or WorkorderCodec()
+        self.resilience = resilience or get_resilience("disk")
+        self.fsync_mode = fsync_mode or os.getenv("OUTBOUND_FSYNC_MODE", "none")
+        if self.fsync_mode not in self.FSYNC_MODES:
+            raise ValueError(f"Invalid fsync mode {self.fsync_mode!r}, expected one of {self.FSYNC_MODES}")
+        self.fsync_group_size = fsync_group_size or int(os.getenv("OUTBOUND_FSYNC_GROUP_SIZE", "100"))
+        self._group_pending: List[tuple[str, Any]] = []
+        self._durable_acks: List[Any] = []
+        self._group_lock = threading.Lock()
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        """Return the shared thread pool used for blocking file operations."""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("IO_EXECUTOR_WORKERS", "32")),
+                thread_name_prefix="io-helper",
+            )
+        return cls._executor
+
+    @classmethod
+    def shutdown_executor(cls) -> None:
+        """Shut down the shared thread pool, waiting for pending file operations."""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=True)
+            cls._executor = None
+
+    @classmethod
+    async def _run_in_executor(cls, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.executor(), function, *args)
+
+    async def read_json(self, file_path: str) -> CustomerSystemWorkorderSchema:
         """Read JSON data from a file."""
         try:
-            with open(file_path, "r") as json_file:
+            return await self.resilience.call("read", self._run_in_executor, self._read_json_sync, file_path)
+        except Exception as e:
+            logger.error(f"Error reading {file_path}: {str(e)}")
+            return None
+
+    async def read_many(self, file_paths: List[str]) -> List[CustomerSystemWorkorderSchema | None]:
+        """Read many JSON files concurrently, preserving the order of `file_paths`."""
+        return await asyncio.gather(*(self.read_json(file_path) for file_path in file_paths))
+
+    @metrics.timed("disk_seconds", operation="read")
+    def _read_json_sync(self, file_path: str) -> CustomerSystemWorkorderSchema:
+        try:
+            with open(file_path, "rb") as json_file:
                 logger.info(f"Reading file: {file_path}")
-                data = json.load(json_file)
-                return CustomerSystemWorkorderSchema(
-                    orderNo=data.get("orderNo", 0),
-                    isActive=data.get("isActive", True),
-                    isCanceled=data.get("isCanceled", False),
-                    isDeleted=data.get("isDeleted", False),
-                    isDone=data.get("isDone", False),
-                    isOnHold=data.get("isOnHold", False),
-                    isPending=data.get("isPending", False),
-                    isSynced=False,
-                    summary=data.get("summary", ""),
-                    creationDate=data.get("creationDate", ""),
-                    lastUpdateDate=data.get("lastUpdateDate", ""),
-                    deletedDate=None if "deletedDate" not in data else data.get("deletedDate", None)
-                )
+                return self.codec.decode(json_file.read())
         except FileNotFoundError:
             logger.error(f"File not found: {file_path}")
             return None
-        except json.JSONDecodeError as e:
+        except ValidationError as e:
+            logger.error(f"Validation error in {file_path}: {str(e)}")
+            return None
+        except ValueError as e:
             logger.error(f"Invalid JSON in {file_path}: {str(e)}")
             return None
         except Exception as e:
+            if is_transient_error(e):
+                raise
             logger.error(f"Error reading {file_path}: {str(e)}")
             return None
-        except ValidationError as e:
-            logger.error(f"Validation error in {file_path}: {str(e)}")
-    
+
     @staticmethod
     def convert_to_payload_json(
         data: Union[CustomerSystemWorkorderSchema, List[CustomerSystemWorkorderSchema]]
@@ -97,27 +325,146 @@ class IOHelper:
         return data.model_dump(mode="json")
     
     async def write_json(self, 
-        file_path: str, data: List[CustomerSystemWorkorderSchema] | CustomerSystemWorkorderSchema
+        file_path: str, data: List[CustomerSystemWorkorderSchema] | CustomerSystemWorkorderSchema, ack: Any = None
     ) -> bool:
         """Write JSON data to a file."""
-        payload = self.convert_to_payload_json(data)
+        payload = self.codec.encode(data)
+        try:
+            return await self.resilience.call("write", self._run_in_executor, self._write_json_sync, file_path, payload, ack)
+        except Exception as e:
+            logger.error(f"Error writing {file_path}: {str(e)}")
+            return None
+
+    async def write_many(
+        self, items: List[tuple[str, CustomerSystemWorkorderSchema]], acks: List[Any] | None = None
+    ) -> List[bool | None]:
+        """Write many `(file_path, workorder)` pairs concurrently, with one optional `ack` each."""
+        acks = acks or [None] * len(items)
+        return await asyncio.gather(
+            *(self.write_json(file_path=file_path, data=data, ack=ack) for (file_path, data), ack in zip(items, acks))
+        )
+
+    async def append_ndjson(
+        self, writer: OutboundSegmentWriter, workorders: List[CustomerSystemWorkorderSchema], acks: List[Any] | None = None
+    ) -> bool:
+        """Append workorders as NDJSON lines to the writer's open segment, with the acks to release on its seal."""
+        lines = [self.codec.encode_line(workorder) for workorder in workorders]
+        try:
+            await self._run_in_executor(
+                self._append_ndjson_sync, writer, [workorder.orderNo for workorder in workorders], lines, acks
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error appending {len(workorders)} workorders to a segment in {writer.directory}: {str(e)}")
+            return False
+
+    @staticmethod
+    @metrics.timed("disk_seconds", operation="append")
+    def _append_ndjson_sync(writer: OutboundSegmentWriter, order_numbers: List[int], lines: List[bytes], acks: List[Any] | None = None) -> None:
+        writer.append(order_numbers, lines, acks)
+
+    async def seal_segment(self, writer: OutboundSegmentWriter) -> dict | None:
+        """Close the writer's open segment and record it in the manifest."""
+        return await self._run_in_executor(writer.seal)
+
+    async def recover_segments(self, writer: OutboundSegmentWriter) -> List[dict]:
+        """Seal the segments left behind by writers that are no longer running."""
+        return await self._run_in_executor(writer.recover)
+
+    async def seal_expired_segment(self, writer: OutboundSegmentWriter) -> dict | None:
+        """Close the writer's open segment if it reached its maximum age."""
+        return await self._run_in_executor(writer.seal_if_expired)
+
+    @metrics.timed("disk_seconds", operation="write")
+    def _write_json_sync(self, file_path: str, payload: bytes, ack: Any = None) -> bool:
+        """Write to a temp file in the target directory, then atomically rename it into place."""
+        directory = os.path.dirname(file_path) or "."
+        temp_path = os.path.join(
+            directory, f".{os.path.basename(file_path)}.{uuid.uuid4().hex}.tmp"
+        )
         try:
-            with open(file_path, "w", encoding="utf-8") as json_file:
-                json.dump(payload, json_file, ensure_ascii=False, indent=4)
-                logging.info("Workorder inserted in Client's ERP")
-                return True
+            with open(temp_path, "wb") as json_file:
+                json_file.write(payload)
+                if self.fsync_mode in ("file", "dir"):
+                    json_file.flush()
+                    os.fsync(json_file.fileno())
+            os.replace(temp_path, file_path)
+            if self.fsync_mode == "dir":
+                self._fsync_directory(directory)
+            elif self.fsync_mode == "group":
+                self._add_to_group_commit(file_path, ack)
+            logging.info("Workorder inserted in Client's ERP")
+            return True
         except FileNotFoundError:
             logger.error(f"File not found: {file_path}")
-            return None
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in {file_path}: {str(e)}")
+            self._remove_temp_file(temp_path)
             return None
         except Exception as e:
-            logger.error(f"Error reading {file_path}: {str(e)}")
+            self._remove_temp_file(temp_path)
+            if is_transient_error(e):
+                raise
+            logger.error(f"Error writing {file_path}: {str(e)}")
             return None
-        except ValidationError as e:
-            logger.error(f"Validation error in {file_path}: {str(e)}")
 
+    @staticmethod
+    def _remove_temp_file(temp_path: str) -> None:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        """Persist the directory entry created by a rename (no-op where unsupported)."""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+    def _add_to_group_commit(self, file_path: str, ack: Any = None) -> None:
+        with self._group_lock:
+            self._group_pending.append((file_path, ack))
+            if len(self._group_pending) < self.fsync_group_size:
+                return
+            pending, self._group_pending = self._group_pending, []
+        self._commit_group(pending)
+
+    def _commit_group(self, pending: List[tuple[str, Any]]) -> None:
+        """Fsync a group of files, then release the acks of its writes."""
+        self._fsync_files([file_path for file_path, _ in pending])
+        with self._group_lock:
+            self._durable_acks.extend(ack for _, ack in pending if ack is not None)
+
+    @metrics.timed("disk_seconds", operation="group_fsync")
+    def _fsync_files(self, file_paths: List[str]) -> None:
+        for file_path in file_paths:
+            try:
+                file_fd = os.open(file_path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(file_fd)
+            finally:
+                os.close(file_fd)
+        for directory in {os.path.dirname(file_path) or "." for file_path in file_paths}:
+            self._fsync_directory(directory)
+        logger.info(f"Group commit fsynced {len(file_paths)} outbound files.")
+
+    async def flush_group_commit(self) -> None:
+        """Fsync the files still waiting for a group commit."""
+        with self._group_lock:
+            pending, self._group_pending = self._group_pending, []
+        if pending:
+            await self._run_in_executor(self._commit_group, pending)
+
+    def take_durable_acks(self) -> List[Any]:
+        """Return, and forget, the acks of the writes a group fsync made durable so far."""
+        with self._group_lock:
+            acks, self._durable_acks = self._durable_acks, []
+        return acks
 
 if __name__ == "__main__":
     route = CostumerERPRoute()
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator
+
+from pipeline.sharding import Shard
+
+logger = logging.getLogger(__name__)
+
+
+class InboundDiscovery:
+    """Stream the inbound workorder files that are new or changed since the last run.
+
+    The watermark is a change time every file changed before it has been
+    discovered by: the start of the last complete scan, minus
+    INBOUND_WATERMARK_MARGIN_MS to cover the file system timestamp
+    granularity. Files changed at or after it are kept with their change time
+    and size, so the next scan rechecks them instead of skipping them; a file
+    created or modified while a scan walks the folder is therefore never
+    lost. The change time is the later of mtime and ctime: files
+    moved in with an older mtime (`cp -p`, `rsync -t`, `tar x`, `mv` from a
+    staging folder) still get a fresh ctime when they arrive.
+    With a `shard`, only the orders of that shard are discovered and the
+    watermark is kept in a file of its own. With `rescan`, the stored
+    watermark is ignored and every file is discovered again.
+    """
+    YIELD_EVERY = 1000
+
+    def __init__(
+        self,
+        inbound_dir: str | None = None,
+        watermark_path: str | None = None,
+        shard: Shard | None = None,
+        rescan: bool = False,
+    ):
+        self.inbound_dir = inbound_dir or str(os.getenv("DATA_INBOUND_DIR", "data/inbound"))
+        self.shard = shard
+        self.watermark_path = watermark_path or str(
+            os.getenv("INBOUND_WATERMARK_PATH", "data/state/inbound_watermark.json")
+        )
+        if shard is not None:
+            root, extension = os.path.splitext(self.watermark_path)
+            self.watermark_path = f"{root}.{shard.suffix}{extension}"
+        self.margin_ns = int(os.getenv("INBOUND_WATERMARK_MARGIN_MS", "2000")) * 1_000_000
+        self._baseline_watermark_ns, self._baseline_seen = (0, {}) if rescan else self._load_watermark()
+        self._watermark_ns, self._seen = self._baseline_watermark_ns, dict(self._baseline_seen)
+
+    def _load_watermark(self) -> tuple[int, dict]:
+        try:
+            with open(self.watermark_path, "r") as watermark_file:
+                data = json.load(watermark_file)
+                # Watermarks saved before ctime was taken into account only hold "mtime_ns".
+                return int(data.get("changed_ns", data.get("mtime_ns", 0))), dict(data.get("seen", {}))
+        except FileNotFoundError:
+            return 0, {}
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            logger.error(f"Ignoring invalid inbound watermark {self.watermark_path}: {str(e)}")
+            return 0, {}
+
+    @staticmethod
+    def _changed_ns(stat: os.stat_result) -> int:
+        return max(stat.st_mtime_ns, stat.st_ctime_ns)
+
+    def _is_new_or_changed(self, name: str, stat: os.stat_result) -> bool:
+        changed_ns = self._changed_ns(stat)
+        if changed_ns < self._baseline_watermark_ns:
+            return False
+        # Watermarks saved before the margin was introduced hold sizes only; those files are rechecked once.
+        return self._baseline_seen.get(name) != [changed_ns, stat.st_size]
+
+    async def discover(self) -> AsyncIterator[int]:
+        """Lazily yield the order numbers of new or changed `{orderNo}.json` files.
+
+        The watermark only moves once the whole folder has been scanned.
+        """
+        logger.info(f"Scanning {self.inbound_dir} for new or changed workorders.")
+        # Taken before listing: anything the listing misses is changed after it.
+        watermark_ns = max(self._watermark_ns, time.time_ns() - self.margin_ns)
+        seen = {}
+        with os.scandir(self.inbound_dir) as entries:
+            for index, entry in enumerate(entries):
+                if index % self.YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                changed = self._is_new_or_changed(entry.name, stat)
+                if changed:
+                    order_no = self._order_number(entry.name)
+                    if not self._owns(order_no):
+                        continue
+                changed_ns = self._changed_ns(stat)
+                if changed_ns >= watermark_ns:
+                    # Unchanged files past the watermark were kept by an earlier scan, so they are ours.
+                    seen[entry.name] = [changed_ns, stat.st_size]
+                if changed and order_no is not None:
+                    yield order_no
+        self._watermark_ns, self._seen = watermark_ns, seen
+
+    def observe(self, name: str) -> int | None:
+        """Account for a file reported as created or modified and return its order number."""
+        if not name.endswith(".json"):
+            return None
+        order_no = self._order_number(name)
+        if not self._owns(order_no):
+            return None
+        try:
+            stat = os.stat(os.path.join(self.inbound_dir, name))
+        except FileNotFoundError:
+            return None
+        self._seen[name] = [self._changed_ns(stat), stat.st_size]
+        return order_no
+
+    def _owns(self, order_no: int | None) -> bool:
+        return self.shard is None or (order_no is not None and self.shard.owns(order_no))
+
+    def rebase(self) -> None:
+        """Compare later scans with the files discovered so far instead of the stored watermark."""
+        self._baseline_watermark_ns, self._baseline_seen = self._watermark_ns, dict(self._seen)
+
+    @staticmethod
+    def _order_number(name: str) -> int | None:
+        try:
+            return int(name[: -len(".json")])
+        except ValueError:
+            logger.warning(f"Skipping inbound file with unexpected name: {name}")
+            return None
+
+    def commit(self) -> None:
+        """Persist the watermark reached by the files discovered so far."""
+        directory = os.path.dirname(self.watermark_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.watermark_path}.tmp"
+        with open(temp_path, "w") as watermark_file:
+            json.dump({"changed_ns": self._watermark_ns, "seen": self._seen}, watermark_file)
+        os.replace(temp_path, self.watermark_path)
+        logger.info(f"Inbound watermark saved to {self.watermark_path}.")
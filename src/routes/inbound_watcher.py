@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator
+
+from routes.inbound_discovery import InboundDiscovery
+
+try:
+    from watchfiles import Change, awatch
+except ImportError:  # optional dependency, inotify/FSEvents watching
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+
+class InboundWatcher:
+    """Stay resident and yield inbound order numbers as their files are created or modified.
+
+    Pending files are processed first with a regular discovery scan. After
+    that, file system events are read through `watchfiles` (inotify on Linux)
+    when it is installed, otherwise the folder is rescanned by change time every
+    `poll_interval` seconds. Events are coalesced per order file: an order is
+    yielded once its file has been quiet for `debounce` seconds, so a file that
+    is still being written is not read half-way. `yielded` counts the orders
+    handed out and `idle` tells when none is waiting in the watcher, so the
+    caller can save the discovery watermark once it processed them all.
+    """
+    def __init__(
+        self,
+        discovery: InboundDiscovery | None = None,
+        debounce: float | None = None,
+        poll_interval: float | None = None,
+        use_native: bool | None = None,
+    ):
+        self.discovery = discovery or InboundDiscovery()
+        self.debounce = debounce if debounce is not None else int(os.getenv("INBOUND_DEBOUNCE_MS", "100")) / 1000
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv("INBOUND_POLL_INTERVAL", "1.0"))
+        if use_native is None:
+            use_native = os.getenv("INBOUND_WATCH_POLLING", "false").lower() not in ("1", "true", "yes")
+        self.use_native = use_native and awatch is not None
+        self.yielded = 0
+        self._scanning = True
+        self._changes: asyncio.Queue = asyncio.Queue()
+        self._pending: dict[int, float] = {}
+
+    @property
+    def idle(self) -> bool:
+        """Whether every change discovered so far has been yielded."""
+        return not self._scanning and self._changes.empty() and not self._pending
+
+    async def watch(self, stop_event: asyncio.Event) -> AsyncIterator[int]:
+        """Yield the order numbers of changed inbound files until `stop_event` is set."""
+        self._scanning = True
+        async for order_no in self.discovery.discover():
+            self.yielded += 1
+            yield order_no
+        self.discovery.rebase()
+        self._scanning = False
+
+        changes = self._changes
+        produce = self._native_changes if self.use_native else self._polled_changes
+        producer = asyncio.create_task(produce(changes, stop_event))
+        logger.info(
+            f"Watching {self.discovery.inbound_dir} "
+            f"({'file system events' if self.use_native else 'change-time polling'})."
+        )
+        loop = asyncio.get_running_loop()
+        pending = self._pending
+        try:
+            while True:
+                now = loop.time()
+                for order_no in [n for n, seen in pending.items() if now - seen >= self.debounce]:
+                    del pending[order_no]
+                    self.yielded += 1
+                    yield order_no
+                timeout = min(pending.values()) + self.debounce - now if pending else None
+                try:
+                    order_no = await asyncio.wait_for(changes.get(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+                if order_no is None:
+                    break
+                pending[order_no] = loop.time()
+            for order_no in list(pending):
+                del pending[order_no]
+                self.yielded += 1
+                yield order_no
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def _native_changes(self, changes: asyncio.Queue, stop_event: asyncio.Event) -> None:
+        try:
+            async for batch in awatch(self.discovery.inbound_dir, stop_event=stop_event, recursive=False):
+                for change, path in batch:
+                    if change == Change.deleted:
+                        continue
+                    order_no = self.discovery.observe(os.path.basename(path))
+                    if order_no is not None:
+                        changes.put_nowait(order_no)
+        finally:
+            changes.put_nowait(None)
+
+    async def _polled_changes(self, changes: asyncio.Queue, stop_event: asyncio.Event) -> None:
+        try:
+            while not stop_event.is_set():
+                try:
+                    await asyncio.wait_for(stop_event.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                async for order_no in self.discovery.discover():
+                    changes.put_nowait(order_no)
+                self.discovery.rebase()
+        finally:
+            changes.put_nowait(None)
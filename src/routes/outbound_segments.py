@@ -0,0 +1,343 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PART_SUFFIX = ".part"
+OPEN_SUFFIX = ".open"
+MANIFEST_NAME = "manifest.ndjson"
+# Unlocked `.open` files older than this were left by a writer that crashed before locking them.
+OPEN_GRACE_SECONDS = 60
+
+
+class OutboundSegmentWriter:
+    """Append outbound workorders as NDJSON lines to rotating segment files.
+
+    Lines go to `segment-<time>-<pid>-<n>.ndjson[.gz|.zst].part`; once a
+    segment reaches `max_records` lines or `max_bytes` uncompressed bytes, has
+    been open for `max_age` seconds (see `seal_if_expired()`), or on `seal()`
+    at the end of a run, it is renamed without `.part` and
+    described by one line of `manifest.ndjson` (name, records, lowest and
+    highest orderNo, size, sha256), so loaders only ever see complete segments.
+    Compressed segments are flushed at every append, so a segment left behind
+    by a crashed run stays readable up to its last append; such segments are
+    sealed as "recovered" by `recover()`, which the next writer on the folder
+    runs (off the event loop) before its first write. A segment is
+    created as `.open` and only renamed to `.part` once its writer holds the
+    flock, so recovery never mistakes a segment being opened for a dead one.
+    An `ack` may be appended with each line; it is handed back by
+    `take_sealed_acks()` once the segment holding the line is sealed (and
+    fsynced, with `fsync`).
+    """
+    COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+    def __init__(
+        self,
+        directory: str,
+        max_records: int | None = None,
+        max_bytes: int | None = None,
+        compression: str | None = None,
+        fsync: bool = False,
+        max_age: float | None = None,
+    ):
+        self.directory = directory
+        self.max_records = max_records or int(os.getenv("OUTBOUND_SEGMENT_MAX_RECORDS", "100000"))
+        self.max_bytes = max_bytes or int(os.getenv("OUTBOUND_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.max_age = max_age if max_age is not None else float(os.getenv("OUTBOUND_SEGMENT_MAX_AGE", "60"))
+        self.compression = compression or os.getenv("OUTBOUND_COMPRESSION", "none")
+        if self.compression not in self.COMPRESSIONS:
+            raise ValueError(f"Invalid outbound compression {self.compression!r}, expected one of {tuple(self.COMPRESSIONS)}")
+        if self.compression == "zstd" and zstandard is None:
+            raise ValueError("zstd outbound compression needs the zstandard package (pip install zstandard)")
+        self.fsync = fsync
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._raw = None
+        self._stream = None
+        self._path = None
+        self._records = 0
+        self._bytes = 0
+        self._min = None
+        self._max = None
+        self._opened_at = None
+        self._acks: List[Any] = []
+        self._sealed_acks: List[Any] = []
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, order_numbers: List[int], lines: List[bytes], acks: List[Any] | None = None) -> None:
+        """Append one NDJSON line per workorder, rolling over to a new segment when the current one is full or expired.
+
+        If the append fails part-way, the acks of the whole batch are dropped
+        before the error is raised, so none of its workorders is acknowledged.
+        """
+        with self._lock:
+            try:
+                self._append(order_numbers, lines, acks)
+            except Exception:
+                if acks is not None:
+                    batch = {id(ack) for ack in acks}
+                    self._acks = [ack for ack in self._acks if id(ack) not in batch]
+                    self._sealed_acks = [ack for ack in self._sealed_acks if id(ack) not in batch]
+                raise
+
+    def _append(self, order_numbers: List[int], lines: List[bytes], acks: List[Any] | None) -> None:
+        if self._expired():
+            self._seal()
+        for index, (order_no, line) in enumerate(zip(order_numbers, lines)):
+            if self._stream is None:
+                self._open()
+            self._stream.write(line)
+            if acks is not None:
+                self._acks.append(acks[index])
+            self._records += 1
+            self._bytes += len(line)
+            self._min = order_no if self._min is None else min(self._min, order_no)
+            self._max = order_no if self._max is None else max(self._max, order_no)
+            if self._records >= self.max_records or self._bytes >= self.max_bytes:
+                self._seal()
+        if self._stream is not None:
+            self._flush()
+
+    def seal(self) -> dict | None:
+        """Close the current segment and add it to the manifest; returns its manifest entry, if any."""
+        with self._lock:
+            return self._seal()
+
+    def seal_if_expired(self) -> dict | None:
+        """`seal()` the current segment if it has been open for `max_age` seconds, so an idle stream still rolls over."""
+        with self._lock:
+            return self._seal() if self._expired() else None
+
+    def take_sealed_acks(self) -> List[Any]:
+        """Return, and forget, the acks of the lines in the segments sealed so far."""
+        with self._lock:
+            acks, self._sealed_acks = self._sealed_acks, []
+        return acks
+
+    def _expired(self) -> bool:
+        return (
+            self._stream is not None
+            and self.max_age > 0
+            and time.monotonic() - self._opened_at >= self.max_age
+        )
+
+    def recover(self) -> List[dict]:
+        """Seal the `.part` segments left by writers that are no longer running."""
+        if fcntl is None:
+            return []
+        recovered = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith("segment-") and name.endswith(OPEN_SUFFIX):
+                self._remove_abandoned(os.path.join(self.directory, name))
+                continue
+            if not (name.startswith("segment-") and name.endswith(PART_SUFFIX)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                part_file = open(path, "rb+")
+            except FileNotFoundError:
+                continue
+            with part_file:
+                try:
+                    fcntl.flock(part_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                if not _still_at(part_file, path):
+                    # Sealed by its writer between the listing and the lock.
+                    continue
+                if name.endswith(".ndjson" + PART_SUFFIX):
+                    records = self._truncate_partial_line(part_file)
+                    entry = self._finish(path, records=records, lowest=None, highest=None, recovered=True)
+                else:
+                    entry = self._recover_compressed(path, part_file)
+            if entry is not None:
+                recovered.append(entry)
+                logger.warning(f"Recovered outbound segment {entry['segment']} left by an interrupted run.")
+        return recovered
+
+    def _recover_compressed(self, path: str, part_file) -> dict | None:
+        """Seal a compressed segment cut short by a crash as a complete stream of its readable lines.
+
+        Such a segment has no gzip trailer or zstd frame end, so its flushed
+        blocks are decompressed and written again, properly ended, before it is
+        sealed: loaders can read every recovered segment to the end.
+        """
+        compression = "gzip" if path.endswith(".gz" + PART_SUFFIX) else "zstd"
+        if compression == "zstd" and zstandard is None:
+            logger.error(f"Cannot recover {path} without the zstandard package (pip install zstandard).")
+            return None
+        lines = _readable_lines(part_file.read(), compression)
+        content = b""
+        if lines:
+            content = gzip.compress(lines) if compression == "gzip" else zstandard.ZstdCompressor().compress(lines)
+        # Rewritten under a locked name recovery ignores, then moved over the `.part` with its lock.
+        rewrite_path = path[: -len(PART_SUFFIX)] + OPEN_SUFFIX
+        with open(rewrite_path, "wb") as rewrite_file:
+            fcntl.flock(rewrite_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            rewrite_file.write(content)
+            rewrite_file.flush()
+            if self.fsync:
+                os.fsync(rewrite_file.fileno())
+            os.replace(rewrite_path, path)
+            return self._finish(path, records=lines.count(b"\n"), lowest=None, highest=None, recovered=True)
+
+    def _remove_abandoned(self, open_path: str) -> None:
+        """Remove a `.open` file whose writer died before locking it; recent ones may still be locked any moment."""
+        try:
+            with open(open_path, "rb") as open_file:
+                if time.time() - os.fstat(open_file.fileno()).st_mtime < OPEN_GRACE_SECONDS:
+                    return
+                fcntl.flock(open_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if _still_at(open_file, open_path):
+                    os.remove(open_path)
+        except OSError:
+            return
+
+    def _open(self) -> None:
+        self._counter += 1
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        name = f"segment-{timestamp}-{os.getpid()}-{self._counter:06d}.ndjson{self.COMPRESSIONS[self.compression]}"
+        self._path = os.path.join(self.directory, name + PART_SUFFIX)
+        if fcntl is not None:
+            open_path = os.path.join(self.directory, name + OPEN_SUFFIX)
+            self._raw = open(open_path, "wb")
+            fcntl.flock(self._raw, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(open_path, self._path)
+        else:
+            self._raw = open(self._path, "wb")
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._records = 0
+        self._bytes = 0
+        self._min = None
+        self._max = None
+        self._opened_at = time.monotonic()
+
+    def _flush(self) -> None:
+        if self.compression == "gzip":
+            self._stream.flush(zlib.Z_SYNC_FLUSH)
+        elif self.compression == "zstd":
+            self._stream.flush(zstandard.FLUSH_BLOCK)
+        self._raw.flush()
+
+    def _seal(self) -> dict | None:
+        if self._stream is None:
+            return None
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.flush()
+        if self.fsync:
+            os.fsync(self._raw.fileno())
+        entry = self._finish(self._path, self._records, self._min, self._max)
+        self._raw.close()
+        self._raw = self._stream = self._path = None
+        self._sealed_acks.extend(self._acks)
+        self._acks = []
+        return entry
+
+    def _finish(self, part_path: str, records: int | None, lowest: int | None, highest: int | None, recovered: bool = False) -> dict | None:
+        """Rename a finished segment into place and append its entry to the manifest."""
+        path = part_path[: -len(PART_SUFFIX)]
+        digest = hashlib.sha256()
+        size = 0
+        with open(part_path, "rb") as segment_file:
+            for block in iter(lambda: segment_file.read(1024 * 1024), b""):
+                digest.update(block)
+                size += len(block)
+        if size == 0:
+            os.remove(part_path)
+            return None
+        os.replace(part_path, path)
+        if self.fsync:
+            _fsync_directory(self.directory)
+        entry = {
+            "segment": os.path.basename(path),
+            "records": records,
+            "minOrderNo": lowest,
+            "maxOrderNo": highest,
+            "compression": next(
+                (name for name, extension in self.COMPRESSIONS.items() if extension and path.endswith(extension)),
+                "none",
+            ),
+            "bytes": size,
+            "sha256": digest.hexdigest(),
+            "sealedAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+        if recovered:
+            entry["recovered"] = True
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        fd = os.open(self.manifest_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        logger.info(f"Outbound segment {entry['segment']} sealed with {records} workorders.")
+        return entry
+
+    @staticmethod
+    def _truncate_partial_line(part_file) -> int:
+        """Drop a last line cut short by a crash from a plain NDJSON segment and return its complete lines."""
+        content = part_file.read()
+        end = content.rfind(b"\n") + 1
+        if end < len(content):
+            part_file.truncate(end)
+        return content.count(b"\n", 0, end)
+
+
+def _readable_lines(content: bytes, compression: str) -> bytes:
+    """Decompress the complete lines of a gzip or zstd stream cut short by a crash."""
+    if compression == "gzip":
+        decompressor, errors = zlib.decompressobj(31), (zlib.error,)
+    else:
+        decompressor, errors = zstandard.ZstdDecompressor().decompressobj(), (zstandard.ZstdError,)
+    chunks = []
+    for start in range(0, len(content), 1024 * 1024):
+        try:
+            chunks.append(decompressor.decompress(content[start : start + 1024 * 1024]))
+        except errors:
+            break
+    data = b"".join(chunks)
+    return data[: data.rfind(b"\n") + 1]
+
+
+def _still_at(opened_file, path: str) -> bool:
+    """Whether `path` still names the file opened as `opened_file` (it was not renamed or removed since)."""
+    try:
+        return os.path.samestat(os.fstat(opened_file.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+def _fsync_directory(directory: str) -> None:
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
@@ -15,4 +15,17 @@ class CustomerSystemWorkorderSchema(BaseModel):
     summary: str
     creationDate: datetime
     lastUpdateDate: datetime
-    deletedDate: datetime | None = None
\ No newline at end of file
+    deletedDate: datetime | None = None
+
+
+class CustomerInboundWorkorderSchema(CustomerSystemWorkorderSchema):
+    """Inbound file payload, where the status flags and summary may be omitted."""
+    orderNo: int = 0
+    isActive: bool = True
+    isCanceled: bool = False
+    isDeleted: bool = False
+    isDone: bool = False
+    isOnHold: bool = False
+    isPending: bool = False
+    isSynced: bool = False
+    summary: str = ""
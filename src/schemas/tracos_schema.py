@@ -16,6 +16,7 @@ class TracOSWorkorderSchema(BaseModel):
     deletedAt: Optional[datetime] = None
     isSynced: bool = False
     syncedAt: Optional[datetime] = None 
+    contentHash: Optional[str] = None
 
     model_config = ConfigDict(
         arbitrary_types_allowed = True,
@@ -23,3 +24,7 @@ class TracOSWorkorderSchema(BaseModel):
     )
 
 
+class WorkorderUpsertResult(BaseModel):
+    number: int
+    status: Literal["inserted", "matched", "error"]
+    error: Optional[str] = None
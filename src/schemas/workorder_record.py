@@ -0,0 +1,104 @@
+import sys
+from datetime import datetime, timedelta, timezone
+
+from schemas.customer_schema import CustomerSystemWorkorderSchema
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+FLAG_NAMES = ("isActive", "isCanceled", "isDeleted", "isDone", "isOnHold", "isPending", "isSynced")
+FLAG_BITS = {name: 1 << bit for bit, name in enumerate(FLAG_NAMES)}
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microseconds since the epoch (naive values are taken as local time, like astimezone())."""
+    return (value.astimezone(timezone.utc) - EPOCH) // ONE_MICROSECOND
+
+
+def from_epoch_us(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+class WorkorderRecord:
+    """Compact internal form of a customer workorder, for batch modes holding many orders.
+
+    The status flags are packed in one int, dates are epoch microseconds,
+    summaries are interned and the content hash is kept as raw bytes. Pydantic
+    models are only built back with `to_customer()` where an API needs one.
+    """
+    __slots__ = ("number", "flags", "created_us", "updated_us", "deleted_us", "summary", "content_hash")
+
+    def __init__(
+        self,
+        number: int,
+        flags: int,
+        created_us: int,
+        updated_us: int,
+        deleted_us: int | None = None,
+        summary: str = "",
+        content_hash: bytes | None = None,
+    ):
+        self.number = number
+        self.flags = flags
+        self.created_us = created_us
+        self.updated_us = updated_us
+        self.deleted_us = deleted_us
+        self.summary = sys.intern(summary)
+        self.content_hash = content_hash
+
+    @classmethod
+    def from_customer(cls, payload: CustomerSystemWorkorderSchema, content_hash: bytes | None = None) -> "WorkorderRecord":
+        flags = 0
+        for name, bit in FLAG_BITS.items():
+            if getattr(payload, name):
+                flags |= bit
+        return cls(
+            number=payload.orderNo,
+            flags=flags,
+            created_us=to_epoch_us(payload.creationDate),
+            updated_us=to_epoch_us(payload.lastUpdateDate),
+            deleted_us=to_epoch_us(payload.deletedDate) if payload.deletedDate else None,
+            summary=payload.summary,
+            content_hash=content_hash,
+        )
+
+    def flag(self, name: str) -> bool:
+        return bool(self.flags & FLAG_BITS[name])
+
+    @property
+    def status_flags(self) -> tuple[bool, bool, bool, bool, bool]:
+        """(isCanceled, isDeleted, isDone, isOnHold, isPending), the key of the status lookup table."""
+        return (
+            self.flag("isCanceled"), self.flag("isDeleted"), self.flag("isDone"),
+            self.flag("isOnHold"), self.flag("isPending"),
+        )
+
+    @property
+    def created_at(self) -> datetime:
+        return from_epoch_us(self.created_us)
+
+    @property
+    def updated_at(self) -> datetime:
+        return from_epoch_us(self.updated_us)
+
+    @property
+    def deleted_at(self) -> datetime | None:
+        return from_epoch_us(self.deleted_us) if self.deleted_us is not None else None
+
+    def to_customer(self) -> CustomerSystemWorkorderSchema:
+        return CustomerSystemWorkorderSchema(
+            orderNo=self.number,
+            **{name: self.flag(name) for name in FLAG_NAMES},
+            summary=self.summary,
+            creationDate=self.created_at,
+            lastUpdateDate=self.updated_at,
+            deletedDate=self.deleted_at,
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, WorkorderRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"WorkorderRecord(number={self.number}, flags={self.flags:#09b}, updated_us={self.updated_us})"
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from pydantic import BaseModel
+
+from routes.costumer_routes import IOHelper
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterStore:
+    """Append-only JSONL log of the workorders a run failed to sync, replayed with `--replay`.
+
+    Each line holds the orderNo, the stage that failed, the error, the customer
+    payload when it could be read and the failure time. It is a local file
+    rather than a MongoDB collection so failures caused by a MongoDB outage
+    are recorded too. Every record is a single O_APPEND write, so concurrent
+    workers can share the file; the latest record of an order wins. Appends
+    run on the shared IOHelper executor, like the other file I/O.
+    """
+    def __init__(self, path: str | None = None):
+        self.path = path or str(os.getenv("DEAD_LETTER_PATH", "data/state/dead_letters.jsonl"))
+        self.recorded = 0
+        self.recorded_numbers: set[int] = set()
+
+    async def record(self, order_no: int, stage: str, error: str, payload: Any = None) -> None:
+        """Append a failed workorder to the store."""
+        if isinstance(payload, BaseModel):
+            payload = payload.model_dump(mode="json")
+        line = json.dumps(
+            {
+                "orderNo": order_no,
+                "stage": stage,
+                "error": error,
+                "payload": payload,
+                "failedAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            },
+            default=str,
+        )
+        try:
+            await asyncio.get_running_loop().run_in_executor(IOHelper.executor(), self._append, line + "\n")
+            self.recorded += 1
+            self.recorded_numbers.add(order_no)
+            logger.info(f"Workorder {order_no} dead-lettered at stage {stage}: {error}")
+        except OSError as e:
+            logger.error(f"Error dead-lettering workorder {order_no} in {self.path}: {e}")
+
+    def _append(self, line: str) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def pending(self) -> dict[int, dict]:
+        """Return the latest record of every dead-lettered workorder, keyed by orderNo."""
+        records: dict[int, dict] = {}
+        try:
+            with open(self.path, "r") as dead_letter_file:
+                for line_number, line in enumerate(dead_letter_file, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        records[int(record["orderNo"])] = record
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.error(f"Skipping invalid dead letter at {self.path}:{line_number}: {e}")
+        except FileNotFoundError:
+            return {}
+        return records
+
+    def resolve(self, order_numbers: Iterable[int]) -> int:
+        """Drop the given workorders from the store and return how many remain dead-lettered.
+
+        The file is rewritten with the latest record of every other workorder,
+        so it must not be called while another process is appending to it.
+        """
+        resolved = set(order_numbers)
+        remaining = {
+            order_no: record for order_no, record in self.pending().items() if order_no not in resolved
+        }
+        if not remaining:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return 0
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as dead_letter_file:
+            for record in remaining.values():
+                dead_letter_file.write(json.dumps(record, default=str) + "\n")
+        os.replace(temp_path, self.path)
+        return len(remaining)
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger(__name__)
+
+_client: AsyncIOMotorClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def mongo_client_options() -> dict:
+    """Connection-pool and write-concern options read from the environment."""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    }
+    if os.getenv("MONGO_MAX_IDLE_TIME_MS"):
+        options["maxIdleTimeMS"] = int(os.getenv("MONGO_MAX_IDLE_TIME_MS"))
+    if os.getenv("MONGO_COMPRESSORS"):
+        options["compressors"] = os.getenv("MONGO_COMPRESSORS")
+    if os.getenv("MONGO_WRITE_CONCERN_W"):
+        w = os.getenv("MONGO_WRITE_CONCERN_W")
+        options["w"] = int(w) if w.isdigit() else w
+    if os.getenv("MONGO_WRITE_CONCERN_JOURNAL"):
+        options["journal"] = os.getenv("MONGO_WRITE_CONCERN_JOURNAL").lower() == "true"
+    return options
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_mongo_client() -> AsyncIOMotorClient:
+    """Return the process-wide Motor client, creating it on first use.
+
+    Motor binds a client to the event loop it first runs on, so a new client is
+    created if the running loop changed (e.g. between test cases), after
+    closing the old one to release its connection pool and monitor threads.
+    """
+    global _client, _client_loop
+    loop = _running_loop()
+    if _client is not None and _client_loop is not None and loop is not None and loop is not _client_loop:
+        close_mongo_client()
+    if _client is None:
+        options = mongo_client_options()
+        _client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), **options)
+        _client_loop = loop
+        logger.info(f"Created MongoDB client with options {options}")
+    elif _client_loop is None:
+        _client_loop = loop
+    return _client
+
+
+def close_mongo_client() -> None:
+    """Close the process-wide Motor client and release its connection pool."""
+    global _client, _client_loop
+    if _client is not None:
+        _client.close()
+        logger.info("MongoDB client closed.")
+    _client = None
+    _client_loop = None
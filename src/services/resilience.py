@@ -0,0 +1,203 @@
+import asyncio
+import errno
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, PyMongoError, WTimeoutError
+
+from observability.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRNOS = frozenset({errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR, errno.EBUSY})
+TRANSIENT_ERROR_LABELS = ("RetryableWriteError", "TransientTransactionError")
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """True for failures worth retrying: timeouts, lost or re-electing primaries, busy disks.
+
+    AutoReconnect, NotPrimaryError, NetworkTimeout and ServerSelectionTimeoutError
+    are all ConnectionFailure subclasses; other server errors count when the
+    server labels them retryable.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, PyMongoError):
+        if isinstance(error, (ConnectionFailure, ExecutionTimeout, WTimeoutError)):
+            return True
+        return any(error.has_error_label(label) for label in TRANSIENT_ERROR_LABELS)
+    if isinstance(error, OSError):
+        return error.errno in TRANSIENT_ERRNOS
+    return False
+
+
+class RetryPolicy:
+    """How many times to try an operation, how long each attempt may take and how long to back off."""
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.1,
+        max_delay: float = 5.0,
+        timeout: float | None = 10.0,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout or None
+
+    @classmethod
+    def from_env(cls, dependency: str, default_timeout: float = 10.0) -> "RetryPolicy":
+        """RETRY_* variables, plus the per-dependency {DEPENDENCY}_OPERATION_TIMEOUT (0 disables it)."""
+        return cls(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY", "0.1")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY", "5.0")),
+            timeout=float(os.getenv(f"{dependency.upper()}_OPERATION_TIMEOUT", str(default_timeout))),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Stop hammering a dependency that keeps failing.
+
+    After `failure_threshold` consecutive transient failures the circuit opens
+    and `acquire()` makes every caller wait `reset_timeout` seconds, which
+    pauses the pipeline instead of failing the rest of the queue. Then one
+    probe call goes through (half-open): success closes the circuit, another
+    transient failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_threshold=int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "10.0")),
+        )
+
+    async def acquire(self) -> None:
+        """Return once a call may go through, waiting while the circuit is open."""
+        while self.state != self.CLOSED:
+            now = self.clock()
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - now
+                if remaining <= 0:
+                    self.state = self.HALF_OPEN
+                    self._probe_started_at = now
+                    logger.info(f"Circuit {self.name} half-open, probing.")
+                    return
+                await asyncio.sleep(remaining)
+            elif now - self._probe_started_at >= self.reset_timeout:
+                # The probe never reported back (e.g. it was cancelled): let another one through.
+                self._probe_started_at = now
+                return
+            else:
+                await asyncio.sleep(min(0.1, self.reset_timeout))
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed.")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self._opened_at = self.clock()
+            self.opened += 1
+            metrics.inc("circuit_opened", dependency=self.name)
+            logger.warning(
+                f"Circuit {self.name} open after {self.consecutive_failures} consecutive transient errors, "
+                f"pausing calls for {self.reset_timeout}s."
+            )
+
+
+class Resilience:
+    """Per-operation timeout, retries with backoff and a circuit breaker around one dependency."""
+    def __init__(self, name: str, policy: RetryPolicy | None = None, breaker: CircuitBreaker | None = None):
+        self.name = name
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.retries = 0
+
+    @classmethod
+    def from_env(cls, name: str, default_timeout: float = 10.0) -> "Resilience":
+        return cls(name, RetryPolicy.from_env(name, default_timeout), CircuitBreaker.from_env(name))
+
+    async def call(self, operation: str, function: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await `function(*args, **kwargs)`, retrying transient errors; the last error is raised."""
+        attempt = 0
+        while True:
+            await self.breaker.acquire()
+            try:
+                if self.policy.timeout:
+                    result = await asyncio.wait_for(function(*args, **kwargs), self.policy.timeout)
+                else:
+                    result = await function(*args, **kwargs)
+            except Exception as e:
+                if not is_transient_error(e):
+                    # The dependency answered, it just refused this call.
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.policy.max_attempts:
+                    logger.error(f"{self.name} {operation} failed after {attempt} attempts: {e!r}")
+                    raise
+                delay = self.policy.backoff(attempt - 1)
+                self.retries += 1
+                metrics.inc("retries", dependency=self.name, operation=operation)
+                logger.warning(
+                    f"{self.name} {operation} failed with {e!r}, retry {attempt} of "
+                    f"{self.policy.max_attempts - 1} in {delay:.2f}s."
+                )
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+
+_DEFAULT_TIMEOUTS = {"mongo": 10.0, "disk": 30.0}
+_resiliences: dict[str, Resilience] = {}
+
+
+def get_resilience(name: str) -> Resilience:
+    """Return the process-wide Resilience of a dependency ("mongo", "disk"), so callers share its breaker."""
+    resilience = _resiliences.get(name)
+    if resilience is None:
+        resilience = _resiliences[name] = Resilience.from_env(name, _DEFAULT_TIMEOUTS.get(name, 10.0))
+    return resilience
+
+
+def retry_counts() -> dict[str, int]:
+    """Retries made so far in this process, per dependency."""
+    return {name: resilience.retries for name, resilience in _resiliences.items()}
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from observability.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SyncAckBuffer:
+    """Collect the workorders whose outbound files were written and mark them synced in batches.
+
+    Each acknowledgement is the order number plus the updatedAt of the
+    exported version, so a newer version upserted before the flush is left
+    unsynced for the next export. A flush happens when `max_size`
+    acknowledgements are pending or every `flush_interval` seconds, and
+    always on `close()`. After a failed flush the next attempts back off
+    exponentially, up to `max_backoff` seconds, instead of retrying on every
+    `add`; once `max_pending` acknowledgements are waiting, `add` holds its
+    caller until a flush makes room.
+    """
+    def __init__(
+        self,
+        tracos_service,
+        max_size: int | None = None,
+        flush_interval: float | None = None,
+        max_pending: int | None = None,
+        max_backoff: float | None = None,
+    ):
+        self.tracos_service = tracos_service
+        self.max_size = max_size or int(os.getenv("SYNC_ACK_BATCH_SIZE", "500"))
+        self.flush_interval = flush_interval or float(os.getenv("SYNC_ACK_FLUSH_INTERVAL", "1.0"))
+        self.max_pending = max(max_pending or int(os.getenv("SYNC_ACK_MAX_PENDING", "10000")), self.max_size)
+        self.max_backoff = max_backoff or float(os.getenv("SYNC_ACK_MAX_BACKOFF", "30"))
+        self._pending: list[tuple[int, datetime]] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    async def __aenter__(self) -> "SyncAckBuffer":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        """Start the time-triggered flush loop."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def add(self, number: int, updated_at: datetime) -> None:
+        """Acknowledge a durably written outbound workorder, as of its exported updatedAt."""
+        while len(self._pending) >= self.max_pending:
+            # Backpressure: MongoDB is not keeping up, hold the writer until a flush makes room.
+            await asyncio.sleep(max(self._retry_at - asyncio.get_running_loop().time(), 0))
+            await self.flush()
+        self._pending.append((number, updated_at))
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+
+    async def flush(self, force: bool = False) -> int:
+        """Mark every pending acknowledgement as synced with a single bulk write.
+
+        Until the backoff after a failed flush has elapsed this does nothing,
+        unless `force` is set.
+        """
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            if not self._pending or (not force and loop.time() < self._retry_at):
+                return 0
+            acks, self._pending = self._pending, []
+            modified = await self.tracos_service.mark_workorders_synced(acks)
+            if modified is None:
+                self._failures += 1
+                delay = min(self.flush_interval * 2 ** (self._failures - 1), self.max_backoff)
+                self._retry_at = loop.time() + delay
+                logger.error(f"Keeping {len(acks)} sync acknowledgements, next flush in {delay:.1f}s.")
+                metrics.inc("sync_ack_retries")
+                self._pending = acks + self._pending
+                return 0
+            self._failures = 0
+            self._retry_at = 0.0
+            metrics.inc("sync_acks", len(acks))
+            return modified
+
+    async def close(self) -> None:
+        """Stop the flush loop and flush whatever is still pending."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush(force=True)
+        if self._pending:
+            logger.error(f"{len(self._pending)} workorders could not be marked as synced.")
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
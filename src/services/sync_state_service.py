@@ -0,0 +1,108 @@
+import logging
+import os
+from typing import Any
+
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.mongo_client import get_mongo_client
+from services.resilience import Resilience, get_resilience
+
+logger = logging.getLogger(__name__)
+
+
+class SyncStateService:
+    """Persist sync checkpoints in the sync_state collection, with a local-file fallback.
+
+    Each checkpoint is a small document keyed by name (e.g. "outbound",
+    "outbound_stream"). Every MongoDB call goes through `resilience`
+    (timeouts, retries of transient errors and the shared circuit breaker).
+    When MongoDB cannot be reached the checkpoint is read from and written to
+    a JSON file instead, so a run can still resume; the next call that
+    reaches MongoDB writes the file back to the collection and removes it.
+    """
+    def __init__(
+        self,
+        client: AsyncIOMotorClient | None = None,
+        fallback_path: str | None = None,
+        resilience: Resilience | None = None,
+    ):
+        self.client = client or get_mongo_client()
+        self.resilience = resilience or get_resilience("mongo")
+        self.db = self.client[os.getenv("MONGO_DATABASE", "tractian")]
+        self.collection = self.db[os.getenv("MONGO_SYNC_STATE_COLLECTION", "sync_state")]
+        self.fallback_path = fallback_path or str(
+            os.getenv("SYNC_STATE_PATH", "data/state/sync_state.json")
+        )
+
+    async def get_checkpoint(self, name: str) -> dict | None:
+        """Return the stored checkpoint, or None when there is none."""
+        try:
+            await self._reconcile_fallback()
+            document = await self.resilience.call("get_checkpoint", self.collection.find_one, {"_id": name})
+            return document.get("value") if document else None
+        except Exception as e:
+            logger.error(f"Error reading checkpoint {name} from MongoDB, using {self.fallback_path}: {e}")
+            return self._read_fallback().get(name)
+
+    async def save_checkpoint(self, name: str, value: dict) -> None:
+        """Store the checkpoint, replacing the previous one."""
+        try:
+            await self._reconcile_fallback()
+            await self._save(name, value)
+            logger.info(f"Checkpoint {name} saved: {value}")
+        except Exception as e:
+            logger.error(f"Error saving checkpoint {name} to MongoDB, using {self.fallback_path}: {e}")
+            state = self._read_fallback()
+            state[name] = value
+            self._write_fallback(state)
+
+    async def clear_checkpoint(self, name: str) -> None:
+        """Remove the checkpoint."""
+        try:
+            await self._reconcile_fallback()
+            await self.resilience.call("clear_checkpoint", self.collection.delete_one, {"_id": name})
+            logger.info(f"Checkpoint {name} cleared.")
+        except Exception as e:
+            logger.error(f"Error clearing checkpoint {name} in MongoDB, using {self.fallback_path}: {e}")
+            state = self._read_fallback()
+            if state.pop(name, None) is not None:
+                self._write_fallback(state)
+
+    async def _save(self, name: str, value: dict) -> None:
+        await self.resilience.call(
+            "save_checkpoint", self.collection.update_one, {"_id": name}, {"$set": {"value": value}}, upsert=True
+        )
+
+    async def _reconcile_fallback(self) -> None:
+        """Write the checkpoints saved locally while MongoDB was unavailable back to it, then drop the file.
+
+        The local checkpoints are newer than the stored ones: the file only
+        exists while no save has reached MongoDB since it was written.
+        """
+        if not os.path.exists(self.fallback_path):
+            return
+        state = self._read_fallback()
+        for name, value in state.items():
+            await self._save(name, value)
+        os.remove(self.fallback_path)
+        logger.info(f"Checkpoints {sorted(state)} written back to MongoDB from {self.fallback_path}.")
+
+    def _read_fallback(self) -> dict[str, Any]:
+        try:
+            with open(self.fallback_path, "r") as state_file:
+                return json_util.loads(state_file.read())
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.error(f"Ignoring invalid sync state file {self.fallback_path}: {e}")
+            return {}
+
+    def _write_fallback(self, state: dict[str, Any]) -> None:
+        directory = os.path.dirname(self.fallback_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.fallback_path}.tmp"
+        with open(temp_path, "w") as state_file:
+            state_file.write(json_util.dumps(state))
+        os.replace(temp_path, self.fallback_path)
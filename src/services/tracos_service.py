@@ -1,34 +1,277 @@
+import asyncio
+import random
 from datetime import timezone, datetime
 from types import CoroutineType
-from typing import Any
-from schemas.tracos_schema import TracOSWorkorderSchema
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Union
+from schemas.tracos_schema import TracOSWorkorderSchema, WorkorderUpsertResult
 from motor.motor_asyncio import AsyncIOMotorClient
+from services.mongo_client import get_mongo_client
+from services.workorder_cache import WorkorderCache, as_stored
+from services.resilience import Resilience, get_resilience
+from observability.metrics import metrics
 import logging
 import os
 from bson.objectid import ObjectId
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 
 logger = logging.getLogger(__name__)
 
+WORKORDER_PROJECTION = {
+    field.alias or name: 1 for name, field in TracOSWorkorderSchema.model_fields.items()
+}
+
+FINGERPRINT_PROJECTION = {"_id": 0, "number": 1, "contentHash": 1, "updatedAt": 1, "isSynced": 1}
+
+WORKORDER_INDEXES = [
+    IndexModel([("number", ASCENDING)], name="number_unique", unique=True),
+    IndexModel(
+        [("isSynced", ASCENDING), ("_id", ASCENDING)],
+        name="unsynced_queue",
+        partialFilterExpression={"isSynced": False},
+    ),
+    IndexModel([("updatedAt", ASCENDING), ("_id", ASCENDING)], name="updated_at"),
+]
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a query issued by the service falls back to a collection scan."""
+
+
+def find_collection_scans(plan: Any) -> list[str]:
+    """Return the COLLSCAN stages found anywhere inside an explain() plan."""
+    if isinstance(plan, dict):
+        stages = ["COLLSCAN"] if plan.get("stage") == "COLLSCAN" else []
+        for value in plan.values():
+            stages.extend(find_collection_scans(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in find_collection_scans(item)]
+    return []
+
 
 class TracOsService:
-    """Service to handle operations related to TracOs."""
-    def __init__(self):
-        self.client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    """Service to handle operations related to TracOs.
+
+    With a `cache`, workorders written by the service are kept write-through
+    so reading them back (and repeated lookups of hot orders) skips MongoDB.
+    Every MongoDB call goes through `resilience` (timeouts, retries of
+    transient errors and the shared circuit breaker). Upserts return the
+    workorder as stored instead of reading it back; `verify_sample_rate`
+    (TRACOS_VERIFY_SAMPLE_RATE) is the share of upserted workorders the
+    pipeline still reads back to check them.
+    """
+    def __init__(
+        self,
+        client: AsyncIOMotorClient | None = None,
+        cache: WorkorderCache | None = None,
+        resilience: Resilience | None = None,
+        verify_sample_rate: float | None = None,
+    ):
+        self.client = client or get_mongo_client()
+        self.cache = cache
+        self.resilience = resilience or get_resilience("mongo")
+        if verify_sample_rate is None:
+            verify_sample_rate = float(os.getenv("TRACOS_VERIFY_SAMPLE_RATE", "0"))
+        self.verify_sample_rate = verify_sample_rate
         self.db = self.client[os.getenv("MONGO_DATABASE", "tractian")]
         self.collection = self.db[os.getenv("MONGO_COLLECTION", "workorders")]
+
+    async def ensure_indexes(self) -> list[str] | None:
+        """Create the indexes backing every query the service issues."""
+        try:
+            names = await self.collection.create_indexes(WORKORDER_INDEXES)
+            logger.info(f"Workorder indexes ensured: {names}")
+            return names
+        except OperationFailure as e:
+            logger.error(f"Error ensuring workorder indexes: {e}")
+            return None
+
+    def query_shapes(self) -> dict[str, dict]:
+        """Commands mirroring each query shape issued by the service, for explain()."""
+        name = self.collection.name
+        mark_synced = {"$set": {"isSynced": True, "syncedAt": None}}
+        return {
+            "get_workorder_by_number": {"find": name, "filter": {"number": 1}, "limit": 1},
+            "upsert_workorder": {
+                "findAndModify": name,
+                "query": {"number": 1},
+                "update": {"$set": {"isSynced": False}},
+                "upsert": True,
+                "new": True,
+                "fields": {"_id": 1},
+            },
+            "update_workorder": {"update": name, "updates": [{"q": {"number": 1}, "u": mark_synced}]},
+            "mark_workorders_synced": {
+                "update": name,
+                "updates": [{"q": {"number": 1, "updatedAt": datetime(2025, 1, 1)}, "u": mark_synced}],
+            },
+            "bulk_upsert_workorders": {
+                "update": name,
+                "updates": [{"q": {"number": 1}, "u": {"$set": {"isSynced": False}}, "upsert": True}],
+            },
+            "get_workorders_by_numbers": {
+                "find": name,
+                "filter": {"number": {"$in": [1, 2]}},
+                "projection": WORKORDER_PROJECTION,
+            },
+            "get_sync_fingerprints": {
+                "find": name,
+                "filter": {"number": {"$in": [1, 2]}},
+                "projection": FINGERPRINT_PROJECTION,
+            },
+            "iter_unsynced_workorders": {
+                "find": name,
+                "filter": {"isSynced": False},
+                "sort": {"_id": 1},
+                "projection": WORKORDER_PROJECTION,
+            },
+        }
+
+    async def explain_query_shapes(self) -> dict[str, list[str]]:
+        """Run explain() for every query shape and return the collection scans of each."""
+        scans = {}
+        for shape, command in self.query_shapes().items():
+            explanation = await self.db.command({"explain": command, "verbosity": "queryPlanner"})
+            scans[shape] = find_collection_scans(explanation.get("queryPlanner", explanation))
+            logger.info(f"Query shape {shape}: {'COLLSCAN' if scans[shape] else 'indexed'}")
+        return scans
+
+    async def verify_query_plans(self) -> None:
+        """Raise QueryPlanError if any query shape falls back to a collection scan."""
+        scans = await self.explain_query_shapes()
+        offenders = [shape for shape, stages in scans.items() if stages]
+        if offenders:
+            raise QueryPlanError(f"Query shapes falling back to a collection scan: {', '.join(offenders)}")
     
+    @metrics.timed("mongo_seconds", operation="get_workorder_by_number")
     async def get_workorder_by_number(self, number: int) -> TracOSWorkorderSchema | None:
         """Get workorder from the TracOs database."""
-        workorder = await self.collection.find_one({"number":number})
+        if self.cache is not None:
+            cached = self.cache.get(number)
+            if cached is not None:
+                return cached
+        workorder = await self.resilience.call("get_workorder_by_number", self.collection.find_one, {"number":number})
         logger.info(f"Workorder number {number} found in the TracOs database.")
-        return TracOSWorkorderSchema(**workorder)
+        workorder = TracOSWorkorderSchema(**workorder)
+        if self.cache is not None:
+            self.cache.put(workorder)
+        return workorder
     
+    @metrics.timed("mongo_seconds", operation="get_workorders_by_numbers")
+    async def get_workorders_by_numbers(self, numbers: list[int]) -> dict[int, TracOSWorkorderSchema]:
+        """Get many workorders with a single find, keyed by number; missing numbers are left out."""
+        workorders = {}
+        if self.cache is not None:
+            for number in numbers:
+                cached = self.cache.get(number)
+                if cached is not None:
+                    workorders[number] = cached
+            numbers = [number for number in numbers if number not in workorders]
+            if not numbers:
+                return workorders
+        documents = await self.resilience.call("get_workorders_by_numbers", self._find_workorders, numbers)
+        for document in documents:
+            try:
+                workorder = TracOSWorkorderSchema(**document)
+            except ValidationError as e:
+                logger.error(f"Skipping invalid workorder {document.get('number')}: {e}")
+                continue
+            workorders[workorder.number] = workorder
+            if self.cache is not None:
+                self.cache.put(workorder)
+        return workorders
+
+    async def _find_workorders(self, numbers: list[int]) -> list[dict]:
+        cursor = self.collection.find({"number": {"$in": numbers}}, projection=WORKORDER_PROJECTION)
+        return [document async for document in cursor]
+
+    def sample_for_verification(self, workorders: list[TracOSWorkorderSchema]) -> list[TracOSWorkorderSchema]:
+        """Pick the share `verify_sample_rate` of the workorders to read back after an upsert."""
+        if self.verify_sample_rate <= 0:
+            return []
+        if self.verify_sample_rate >= 1:
+            return list(workorders)
+        return [workorder for workorder in workorders if random.random() < self.verify_sample_rate]
+
+    @metrics.timed("mongo_seconds", operation="verify_workorders")
+    async def verify_workorders(
+        self, workorders: list[TracOSWorkorderSchema]
+    ) -> dict[int, TracOSWorkorderSchema]:
+        """Read upserted workorders back from MongoDB, bypassing the cache, and report any that differ.
+
+        Returns the stored workorders by number; missing ones are left out.
+        Workorders are compared as MongoDB stores them, without the _id: a
+        bulk-updated workorder keeps the _id it was stored with, which the
+        bulk write does not report back.
+        """
+        if not workorders:
+            return {}
+        documents = await self.resilience.call(
+            "verify_workorders", self._find_workorders, [workorder.number for workorder in workorders]
+        )
+        stored = {}
+        for document in documents:
+            try:
+                stored_workorder = TracOSWorkorderSchema(**document)
+            except ValidationError as e:
+                logger.error(f"Stored workorder {document.get('number')} is invalid: {e}")
+                continue
+            stored[stored_workorder.number] = stored_workorder
+        for workorder in workorders:
+            stored_workorder = stored.get(workorder.number)
+            if stored_workorder is None:
+                logger.error(f"Workorder number {workorder.number} missing from the TracOs database after the upsert.")
+                metrics.inc("verifications", outcome="missing")
+            elif stored_workorder.model_dump(exclude={"id"}) != as_stored(workorder).model_dump(exclude={"id"}):
+                logger.warning(f"Workorder number {workorder.number} differs from the upserted one: {stored_workorder!r}")
+                metrics.inc("verifications", outcome="mismatch")
+                if self.cache is not None:
+                    self.cache.put(stored_workorder)
+            else:
+                metrics.inc("verifications", outcome="match")
+        return stored
+
+    @metrics.timed("mongo_seconds", operation="get_sync_fingerprints")
+    async def get_sync_fingerprints(self, numbers: list[int]) -> dict[int, dict]:
+        """Return the contentHash, updatedAt and isSynced stored for each of the given workorder numbers."""
+        fingerprints = {}
+        if self.cache is not None:
+            for number in numbers:
+                cached = self.cache.get(number)
+                if cached is not None:
+                    fingerprints[number] = {
+                        "number": number,
+                        "contentHash": cached.contentHash,
+                        "updatedAt": cached.updatedAt,
+                        "isSynced": cached.isSynced,
+                    }
+            numbers = [number for number in numbers if number not in fingerprints]
+            if not numbers:
+                return fingerprints
+        documents = await self.resilience.call("get_sync_fingerprints", self._find_fingerprints, numbers)
+        for document in documents:
+            fingerprints[document["number"]] = document
+        return fingerprints
+
+    async def _find_fingerprints(self, numbers: list[int]) -> list[dict]:
+        cursor = self.collection.find(
+            {"number": {"$in": numbers}},
+            projection=FINGERPRINT_PROJECTION,
+        )
+        return [document async for document in cursor]
+
+    @metrics.timed("mongo_seconds", operation="insert_workorder")
     async def insert_workorder(self, workorder: TracOSWorkorderSchema) -> TracOSWorkorderSchema | None:
         """Insert workorder in the TracOs database."""
         try: 
-            inserted_document = await self.collection.insert_one(workorder.model_dump())
+            inserted_document = await self.resilience.call(
+                "insert_workorder", self.collection.insert_one, workorder.model_dump()
+            )
             logger.info(f"Workorder number {workorder.number} inserted with id {inserted_document.inserted_id}")
+            if self.cache is not None:
+                self.cache.put(as_stored(workorder, id=inserted_document.inserted_id))
             print(f"Workorder number {workorder.number} inserted successfully.")
             return workorder
         except ValidationError as e:
@@ -41,11 +284,54 @@ class TracOsService:
             logger.error(f"Error inserting workorder: {e}")
             return None
 
+    @metrics.timed("mongo_seconds", operation="upsert_workorder")
+    async def upsert_workorder(self, workorder: TracOSWorkorderSchema) -> TracOSWorkorderSchema | None:
+        """Insert the workorder, or update the existing one with the same number, and return it as stored.
+
+        Every stored field but _id comes from the already-validated model, so
+        find_one_and_update only returns the _id (the existing one on update)
+        and the stored workorder is built without reading the document back.
+        """
+        try:
+            document = await self.resilience.call(
+                "upsert_workorder",
+                self.collection.find_one_and_update,
+                {"number": workorder.number},
+                self._build_upsert_update(workorder),
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            logger.info(f"Workorder number {workorder.number} upserted.")
+            stored = as_stored(workorder, id=document["_id"], isSynced=False, syncedAt=None)
+            if self.cache is not None:
+                self.cache.put(stored)
+            return stored
+        except Exception as e:
+            logger.error(f"Error upserting workorder: {e}")
+            if self.cache is not None:
+                self.cache.invalidate(workorder.number)
+            return None
+
+    def _cache_upserted(self, workorder: TracOSWorkorderSchema | dict, inserted: bool) -> None:
+        """Cache a bulk-inserted workorder; a bulk-updated one keeps the stored _id, unknown here, so it is dropped."""
+        if self.cache is None:
+            return
+        if inserted and isinstance(workorder, BaseModel):
+            self.cache.put(as_stored(workorder, isSynced=False, syncedAt=None))
+        else:
+            self.cache.invalidate(self._number(workorder))
+
+    @metrics.timed("mongo_seconds", operation="update_workorder")
     async def update_workorder(self, number: int) -> None:
         """Insert workorder fields isSynced and  syncedAt in the TracOs database."""
+        if self.cache is not None:
+            self.cache.invalidate(number)
         try:
             logger.info(f"Updating workorder number: {number}...")
-            await self.collection.update_one(
+            await self.resilience.call(
+                "update_workorder",
+                self.collection.update_one,
                 filter={
                     "number" : number
                 },
@@ -62,12 +348,191 @@ class TracOsService:
         except Exception as e:
             logger.error(f"Error updating workorder: {e}")
             return None
-            
-        
-        
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(number)
 
+    async def watch_unsynced_workorders(
+        self, resume_token: dict | None = None
+    ) -> AsyncIterator[tuple[dict, TracOSWorkorderSchema]]:
+        """Follow the collection change stream, yielding (resume token, workorder) for unsynced changes.
 
+        Raises OperationFailure on servers without change streams (standalone mongod).
+        """
+        pipeline = [
+            {
+                "$match": {
+                    "operationType": {"$in": ["insert", "update", "replace"]},
+                    "fullDocument.isSynced": False,
+                }
+            }
+        ]
+        async with self.collection.watch(
+            pipeline, full_document="updateLookup", resume_after=resume_token
+        ) as stream:
+            async for change in stream:
+                document = change.get("fullDocument")
+                if document is None:
+                    continue
+                try:
+                    yield change["_id"], TracOSWorkorderSchema(**document)
+                except ValidationError as e:
+                    logger.error(f"Skipping invalid workorder {document.get('number')}: {e}")
 
+    async def poll_unsynced_workorders(
+        self, interval: float | None = None
+    ) -> AsyncIterator[tuple[None, TracOSWorkorderSchema]]:
+        """Polling stand-in for the change stream: re-scan the unsynced queue every `interval` seconds."""
+        interval = interval or float(os.getenv("OUTBOUND_POLL_INTERVAL", "1.0"))
+        while True:
+            async for workorder in self.iter_unsynced_workorders():
+                yield None, workorder
+            await asyncio.sleep(interval)
 
+    async def iter_unsynced_workorders(
+        self, batch_size: int | None = None, after_id: ObjectId | None = None
+    ) -> AsyncIterator[TracOSWorkorderSchema]:
+        """Stream workorders with isSynced = false in _id order without materializing them.
 
+        `after_id` resumes an interrupted export right after the last exported _id.
+        """
+        batch_size = batch_size or int(os.getenv("MONGO_CURSOR_BATCH_SIZE", "1000"))
+        query = {"isSynced": False}
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        cursor = (
+            self.collection.find(query, projection=WORKORDER_PROJECTION)
+            .sort("_id", 1)
+            .batch_size(batch_size)
+        )
+        async for document in cursor:
+            try:
+                yield TracOSWorkorderSchema(**document)
+            except ValidationError as e:
+                logger.error(f"Skipping invalid workorder {document.get('number')}: {e}")
+
+    @metrics.timed("mongo_seconds", operation="mark_workorders_synced")
+    async def mark_workorders_synced(self, acks: list[tuple[int, datetime]]) -> int | None:
+        """Set isSynced and syncedAt on many `(number, updatedAt)` workorders with a single bulk_write.
+
+        Only the exported version is acknowledged: a workorder upserted again
+        since then has another updatedAt and stays unsynced. The cached copies
+        are dropped before and after the write, so a read racing the write
+        cannot leave an unsynced copy behind.
+        """
+        if self.cache is not None:
+            self.cache.invalidate_many(number for number, _ in acks)
+        synced = {
+            "$set": {
+                "isSynced": True,
+                "syncedAt": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+            }
+        }
+        operations = [UpdateOne({"number": number, "updatedAt": updated_at}, synced) for number, updated_at in acks]
+        try:
+            result = await self.resilience.call(
+                "mark_workorders_synced", self.collection.bulk_write, operations, ordered=False
+            )
+            if result.matched_count < len(acks):
+                logger.info(f"{len(acks) - result.matched_count} acknowledged workorders changed since their export.")
+            logger.info(f"Marked {result.modified_count} of {len(acks)} workorders as synced.")
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"Error marking workorders as synced: {e}")
+            return None
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate_many(number for number, _ in acks)
+
+    async def bulk_upsert_workorders(
+        self,
+        workorders: Union[Iterable[TracOSWorkorderSchema | dict], AsyncIterable[TracOSWorkorderSchema | dict]],
+        batch_size: int | None = None,
+    ) -> list[WorkorderUpsertResult]:
+        """Upsert a stream of workorders by number using unordered bulk writes.
+
+        Workorders are flushed every `batch_size` documents, so a whole inbound
+        drop costs one round trip per batch. Updated workorders are flagged as
+        not synced again so the outbound flow picks them up. Workorders may also
+        be plain Tracos documents (e.g. from `PayloadTranslator.record_to_tracos`).
+        """
+        batch_size = batch_size or int(os.getenv("MONGO_BULK_BATCH_SIZE", "1000"))
+        results: list[WorkorderUpsertResult] = []
+        batch: list[TracOSWorkorderSchema | dict] = []
+
+        if hasattr(workorders, "__aiter__"):
+            async for workorder in workorders:
+                batch.append(workorder)
+                if len(batch) >= batch_size:
+                    results.extend(await self._flush_upsert_batch(batch))
+                    batch = []
+        else:
+            for workorder in workorders:
+                batch.append(workorder)
+                if len(batch) >= batch_size:
+                    results.extend(await self._flush_upsert_batch(batch))
+                    batch = []
+        if batch:
+            results.extend(await self._flush_upsert_batch(batch))
+        return results
+
+    @staticmethod
+    def _number(workorder: TracOSWorkorderSchema | dict) -> int:
+        return workorder.number if isinstance(workorder, BaseModel) else workorder["number"]
+
+    @staticmethod
+    def _build_upsert_update(workorder: TracOSWorkorderSchema | dict) -> dict:
+        document = workorder.model_dump(by_alias=True) if isinstance(workorder, BaseModel) else dict(workorder)
+        object_id = document.pop("_id")
+        document["isSynced"] = False
+        document["syncedAt"] = None
+        return {"$set": document, "$setOnInsert": {"_id": object_id}}
+
+    def _build_upsert_operation(self, workorder: TracOSWorkorderSchema | dict) -> UpdateOne:
+        return UpdateOne({"number": self._number(workorder)}, self._build_upsert_update(workorder), upsert=True)
+
+    @metrics.timed("mongo_seconds", operation="bulk_upsert_batch")
+    async def _flush_upsert_batch(
+        self, batch: list[TracOSWorkorderSchema | dict]
+    ) -> list[WorkorderUpsertResult]:
+        """Send one bulk_write and map its outcome back to each workorder.
+
+        MongoDB only reports matched/modified totals per batch, so a workorder
+        that already existed is reported as matched, whether or not its
+        document actually changed.
+        """
+        operations = [self._build_upsert_operation(workorder) for workorder in batch]
+        errors: dict[int, str] = {}
+        try:
+            result = await self.resilience.call(
+                "bulk_upsert_batch", self.collection.bulk_write, operations, ordered=False
+            )
+            upserted_indexes = set(result.upserted_ids.keys())
+            matched_count, modified_count = result.matched_count, result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            upserted_indexes = {item["index"] for item in details.get("upserted", [])}
+            matched_count, modified_count = details.get("nMatched", 0), details.get("nModified", 0)
+            errors = {item["index"]: item.get("errmsg", "") for item in details.get("writeErrors", [])}
+        except Exception as e:
+            logger.error(f"Error upserting batch of {len(batch)} workorders: {e}")
+            return [
+                WorkorderUpsertResult(number=self._number(workorder), status="error", error=str(e))
+                for workorder in batch
+            ]
 
+        results = []
+        for index, workorder in enumerate(batch):
+            number = self._number(workorder)
+            if index in errors:
+                results.append(WorkorderUpsertResult(number=number, status="error", error=errors[index]))
+            elif index in upserted_indexes:
+                results.append(WorkorderUpsertResult(number=number, status="inserted"))
+            else:
+                results.append(WorkorderUpsertResult(number=number, status="matched"))
+            self._cache_upserted(workorder, inserted=index in upserted_indexes)
+        logger.info(
+            f"Bulk upserted {len(batch)} workorders: {len(upserted_indexes)} inserted, "
+            f"{matched_count} matched, {modified_count} modified, {len(errors)} errors."
+        )
+        return results
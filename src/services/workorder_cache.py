@@ -0,0 +1,90 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+
+from schemas.tracos_schema import TracOSWorkorderSchema
+
+
+def as_stored(workorder: TracOSWorkorderSchema, **updates) -> TracOSWorkorderSchema:
+    """Copy of the workorder as MongoDB returns it: naive UTC datetimes truncated to milliseconds."""
+    for name, value in workorder:
+        value = updates.get(name, value)
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            updates[name] = value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return workorder.model_copy(update=updates)
+
+
+class WorkorderCache:
+    """Bounded LRU cache of TracOS workorders by number, with an optional time-to-live.
+
+    The least recently used workorder is evicted once `max_size` is reached and
+    entries older than `ttl` seconds are treated as misses (`ttl` of 0 keeps
+    them until evicted). Hits, misses, evictions and expirations are counted.
+    """
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("The cache needs room for at least one workorder.")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict[int, tuple[float, TracOSWorkorderSchema]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "WorkorderCache | None":
+        """Build the cache from TRACOS_CACHE_SIZE / TRACOS_CACHE_TTL, or None when the size is 0 (the default)."""
+        max_size = int(os.getenv("TRACOS_CACHE_SIZE", "0"))
+        if max_size <= 0:
+            return None
+        return cls(max_size=max_size, ttl=float(os.getenv("TRACOS_CACHE_TTL", "300")))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, number: int) -> TracOSWorkorderSchema | None:
+        entry = self._entries.get(number)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, workorder = entry
+        if self.ttl and self.clock() - stored_at >= self.ttl:
+            del self._entries[number]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(number)
+        self.hits += 1
+        return workorder
+
+    def put(self, workorder: TracOSWorkorderSchema) -> None:
+        self._entries[workorder.number] = (self.clock(), workorder)
+        self._entries.move_to_end(workorder.number)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, number: int) -> None:
+        self._entries.pop(number, None)
+
+    def invalidate_many(self, numbers: Iterable[int]) -> None:
+        for number in numbers:
+            self._entries.pop(number, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,31 @@
+from collections import Counter
+
+from bench.datagen import customer_workorders, tracos_workorders, write_inbound_files
+from src.schemas.customer_schema import CustomerSystemWorkorderSchema
+from src.schemas.tracos_schema import TracOSWorkorderSchema
+
+
+def test_generated_workorders_are_deterministic_per_seed():
+    assert list(customer_workorders(50, seed=7)) == list(customer_workorders(50, seed=7))
+    assert list(customer_workorders(50, seed=7)) != list(customer_workorders(50, seed=8))
+    assert [document["_id"] for document in tracos_workorders(5, seed=7)] == [
+        document["_id"] for document in tracos_workorders(5, seed=7)
+    ]
+
+
+def test_generated_workorders_are_valid_and_mixed(tmp_path):
+    customers = list(customer_workorders(2000, seed=1))
+    for workorder in customers[:100]:
+        CustomerSystemWorkorderSchema(**workorder)
+    for document in tracos_workorders(100, seed=1, start=5000):
+        TracOSWorkorderSchema(**document)
+
+    flags = Counter(
+        next((name for name in ("isCanceled", "isDeleted", "isDone", "isOnHold", "isPending") if workorder[name]), "none")
+        for workorder in customers
+    )
+    assert set(flags) == {"isCanceled", "isDeleted", "isDone", "isOnHold", "isPending", "none"}
+    assert all(workorder["deletedDate"] for workorder in customers if workorder["isDeleted"])
+
+    assert write_inbound_files(str(tmp_path), customers[:10]) == 10
+    assert sorted(path.name for path in tmp_path.iterdir())[:2] == ["1.json", "10.json"]
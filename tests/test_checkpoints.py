@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime, timezone
+from bson import ObjectId
+from src.pipeline.checkpoints import OrderedCheckpoint
+from src.services.sync_state_service import SyncStateService
+
+
+class UnavailableCollection:
+    async def find_one(self, *args, **kwargs):
+        raise ConnectionError("MongoDB unavailable")
+
+    async def update_one(self, *args, **kwargs):
+        raise ConnectionError("MongoDB unavailable")
+
+    async def delete_one(self, *args, **kwargs):
+        raise ConnectionError("MongoDB unavailable")
+
+
+def test_ordered_checkpoint_only_advances_over_completed_prefix():
+    checkpoint = OrderedCheckpoint()
+    sequences = [checkpoint.register(position) for position in ("a", "b", "c", "d")]
+
+    checkpoint.complete(sequences[1])
+    checkpoint.complete(sequences[2])
+    assert checkpoint.position is None
+
+    checkpoint.complete(sequences[0])
+    assert checkpoint.position == "c"
+    assert checkpoint.advanced_since_save == 3
+
+    checkpoint.complete(sequences[3])
+    assert checkpoint.position == "d"
+
+
+@pytest.mark.asyncio
+async def test_sync_state_falls_back_to_local_file(tmp_path):
+    service = SyncStateService(fallback_path=str(tmp_path / "sync_state.json"))
+    service.collection = UnavailableCollection()
+    position = {"_id": ObjectId(), "updatedAt": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+
+    assert await service.get_checkpoint("outbound") is None
+    await service.save_checkpoint("outbound", position)
+    stored = await service.get_checkpoint("outbound")
+    assert stored["_id"] == position["_id"]
+
+    await service.clear_checkpoint("outbound")
+    assert await service.get_checkpoint("outbound") is None
+
+
+@pytest.mark.asyncio
+async def test_sync_state_round_trip_in_mongo(tmp_path):
+    service = SyncStateService(fallback_path=str(tmp_path / "sync_state.json"))
+    checkpoint = OrderedCheckpoint()
+    object_id = ObjectId()
+    checkpoint.complete(checkpoint.register({"_id": object_id, "updatedAt": datetime(2025, 1, 1)}))
+    await service.save_checkpoint("outbound", checkpoint.position)
+    try:
+        assert await service.get_checkpoint("outbound") == {"_id": object_id, "updatedAt": datetime(2025, 1, 1)}
+        await service.clear_checkpoint("outbound")
+        assert await service.get_checkpoint("outbound") is None
+    finally:
+        await service.collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_saved_locally_are_written_back_once_mongo_is_reachable(tmp_path):
+    fallback_path = tmp_path / "sync_state.json"
+    service = SyncStateService(fallback_path=str(fallback_path))
+    collection = service.collection
+    await service.save_checkpoint("outbound", {"_id": ObjectId(), "updatedAt": datetime(2025, 1, 1)})
+    position = {"_id": ObjectId(), "updatedAt": datetime(2025, 1, 2)}
+    stream_position = {"token": {"_data": "8263"}}
+    try:
+        service.collection = UnavailableCollection()
+        await service.save_checkpoint("outbound", position)
+        await service.save_checkpoint("outbound_stream", stream_position)
+        assert fallback_path.exists()
+
+        service.collection = collection
+        assert await service.get_checkpoint("outbound") == position
+        assert not fallback_path.exists()
+        assert await service.get_checkpoint("outbound_stream") == stream_position
+    finally:
+        await collection.drop()
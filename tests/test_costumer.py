@@ -1,9 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 import pytest
 from datetime import datetime
 import os
 import json
-from src.routes.costumer_routes import CostumerERPRoute
+from src.routes.costumer_routes import CostumerERPRoute, IOHelper, WorkorderCodec
 from src.schemas.customer_schema import CustomerSystemWorkorderSchema
 from pathlib import Path
 
@@ -72,3 +72,105 @@ async def test_post_costumer_workorder(costumer_route, sample_workorder):
 
     invalid_result = await costumer_route.post_costumer_workorder(None)
     assert invalid_result is None
+
+
+@pytest.mark.asyncio
+async def test_io_helper_write_many_and_read_many(tmp_path, sample_workorder):
+    """Test writing and reading many files through the I/O thread pool."""
+    helper = IOHelper()
+    items = [
+        (str(tmp_path / f"{order_no}.json"), sample_workorder.model_copy(update={"orderNo": order_no}))
+        for order_no in range(1, 6)
+    ]
+
+    results = await helper.write_many(items)
+    assert results == [True] * 5
+
+    workorders = await helper.read_many([path for path, _ in items] + [str(tmp_path / "missing.json")])
+    assert [workorder.orderNo for workorder in workorders[:5]] == [1, 2, 3, 4, 5]
+    assert workorders[5] is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fsync_mode", ["none", "file", "dir", "group"])
+async def test_io_helper_writes_atomically(tmp_path, sample_workorder, fsync_mode):
+    """Test that writes are renamed into place and leave no temp files behind."""
+    helper = IOHelper(fsync_mode=fsync_mode, fsync_group_size=2)
+    items = [
+        (str(tmp_path / f"{order_no}.json"), sample_workorder.model_copy(update={"orderNo": order_no}))
+        for order_no in range(1, 4)
+    ]
+
+    assert await helper.write_many(items) == [True] * 3
+    await helper.flush_group_commit()
+
+    assert sorted(os.listdir(tmp_path)) == ["1.json", "2.json", "3.json"]
+    with open(tmp_path / "2.json") as json_file:
+        assert json.load(json_file)["orderNo"] == 2
+
+
+class FakeTracOsService:
+    def __init__(self):
+        self.synced = []
+
+    async def mark_workorders_synced(self, acks):
+        self.synced.extend(number for number, _ in acks)
+        return len(acks)
+
+
+@pytest.mark.asyncio
+async def test_group_fsync_holds_acks_until_the_files_are_fsynced(tmp_path, monkeypatch, sample_workorder):
+    monkeypatch.setenv("DATA_OUTBOUND_DIR", str(tmp_path))
+    monkeypatch.setenv("OUTBOUND_FSYNC_MODE", "group")
+    monkeypatch.setenv("OUTBOUND_FSYNC_GROUP_SIZE", "2")
+    service = FakeTracOsService()
+    route = CostumerERPRoute(tracos_service=service)
+    fsynced = []
+    fsync_files = route.IOHelper._fsync_files
+
+    def recording_fsync_files(file_paths):
+        fsync_files(file_paths)
+        fsynced.extend(file_paths)
+
+    monkeypatch.setattr(route.IOHelper, "_fsync_files", recording_fsync_files)
+
+    await route.post_costumer_workorder(sample_workorder.model_copy(update={"orderNo": 1}))
+    assert service.synced == [] and fsynced == []
+
+    await route.post_costumer_workorders([sample_workorder.model_copy(update={"orderNo": n}) for n in (2, 3)])
+    assert len(fsynced) == 2 and sorted(service.synced) == sorted(int(os.path.basename(p)[:-5]) for p in fsynced)
+
+    await route.flush_outbound()
+    assert sorted(service.synced) == [1, 2, 3]
+
+
+def test_io_helper_rejects_unknown_fsync_mode():
+    with pytest.raises(ValueError):
+        IOHelper(fsync_mode="sometimes")
+
+
+def test_workorder_codec_decode_applies_inbound_defaults():
+    codec = WorkorderCodec(use_orjson=False)
+    workorder = codec.decode(
+        b'{"orderNo": 7, "isDone": true, "isSynced": true, "summary": "Done",'
+        b' "creationDate": "2025-07-08T20:19:57+00:00", "lastUpdateDate": "2025-07-08T21:19:57+00:00"}'
+    )
+
+    assert workorder.orderNo == 7
+    assert workorder.isDone is True
+    assert workorder.isActive is True
+    assert workorder.isCanceled is False
+    assert workorder.isSynced is False
+    assert workorder.deletedDate is None
+
+    with pytest.raises(ValidationError):
+        codec.decode(b'{"orderNo": 7}')
+
+
+def test_workorder_codec_encode_compact_and_pretty(sample_workorder):
+    compact = WorkorderCodec(pretty=False, use_orjson=False).encode(sample_workorder)
+    pretty = WorkorderCodec(pretty=True, use_orjson=False).encode(sample_workorder)
+
+    assert b"\n" not in compact
+    assert b"\n" in pretty
+    assert json.loads(compact) == json.loads(pretty) == sample_workorder.model_dump(mode="json")
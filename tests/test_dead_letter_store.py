@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from src.schemas.customer_schema import CustomerSystemWorkorderSchema
+from src.services.dead_letter_store import DeadLetterStore
+
+
+def make_customer_workorder(order_no):
+    date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return CustomerSystemWorkorderSchema(
+        orderNo=order_no,
+        isActive=True,
+        isCanceled=False,
+        isDeleted=False,
+        isDone=False,
+        isOnHold=False,
+        isPending=True,
+        isSynced=False,
+        summary="Dead-lettered",
+        creationDate=date,
+        lastUpdateDate=date,
+        deletedDate=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_keep_stage_error_and_payload(tmp_path):
+    store = DeadLetterStore(path=str(tmp_path / "state" / "dead_letters.jsonl"))
+
+    await store.record(1, "read", "Not found")
+    await store.record(2, "upsert", "AutoReconnect", make_customer_workorder(2))
+
+    pending = store.pending()
+    assert store.recorded == 2 and store.recorded_numbers == {1, 2}
+    assert sorted(pending) == [1, 2]
+    assert pending[1]["stage"] == "read" and pending[1]["payload"] is None
+    assert pending[2]["error"] == "AutoReconnect"
+    assert pending[2]["payload"]["orderNo"] == 2 and pending[2]["payload"]["summary"] == "Dead-lettered"
+
+
+@pytest.mark.asyncio
+async def test_latest_failure_wins_and_resolve_drops_replayed_orders(tmp_path):
+    path = tmp_path / "dead_letters.jsonl"
+    store = DeadLetterStore(path=str(path))
+    for order_no in (1, 2, 3):
+        await store.record(order_no, "upsert", "timed out")
+    await store.record(2, "export", "disk full")
+
+    assert store.pending()[2]["stage"] == "export"
+    assert store.resolve([1, 3]) == 1
+    assert [json.loads(line)["orderNo"] for line in path.read_text().splitlines()] == [2]
+
+    assert store.resolve([2]) == 0
+    assert not path.exists()
+    assert store.pending() == {}
+
+
+def test_invalid_lines_are_skipped(tmp_path):
+    path = tmp_path / "dead_letters.jsonl"
+    path.write_text('{"orderNo": 7, "stage": "read", "error": "x"}\nnot json\n\n')
+
+    assert list(DeadLetterStore(path=str(path)).pending()) == [7]
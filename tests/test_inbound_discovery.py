@@ -0,0 +1,155 @@
+import os
+import json
+import pytest
+from src.pipeline.sharding import Shard
+from src.routes.inbound_discovery import InboundDiscovery
+
+
+def write_workorder(directory, order_no, mtime_ns=None):
+    path = directory / f"{order_no}.json"
+    path.write_text(json.dumps({"orderNo": order_no}))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+async def discover_all(discovery):
+    return sorted([order_no async for order_no in discovery.discover()])
+
+
+@pytest.mark.asyncio
+async def test_discovery_yields_only_new_or_changed_files(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    watermark_path = str(tmp_path / "state" / "watermark.json")
+    for order_no in (1, 2, 3):
+        write_workorder(inbound_dir, order_no, mtime_ns=1_000_000_000 * order_no)
+    (inbound_dir / "notes.txt").write_text("ignored")
+    (inbound_dir / "not-a-number.json").write_text("{}")
+    os.utime(inbound_dir / "not-a-number.json", ns=(1_000_000_000, 1_000_000_000))
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [1, 2, 3]
+    discovery.commit()
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == []
+
+    write_workorder(inbound_dir, 4, mtime_ns=1_000_000_000 * 5)
+    path = inbound_dir / "3.json"
+    path.write_text(json.dumps({"orderNo": 3, "summary": "changed"}))
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_discovery_detects_size_change_on_watermark_mtime(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    watermark_path = str(tmp_path / "watermark.json")
+    write_workorder(inbound_dir, 1, mtime_ns=2_000_000_000)
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [1]
+    discovery.commit()
+
+    path = inbound_dir / "1.json"
+    path.write_text(json.dumps({"orderNo": 1, "summary": "longer payload"}))
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [1]
+
+
+@pytest.mark.asyncio
+async def test_sharded_discovery_partitions_orders_with_own_watermarks(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    watermark_path = str(tmp_path / "state" / "watermark.json")
+    for order_no in range(1, 11):
+        write_workorder(inbound_dir, order_no, mtime_ns=1_000_000_000 * order_no)
+
+    discovered = []
+    for index in range(3):
+        discovery = InboundDiscovery(str(inbound_dir), watermark_path, shard=Shard(index, 3))
+        orders = await discover_all(discovery)
+        assert all(order_no % 3 == index for order_no in orders)
+        discovery.commit()
+        discovered.extend(orders)
+
+    assert sorted(discovered) == list(range(1, 11))
+    assert sorted(os.listdir(tmp_path / "state")) == [
+        "watermark.shard0of3.json",
+        "watermark.shard1of3.json",
+        "watermark.shard2of3.json",
+    ]
+    assert await discover_all(InboundDiscovery(str(inbound_dir), watermark_path, shard=Shard(1, 3))) == []
+
+
+@pytest.mark.asyncio
+async def test_discovery_finds_files_moved_in_with_an_older_mtime(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    staging_dir = tmp_path / "staging"
+    staging_dir.mkdir()
+    watermark_path = str(tmp_path / "watermark.json")
+    write_workorder(inbound_dir, 1, mtime_ns=5_000_000_000)
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [1]
+    discovery.commit()
+
+    staged = write_workorder(staging_dir, 2, mtime_ns=1_000_000_000)
+    os.rename(staged, inbound_dir / "2.json")
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [2]
+
+
+@pytest.mark.asyncio
+async def test_rescan_ignores_the_stored_watermark(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    watermark_path = str(tmp_path / "watermark.json")
+    write_workorder(inbound_dir, 1)
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    assert await discover_all(discovery) == [1]
+    discovery.commit()
+
+    assert await discover_all(InboundDiscovery(str(inbound_dir), watermark_path)) == []
+    assert await discover_all(InboundDiscovery(str(inbound_dir), watermark_path, rescan=True)) == [1]
+
+
+@pytest.mark.asyncio
+async def test_files_created_during_a_scan_are_found_by_the_next_one(tmp_path, monkeypatch):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    watermark_path = str(tmp_path / "watermark.json")
+    for order_no in (1, 3, 5):
+        write_workorder(inbound_dir, order_no, mtime_ns=1_000_000_000 * order_no)
+    scandir = os.scandir
+
+    class Listing(list):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+    monkeypatch.setattr(os, "scandir", lambda path: Listing(sorted(scandir(path), key=lambda entry: entry.name)))
+
+    discovery = InboundDiscovery(str(inbound_dir), watermark_path)
+    discovered = []
+    async for order_no in discovery.discover():
+        discovered.append(order_no)
+        if order_no == 1:
+            # Missed by the listing already taken, then a later entry changes before its stat.
+            write_workorder(inbound_dir, 2)
+            write_workorder(inbound_dir, 5)
+    discovery.commit()
+    assert discovered == [1, 3, 5]
+
+    assert await discover_all(InboundDiscovery(str(inbound_dir), watermark_path)) == [2]
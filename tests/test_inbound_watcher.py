@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+
+import pytest
+from src.routes.inbound_discovery import InboundDiscovery
+from src.routes.inbound_watcher import InboundWatcher
+
+
+def write_workorder(directory, order_no, summary="", mtime_ns=None):
+    path = directory / f"{order_no}.json"
+    path.write_text(json.dumps({"orderNo": order_no, "summary": summary}))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+async def collect(watcher, stop_event, received):
+    async for order_no in watcher.watch(stop_event):
+        received.append(order_no)
+
+
+@pytest.mark.asyncio
+async def test_watcher_yields_pending_then_changed_files_when_polling(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    write_workorder(inbound_dir, 1, mtime_ns=1_000_000_000)
+    discovery = InboundDiscovery(str(inbound_dir), str(tmp_path / "watermark.json"))
+    watcher = InboundWatcher(discovery, debounce=0.02, poll_interval=0.02, use_native=False)
+
+    received = []
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(collect(watcher, stop_event, received))
+    await asyncio.sleep(0.05)
+    assert received == [1]
+    assert watcher.idle and watcher.yielded == 1
+
+    write_workorder(inbound_dir, 2, mtime_ns=2_000_000_000)
+    write_workorder(inbound_dir, 1, summary="changed", mtime_ns=3_000_000_000)
+    await asyncio.sleep(0.15)
+    stop_event.set()
+    await asyncio.wait_for(task, 1)
+
+    assert sorted(received[1:]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_watcher_coalesces_bursts_of_events_per_order(tmp_path):
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    discovery = InboundDiscovery(str(inbound_dir), str(tmp_path / "watermark.json"))
+    watcher = InboundWatcher(discovery, debounce=0.2, poll_interval=0.01, use_native=False)
+
+    received = []
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(collect(watcher, stop_event, received))
+    await asyncio.sleep(0.05)
+    for step in range(5):
+        write_workorder(inbound_dir, 7, summary=str(step), mtime_ns=(step + 1) * 1_000_000_000)
+        await asyncio.sleep(0.03)
+    assert received == []
+    await asyncio.sleep(0.3)
+    stop_event.set()
+    await asyncio.wait_for(task, 1)
+
+    assert received == [7]
+
+
+@pytest.mark.asyncio
+async def test_watcher_uses_file_system_events(tmp_path):
+    pytest.importorskip("watchfiles")
+    inbound_dir = tmp_path / "inbound"
+    inbound_dir.mkdir()
+    discovery = InboundDiscovery(str(inbound_dir), str(tmp_path / "watermark.json"))
+    watcher = InboundWatcher(discovery, debounce=0.05, use_native=True)
+
+    received = []
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(collect(watcher, stop_event, received))
+    await asyncio.sleep(0.3)
+    write_workorder(inbound_dir, 3)
+    for _ in range(50):
+        if received:
+            break
+        await asyncio.sleep(0.05)
+    stop_event.set()
+    await asyncio.wait_for(task, 5)
+
+    assert received == [3]
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from src.observability.metrics import Histogram, Metrics
+
+
+def test_disabled_metrics_record_nothing(tmp_path):
+    metrics = Metrics(enabled=False)
+    metrics.inc("workorders", outcome="failed")
+    with metrics.timer("stage_seconds", stage="read"):
+        pass
+
+    assert metrics.to_json() == {"counters": [], "histograms": []}
+    assert metrics.timer("a") is metrics.timer("b")
+    assert metrics.export(str(tmp_path / "metrics.prom")) is None
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 98 + [0.5, 5.0]:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.99) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+
+@pytest.mark.asyncio
+async def test_timers_decorators_and_counters_are_exported(tmp_path):
+    metrics = Metrics(enabled=True, namespace="test")
+
+    @metrics.timed("mongo_seconds", operation="find")
+    async def find():
+        return 1
+
+    @metrics.timed("disk_seconds", operation="read")
+    def read():
+        raise OSError("disk")
+
+    assert await find() == 1
+    with pytest.raises(OSError):
+        read()
+    async with metrics.timer("stage_seconds", stage="write"):
+        pass
+    metrics.inc("workorders", 3, outcome="successful")
+
+    summary = metrics.to_json()
+    assert {(item["name"], item["labels"].get("operation", item["labels"].get("stage"))) for item in summary["histograms"]} == {
+        ("mongo_seconds", "find"), ("disk_seconds", "read"), ("stage_seconds", "write"),
+    }
+    assert {"name": "workorders", "labels": {"outcome": "successful"}, "value": 3} in summary["counters"]
+    assert {"name": "errors", "labels": {"operation": "read", "timer": "disk_seconds"}, "value": 1} in summary["counters"]
+
+    text = metrics.to_prometheus()
+    assert "# TYPE test_workorders_total counter" in text
+    assert 'test_workorders_total{outcome="successful"} 3' in text
+    assert 'test_mongo_seconds_bucket{operation="find",le="+Inf"} 1' in text
+    assert 'test_mongo_seconds_count{operation="find"} 1' in text
+
+    json_path = metrics.export(str(tmp_path / "metrics.json"))
+    assert json.loads(open(json_path).read()) == summary
+    prometheus_path = metrics.export(str(tmp_path / "metrics.prom"))
+    assert open(prometheus_path).read() == text
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from src.services import mongo_client
+from src.services.mongo_client import get_mongo_client, mongo_client_options
+from src.services.tracos_service import TracOsService
+
+
+def test_mongo_client_options_from_env(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "5")
+    monkeypatch.setenv("MONGO_MAX_IDLE_TIME_MS", "30000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zlib")
+    monkeypatch.setenv("MONGO_WRITE_CONCERN_W", "majority")
+    monkeypatch.setenv("MONGO_WRITE_CONCERN_JOURNAL", "true")
+
+    assert mongo_client_options() == {
+        "maxPoolSize": 50,
+        "minPoolSize": 5,
+        "maxIdleTimeMS": 30000,
+        "compressors": "zlib",
+        "w": "majority",
+        "journal": True,
+    }
+
+
+@pytest.mark.asyncio
+async def test_services_share_one_client():
+    first = TracOsService()
+    second = TracOsService()
+    assert first.client is second.client
+
+
+def test_client_of_a_previous_event_loop_is_closed(monkeypatch):
+    closed = []
+
+    class FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def close(self):
+            closed.append(self)
+
+    monkeypatch.setattr(mongo_client, "AsyncIOMotorClient", FakeClient)
+    monkeypatch.setattr(mongo_client, "_client", None)
+    monkeypatch.setattr(mongo_client, "_client_loop", None)
+
+    async def current_client():
+        return get_mongo_client()
+
+    first = asyncio.run(current_client())
+    second = asyncio.run(current_client())
+
+    assert second is not first
+    assert closed == [first]
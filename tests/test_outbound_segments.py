@@ -0,0 +1,232 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+
+import pytest
+from src.routes.costumer_routes import CostumerERPRoute
+from src.routes.outbound_segments import MANIFEST_NAME, OutboundSegmentWriter
+from src.schemas.customer_schema import CustomerSystemWorkorderSchema
+
+
+def line(order_no):
+    return (json.dumps({"orderNo": order_no}) + "\n").encode()
+
+
+def manifest(directory):
+    with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+        return [json.loads(entry) for entry in manifest_file]
+
+
+def test_segments_roll_over_by_count_and_are_listed_in_the_manifest(tmp_path):
+    writer = OutboundSegmentWriter(str(tmp_path), max_records=4)
+    numbers = list(range(1, 11))
+    writer.append(numbers[:6], [line(n) for n in numbers[:6]])
+    writer.append(numbers[6:], [line(n) for n in numbers[6:]])
+    assert [entry["records"] for entry in manifest(tmp_path)] == [4, 4]
+
+    writer.seal()
+    entries = manifest(tmp_path)
+    assert [(entry["records"], entry["minOrderNo"], entry["maxOrderNo"]) for entry in entries] == [
+        (4, 1, 4), (4, 5, 8), (2, 9, 10)
+    ]
+    orders = []
+    for entry in entries:
+        content = (tmp_path / entry["segment"]).read_bytes()
+        assert entry["bytes"] == len(content)
+        assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+        orders.extend(json.loads(row)["orderNo"] for row in content.splitlines())
+    assert orders == numbers
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_segments_roll_over_by_size(tmp_path):
+    writer = OutboundSegmentWriter(str(tmp_path), max_bytes=3 * len(line(1)))
+    writer.append([1, 2, 3, 4], [line(n) for n in (1, 2, 3, 4)])
+    writer.seal()
+    assert [entry["records"] for entry in manifest(tmp_path)] == [3, 1]
+
+
+def test_gzip_segments_are_readable_while_open_and_after_sealing(tmp_path):
+    writer = OutboundSegmentWriter(str(tmp_path), compression="gzip")
+    writer.append([1, 2], [line(1), line(2)])
+    part = next(name for name in os.listdir(tmp_path) if name.endswith(".ndjson.gz.part"))
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress((tmp_path / part).read_bytes()) == line(1) + line(2)
+
+    entry = writer.seal()
+    assert entry["compression"] == "gzip"
+    assert gzip.decompress((tmp_path / entry["segment"]).read_bytes()) == line(1) + line(2)
+
+
+def test_zstd_segments(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    writer = OutboundSegmentWriter(str(tmp_path), compression="zstd")
+    writer.append([1], [line(1)])
+    entry = writer.seal()
+    with zstandard.ZstdDecompressor().stream_reader((tmp_path / entry["segment"]).read_bytes()) as reader:
+        assert reader.read() == line(1)
+
+
+def test_segments_left_by_a_crashed_writer_are_recovered(tmp_path):
+    part = tmp_path / "segment-20250101T000000-1-000001.ndjson.part"
+    part.write_bytes(line(1) + line(2) + b'{"orderNo": 3')
+
+    [entry] = OutboundSegmentWriter(str(tmp_path)).recover()
+
+    assert manifest(tmp_path) == [entry]
+    assert entry["recovered"] is True and entry["records"] == 2
+    assert (tmp_path / entry["segment"]).read_bytes() == line(1) + line(2)
+
+
+def test_compressed_segments_left_by_a_crashed_writer_are_recovered_as_complete_streams(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    gzip_part = tmp_path / "segment-20250101T000000-1-000001.ndjson.gz.part"
+    compressor = zlib.compressobj(wbits=31)
+    gzip_part.write_bytes(compressor.compress(line(1) + line(2) + b'{"orderNo"') + compressor.flush(zlib.Z_SYNC_FLUSH))
+    zstd_part = tmp_path / "segment-20250101T000000-1-000002.ndjson.zst.part"
+    with zstandard.ZstdCompressor().stream_writer(open(zstd_part, "wb")) as stream:
+        stream.write(line(3))
+        stream.flush(zstandard.FLUSH_BLOCK)
+        zstd_content = zstd_part.read_bytes()
+    zstd_part.write_bytes(zstd_content)
+
+    gzip_entry, zstd_entry = OutboundSegmentWriter(str(tmp_path)).recover()
+
+    assert gzip_entry["records"] == 2 and zstd_entry["records"] == 1
+    with gzip.open(tmp_path / gzip_entry["segment"]) as segment:
+        assert segment.read() == line(1) + line(2)
+    with zstandard.ZstdDecompressor().stream_reader((tmp_path / zstd_entry["segment"]).read_bytes()) as reader:
+        assert reader.read() == line(3)
+
+
+def test_recovery_leaves_segments_being_opened_and_removes_abandoned_ones(tmp_path):
+    opening = tmp_path / "segment-20250101T000000-1-000001.ndjson.open"
+    opening.write_bytes(b"")
+    abandoned = tmp_path / "segment-20250101T000000-2-000001.ndjson.open"
+    abandoned.write_bytes(b"")
+    os.utime(abandoned, (0, 0))
+    writer = OutboundSegmentWriter(str(tmp_path))
+    writer.append([1], [line(1)])
+
+    OutboundSegmentWriter(str(tmp_path)).recover()
+
+    assert opening.exists() and not abandoned.exists()
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".part")] == [os.path.basename(writer._path)]
+    assert writer.seal()["records"] == 1
+
+
+class FakeTracOsService:
+    def __init__(self):
+        self.synced = []
+
+    async def mark_workorders_synced(self, acks):
+        self.synced.extend(number for number, _ in acks)
+        return len(acks)
+
+
+@pytest.mark.asyncio
+async def test_route_appends_ndjson_and_seals_on_flush(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_OUTBOUND_DIR", str(tmp_path))
+    service = FakeTracOsService()
+    route = CostumerERPRoute(tracos_service=service, outbound_format="ndjson")
+    date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    workorders = [
+        CustomerSystemWorkorderSchema(
+            orderNo=order_no, isActive=True, isCanceled=False, isDeleted=False, isDone=True, isOnHold=False,
+            isPending=False, isSynced=True, summary="Segmented", creationDate=date, lastUpdateDate=date,
+        )
+        for order_no in (1, 2, 3)
+    ]
+
+    results = await route.post_costumer_workorders(workorders)
+    await route.flush_outbound()
+
+    assert all(results) and service.synced == [1, 2, 3]
+    [entry] = manifest(tmp_path)
+    rows = (tmp_path / entry["segment"]).read_bytes().splitlines()
+    assert [json.loads(row)["orderNo"] for row in rows] == [1, 2, 3]
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_acks_are_released_when_their_segment_is_sealed(tmp_path):
+    writer = OutboundSegmentWriter(str(tmp_path), max_records=2, max_age=0)
+
+    writer.append([1, 2, 3], [line(1), line(2), line(3)], acks=["a1", "a2", "a3"])
+    assert writer.take_sealed_acks() == ["a1", "a2"]
+
+    writer.seal()
+    assert writer.take_sealed_acks() == ["a3"]
+    assert writer.take_sealed_acks() == []
+
+
+@pytest.mark.asyncio
+async def test_a_batch_failing_part_way_is_not_acknowledged(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_OUTBOUND_DIR", str(tmp_path))
+    monkeypatch.setenv("OUTBOUND_FSYNC_MODE", "file")
+    monkeypatch.setenv("OUTBOUND_SEGMENT_MAX_RECORDS", "2")
+    service = FakeTracOsService()
+    route = CostumerERPRoute(tracos_service=service, outbound_format="ndjson")
+    writer = route.segment_writer
+    open_segment = writer._open
+
+    def open_once():
+        if writer._counter:
+            raise OSError("disk full")
+        open_segment()
+
+    monkeypatch.setattr(writer, "_open", open_once)
+    date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    workorders = [
+        CustomerSystemWorkorderSchema(
+            orderNo=order_no, isActive=True, isCanceled=False, isDeleted=False, isDone=True, isOnHold=False,
+            isPending=False, isSynced=True, summary="Segmented", creationDate=date, lastUpdateDate=date,
+        )
+        for order_no in (1, 2, 3)
+    ]
+
+    assert await route.post_costumer_workorders(workorders) == [None, None, None]
+    await route.flush_outbound()
+    assert service.synced == []
+
+
+def test_segments_roll_over_by_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.routes.outbound_segments.time.monotonic", lambda: now[0])
+    writer = OutboundSegmentWriter(str(tmp_path), max_age=60)
+
+    writer.append([1], [line(1)])
+    assert writer.seal_if_expired() is None
+    now[0] += 60
+    assert writer.seal_if_expired()["records"] == 1
+
+    writer.append([2], [line(2)])
+    now[0] += 60
+    writer.append([3], [line(3)])
+    writer.seal()
+    assert [entry["records"] for entry in manifest(tmp_path)] == [1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_fsynced_ndjson_acks_wait_for_the_segment_seal(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_OUTBOUND_DIR", str(tmp_path))
+    monkeypatch.setenv("OUTBOUND_FSYNC_MODE", "file")
+    monkeypatch.setenv("OUTBOUND_SEGMENT_MAX_AGE", "0.01")
+    service = FakeTracOsService()
+    route = CostumerERPRoute(tracos_service=service, outbound_format="ndjson")
+    date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    workorder = CustomerSystemWorkorderSchema(
+        orderNo=1, isActive=True, isCanceled=False, isDeleted=False, isDone=True, isOnHold=False,
+        isPending=False, isSynced=True, summary="Segmented", creationDate=date, lastUpdateDate=date,
+    )
+
+    assert await route.post_costumer_workorders([workorder]) == [workorder.model_dump(mode="json")]
+    assert service.synced == []
+
+    await asyncio.sleep(0.01)
+    await route.seal_expired_segment()
+    assert service.synced == [1]
+    assert len(manifest(tmp_path)) == 1
@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from src.pipeline.outbound_watcher import OutboundWatcher
+
+
+class FakeSyncState:
+    def __init__(self, checkpoint=None):
+        self.checkpoints = {"outbound_stream": checkpoint} if checkpoint else {}
+
+    async def get_checkpoint(self, name):
+        return self.checkpoints.get(name)
+
+    async def save_checkpoint(self, name, value):
+        self.checkpoints[name] = value
+
+
+def workorder(number, minute=0):
+    return SimpleNamespace(number=number, updatedAt=datetime(2025, 1, 1, 0, minute, tzinfo=timezone.utc))
+
+
+@pytest.mark.asyncio
+async def test_watcher_coalesces_bursts_of_changes():
+    exported = []
+
+    async def export(tracos_workorder):
+        exported.append((tracos_workorder.number, tracos_workorder.updatedAt.minute))
+        return True
+
+    async def changes():
+        for minute in range(5):
+            yield {"token": minute}, workorder(1, minute)
+            await asyncio.sleep(0.005)
+        yield {"token": 5}, workorder(2)
+
+    sync_state = FakeSyncState()
+    stop_event = asyncio.Event()
+    watcher = OutboundWatcher(tracos_service=None, export=export, sync_state=sync_state, debounce=0.05, max_latency=1)
+    task = asyncio.create_task(watcher.run(stop_event, source=changes()))
+    await asyncio.sleep(0.2)
+    stop_event.set()
+    await task
+
+    assert sorted(exported) == [(1, 4), (2, 0)]
+    assert watcher.exported == 2
+    assert sync_state.checkpoints["outbound_stream"] == {"token": {"token": 5}}
+
+
+@pytest.mark.asyncio
+async def test_watcher_bounds_latency_of_busy_workorders():
+    exported_at = []
+    loop = asyncio.get_running_loop()
+
+    async def export(tracos_workorder):
+        exported_at.append(loop.time())
+        return True
+
+    async def changes():
+        for minute in range(40):
+            yield {"token": minute}, workorder(1, minute)
+            await asyncio.sleep(0.005)
+
+    stop_event = asyncio.Event()
+    watcher = OutboundWatcher(tracos_service=None, export=export, debounce=0.05, max_latency=0.06)
+    started = loop.time()
+    task = asyncio.create_task(watcher.run(stop_event, source=changes()))
+    await asyncio.sleep(0.15)
+    stop_event.set()
+    await task
+
+    assert exported_at, "a continuously changing workorder must still be exported"
+    assert exported_at[0] - started < 0.15
+
+
+@pytest.mark.asyncio
+async def test_watcher_skips_polled_workorders_already_exported():
+    exported = []
+
+    async def export(tracos_workorder):
+        exported.append(tracos_workorder.number)
+        return True
+
+    async def polls():
+        for _ in range(3):
+            yield None, workorder(7)
+            await asyncio.sleep(0.03)
+
+    stop_event = asyncio.Event()
+    sync_state = FakeSyncState()
+    watcher = OutboundWatcher(tracos_service=None, export=export, sync_state=sync_state, debounce=0.01, max_latency=0.02)
+    task = asyncio.create_task(watcher.run(stop_event, source=polls()))
+    await asyncio.sleep(0.15)
+    stop_event.set()
+    await task
+
+    assert exported == [7]
+    assert sync_state.checkpoints == {}
+
+
+@pytest.mark.asyncio
+async def test_watcher_retries_failed_exports_before_moving_the_resume_token_past_them():
+    attempts = []
+
+    async def export(tracos_workorder):
+        attempts.append(tracos_workorder.number)
+        return tracos_workorder.number != 1 or attempts.count(1) > 1
+
+    async def changes():
+        yield {"token": 0}, workorder(1)
+        yield {"token": 1}, workorder(2)
+        await asyncio.Event().wait()
+
+    sync_state = FakeSyncState()
+    stop_event = asyncio.Event()
+    watcher = OutboundWatcher(tracos_service=None, export=export, sync_state=sync_state, debounce=0.01, max_latency=1)
+    task = asyncio.create_task(watcher.run(stop_event, source=changes()))
+    while 2 not in attempts:
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.005)
+    assert sync_state.checkpoints == {}
+
+    await asyncio.sleep(0.1)
+    stop_event.set()
+    await task
+
+    assert attempts.count(1) == 2
+    assert watcher.exported == 2 and watcher.failed == 1
+    assert sync_state.checkpoints["outbound_stream"] == {"token": {"token": 1}}
+
+
+@pytest.mark.asyncio
+async def test_watcher_never_saves_a_resume_token_past_a_failing_export():
+    async def export(tracos_workorder):
+        return tracos_workorder.number != 1
+
+    async def changes():
+        yield {"token": 0}, workorder(1)
+        yield {"token": 1}, workorder(2)
+        await asyncio.Event().wait()
+
+    sync_state = FakeSyncState({"token": "before"})
+    stop_event = asyncio.Event()
+    watcher = OutboundWatcher(tracos_service=None, export=export, sync_state=sync_state, debounce=0.01, max_latency=1)
+    task = asyncio.create_task(watcher.run(stop_event, source=changes()))
+    await asyncio.sleep(0.1)
+    stop_event.set()
+    await task
+
+    assert watcher.exported == 1 and watcher.failed >= 2
+    assert sync_state.checkpoints["outbound_stream"] == {"token": "before"}
@@ -178,3 +178,129 @@ def test_tracos_to_customer_dates_preservation():
  
     assert translated_customer_payload.creationDate.tzinfo == timezone.utc
     assert translated_customer_payload.lastUpdateDate.tzinfo == timezone.utc
+
+
+def test_translate_batch_to_tracos_matches_per_record_translation():
+    payloads = [
+        costumer_payload_schema.model_copy(update={"orderNo": 1, "isDone": True}),
+        costumer_payload_schema.model_copy(update={"orderNo": 2, "isCanceled": True, "isDeleted": True}),
+        costumer_payload_schema.model_copy(update={"orderNo": 3, "isDeleted": True}),
+        costumer_payload_schema.model_copy(update={"orderNo": 4}),
+    ]
+
+    batch = payload_translator.translate_batch_to_tracos(payloads)
+
+    for payload, translated in zip(payloads, batch):
+        expected = payload_translator.from_costumer_to_tracos(payload=payload)
+        if expected is None:
+            assert translated is None
+            continue
+        assert translated.model_dump(exclude={"id"}) == expected.model_dump(exclude={"id"})
+        assert translated.createdAt.tzinfo == timezone.utc
+        assert isinstance(translated.id, ObjectId)
+
+
+def test_translate_batch_to_tracos_columnar():
+    payloads = [
+        costumer_payload_schema.model_copy(update={"orderNo": 1}),
+        costumer_payload_schema.model_copy(update={"orderNo": 2, "isDeleted": True}),
+        costumer_payload_schema.model_copy(update={"orderNo": 3, "isPending": True}),
+    ]
+
+    columns = payload_translator.translate_batch_to_tracos(payloads, columnar=True)
+
+    assert columns["number"] == [1, 3]
+    assert columns["status"] == ["in_progress", "pending"]
+    assert len(columns["_id"]) == 2
+
+
+def test_translate_batch_to_customer_matches_per_record_translation():
+    payloads = [
+        tracos_payload_schema.model_copy(update={"number": number, "status": status})
+        for number, status in enumerate(["pending", "in_progress", "completed", "on_hold", "cancelled"])
+    ]
+
+    batch = payload_translator.translate_batch_to_customer(payloads)
+
+    assert [translated.model_dump() for translated in batch] == [
+        payload_translator.from_tracos_to_costumer(payload=payload).model_dump() for payload in payloads
+    ]
+
+
+def test_content_hash_is_stable_and_detects_changes():
+    same_instant = costumer_payload_schema.model_copy(
+        update={"creationDate": costumer_payload_schema.creationDate.astimezone(timezone.utc)}
+    )
+    changed = costumer_payload_schema.model_copy(update={"summary": "Changed summary"})
+
+    content_hash = payload_translator.content_hash(costumer_payload_schema)
+    assert content_hash == payload_translator.content_hash(same_instant)
+    assert content_hash != payload_translator.content_hash(changed)
+
+    translated = payload_translator.from_costumer_to_tracos(payload=costumer_payload_schema)
+    assert translated.contentHash == content_hash
+
+
+def test_is_unchanged_compares_hash_and_last_update_date():
+    stored = {
+        "contentHash": payload_translator.content_hash(costumer_payload_schema),
+        "updatedAt": costumer_payload_schema.lastUpdateDate.astimezone(timezone.utc).replace(tzinfo=None),
+        "isSynced": True,
+    }
+
+    assert payload_translator.is_unchanged(costumer_payload_schema, stored)
+    assert not payload_translator.is_unchanged(costumer_payload_schema, None)
+    assert not payload_translator.is_unchanged(
+        costumer_payload_schema, {**stored, "contentHash": "something-else"}
+    )
+    assert not payload_translator.is_unchanged(costumer_payload_schema, {**stored, "isSynced": False})
+
+
+def test_workorder_record_round_trips_customer_workorder():
+    payload = costumer_payload_schema.model_copy(
+        update={"isDone": True, "deletedDate": datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)}
+    )
+
+    record = payload_translator.to_record(payload)
+
+    assert not hasattr(record, "__dict__")
+    assert record.flag("isDone") and not record.flag("isPending")
+    assert record.content_hash.hex() == payload_translator.content_hash(payload)
+    restored = record.to_customer()
+    assert restored.model_dump(exclude={"creationDate", "lastUpdateDate", "deletedDate"}) == payload.model_dump(
+        exclude={"creationDate", "lastUpdateDate", "deletedDate"}
+    )
+    assert restored.lastUpdateDate == payload.lastUpdateDate.astimezone(timezone.utc)
+    assert restored.deletedDate == payload.deletedDate
+
+
+def test_record_to_tracos_matches_batch_translation():
+    payloads = [
+        costumer_payload_schema.model_copy(update={"orderNo": 1, "isDone": True}),
+        costumer_payload_schema.model_copy(update={"orderNo": 2, "isCanceled": True, "isDeleted": True}),
+        costumer_payload_schema.model_copy(update={"orderNo": 3, "isDeleted": True}),
+    ]
+
+    documents = [payload_translator.record_to_tracos(payload_translator.to_record(payload)) for payload in payloads]
+    batch = payload_translator.translate_batch_to_tracos(payloads)
+
+    for document, translated in zip(documents, batch):
+        if translated is None:
+            assert document is None
+            continue
+        assert {key: value for key, value in document.items() if key != "_id"} == translated.model_dump(
+            by_alias=True, exclude={"id"}
+        )
+
+
+def test_is_record_unchanged_compares_hash_and_last_update_date():
+    record = payload_translator.to_record(costumer_payload_schema)
+    stored = {
+        "contentHash": payload_translator.content_hash(costumer_payload_schema),
+        "updatedAt": costumer_payload_schema.lastUpdateDate.astimezone(timezone.utc).replace(tzinfo=None),
+        "isSynced": True,
+    }
+
+    assert payload_translator.is_record_unchanged(record, stored)
+    assert not payload_translator.is_record_unchanged(record, {**stored, "contentHash": "something-else"})
+    assert not payload_translator.is_record_unchanged(record, {**stored, "isSynced": False})
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from src.pipeline.pipeline_runner import SKIPPED, PipelineRunner, StageLimiter
+
+
+@pytest.mark.asyncio
+async def test_runner_counts_are_exact_under_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def process(order_no):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        if order_no % 7 == 0:
+            raise RuntimeError("boom")
+        return order_no % 2 == 0
+
+    runner = PipelineRunner(process=process, concurrency=4)
+    summary = await runner.run(range(1, 101))
+
+    expected_failed = len([n for n in range(1, 101) if n % 7 == 0 or n % 2 != 0])
+    assert summary.total == 100
+    assert summary.failed == expected_failed
+    assert summary.successful == 100 - expected_failed
+    assert max_in_flight <= 4
+
+
+@pytest.mark.asyncio
+async def test_runner_accepts_async_iterables():
+    async def order_numbers():
+        for order_no in range(10):
+            yield order_no
+
+    async def process(order_no):
+        return True
+
+    summary = await PipelineRunner(process=process, concurrency=3).run(order_numbers())
+    assert summary.successful == 10
+    assert summary.failed == 0
+
+
+@pytest.mark.asyncio
+async def test_stage_limiter_bounds_stage():
+    limiter = StageLimiter({"mongo": 2})
+    in_flight = 0
+    max_in_flight = 0
+
+    async def process(order_no):
+        nonlocal in_flight, max_in_flight
+        async with limiter.stage("mongo"):
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+        async with limiter.stage("read"):
+            return True
+
+    summary = await PipelineRunner(process=process, concurrency=8).run(range(20))
+    assert summary.successful == 20
+    assert max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_runner_counts_skipped_workorders():
+    async def process(order_no):
+        return SKIPPED if order_no < 3 else True
+
+    summary = await PipelineRunner(process=process, concurrency=2).run(range(5))
+    assert summary.skipped == 3
+    assert summary.successful == 2
+    assert summary.total == 5
+
+
+def test_stage_limits_have_their_own_variables(monkeypatch):
+    monkeypatch.setenv("PIPELINE_MONGO_CONCURRENCY", "8")
+    monkeypatch.setenv("PIPELINE_LIMIT_WRITE", "3")
+
+    limiter = StageLimiter.from_env()
+
+    assert sorted(limiter._semaphores) == ["write"]
+    assert limiter._semaphores["write"]._value == 3
@@ -0,0 +1,101 @@
+import asyncio
+import errno
+
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError, NotPrimaryError
+from src.services.resilience import CircuitBreaker, Resilience, RetryPolicy, is_transient_error
+
+
+class Flaky:
+    """Fails with the given errors, then returns "ok"."""
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def fast_policy(max_attempts=4, timeout=None):
+    return RetryPolicy(max_attempts=max_attempts, base_delay=0.001, max_delay=0.001, timeout=timeout)
+
+
+def test_transient_error_classification():
+    assert is_transient_error(AutoReconnect("primary stepped down"))
+    assert is_transient_error(NotPrimaryError("not primary"))
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(OSError(errno.EAGAIN, "Resource temporarily unavailable"))
+    assert not is_transient_error(OSError(errno.ENOSPC, "No space left on device"))
+    assert not is_transient_error(DuplicateKeyError("duplicate key"))
+    assert not is_transient_error(ValueError("bad payload"))
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_and_counted():
+    resilience = Resilience("mongo", fast_policy())
+    operation = Flaky(AutoReconnect("election"), NotPrimaryError("not primary"))
+
+    assert await resilience.call("upsert", operation) == "ok"
+    assert operation.calls == 3
+    assert resilience.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_exhausted_retries_are_raised():
+    resilience = Resilience("mongo", fast_policy(max_attempts=2))
+    permanent = Flaky(DuplicateKeyError("duplicate key"))
+    with pytest.raises(DuplicateKeyError):
+        await resilience.call("insert", permanent)
+    assert permanent.calls == 1
+
+    transient = Flaky(AutoReconnect("down"), AutoReconnect("down"), AutoReconnect("down"))
+    with pytest.raises(AutoReconnect):
+        await resilience.call("insert", transient)
+    assert transient.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_operations_time_out_and_are_retried():
+    calls = 0
+
+    async def slow_then_fast():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)
+        return "ok"
+
+    resilience = Resilience("mongo", fast_policy(timeout=0.05))
+    assert await resilience.call("find", slow_then_fast) == "ok"
+    assert resilience.retries == 1
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_pauses_callers_then_probes():
+    breaker = CircuitBreaker("mongo", failure_threshold=2, reset_timeout=0.1)
+    resilience = Resilience("mongo", fast_policy(max_attempts=2), breaker)
+
+    with pytest.raises(AutoReconnect):
+        await resilience.call("upsert", Flaky(AutoReconnect("down"), AutoReconnect("down")))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await resilience.call("upsert", Flaky()) == "ok"
+    assert loop.time() - started >= 0.09
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker("disk", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    await breaker.acquire()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+from src.pipeline.sharding import Shard, run_shards
+
+
+def owned_orders(order_numbers, shard):
+    return shard.index, os.getpid(), [order_no for order_no in order_numbers if shard.owns(order_no)]
+
+
+def test_shards_partition_order_numbers():
+    shards = [Shard(index, 4) for index in range(4)]
+    for order_no in range(100):
+        assert sum(shard.owns(order_no) for shard in shards) == 1
+    with pytest.raises(ValueError):
+        Shard(4, 4)
+
+
+@pytest.mark.asyncio
+async def test_run_shards_runs_every_shard_in_its_own_process():
+    results = await run_shards(owned_orders, list(range(20)), 3)
+
+    assert [index for index, _, _ in results] == [0, 1, 2]
+    assert all(pid != os.getpid() for _, pid, _ in results)
+    processed = sorted(order_no for _, _, orders in results for order_no in orders)
+    assert processed == list(range(20))
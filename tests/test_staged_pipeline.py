@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from src.pipeline.pipeline_runner import SKIPPED
+from src.pipeline.staged_pipeline import Stage, StagedPipeline
+
+
+@pytest.mark.asyncio
+async def test_items_flow_through_every_stage_in_batches():
+    batch_sizes = []
+
+    async def double(batch, summary):
+        await asyncio.sleep(0)
+        return [item * 2 for item in batch]
+
+    async def skip_odd_multiples(batch, summary):
+        forwarded = []
+        for item in batch:
+            if item % 3 == 0:
+                summary.record(SKIPPED)
+            else:
+                forwarded.append(item)
+        return forwarded
+
+    async def sink(batch, summary):
+        batch_sizes.append(len(batch))
+        for _ in batch:
+            summary.record(True)
+
+    pipeline = StagedPipeline([
+        Stage("double", double, concurrency=4),
+        Stage("filter", skip_odd_multiples, batch_size=10),
+        Stage("sink", sink, batch_size=25),
+    ])
+    summary = await pipeline.run(range(1, 101))
+
+    assert summary.total == 100
+    assert summary.skipped == len([n for n in range(1, 101) if n % 3 == 0])
+    assert summary.successful == 100 - summary.skipped
+    assert max(batch_sizes) <= 25
+
+
+@pytest.mark.asyncio
+async def test_stage_concurrency_is_bounded_and_batches_fill_under_load():
+    in_flight = 0
+    max_in_flight = 0
+    batch_sizes = []
+
+    async def slow_writer(batch, summary):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        batch_sizes.append(len(batch))
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        for _ in batch:
+            summary.record(True)
+
+    async def order_numbers():
+        for order_no in range(200):
+            yield order_no
+
+    pipeline = StagedPipeline([Stage("write", slow_writer, concurrency=2, batch_size=50)])
+    summary = await pipeline.run(order_numbers())
+
+    assert summary.successful == 200
+    assert max_in_flight <= 2
+    assert max(batch_sizes) == 50
+
+
+@pytest.mark.asyncio
+async def test_failing_batches_are_counted_and_reported():
+    reported = []
+
+    async def upsert(batch, summary):
+        if 7 in batch:
+            raise RuntimeError("bulk write failed")
+        return batch
+
+    async def on_error(batch, error):
+        reported.extend((item, str(error)) for item in batch)
+
+    async def sink(batch, summary):
+        for _ in batch:
+            summary.record(True)
+
+    pipeline = StagedPipeline([
+        Stage("mongo", upsert, batch_size=1, on_error=on_error, number_of=int),
+        Stage("write", sink),
+    ])
+    summary = await pipeline.run(range(10))
+
+    assert summary.failed == 1 and summary.successful == 9
+    assert summary.failed_numbers == {7}
+    assert reported == [(7, "bulk write failed")]
+
+
+@pytest.mark.asyncio
+async def test_failing_batch_only_fails_the_items_not_recorded_yet():
+    reported = []
+
+    async def write(batch, summary):
+        for item in batch:
+            if item == 3:
+                raise RuntimeError("disk full")
+            summary.record(True, item)
+        return ()
+
+    async def on_error(items, error):
+        reported.extend(items)
+
+    pipeline = StagedPipeline([Stage("write", write, batch_size=5, on_error=on_error)])
+    summary = await pipeline.run(range(5))
+
+    assert summary.total == 5
+    assert summary.successful == 3 and summary.failed == 2
+    assert summary.failed_numbers == {3, 4}
+    assert reported == [3, 4]
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+import pytest
+from src.services.sync_ack_buffer import SyncAckBuffer
+
+UPDATED_AT = datetime(2025, 1, 1)
+
+
+class FakeTracOsService:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def mark_workorders_synced(self, acks):
+        if self.fail:
+            return None
+        self.calls.append([number for number, _ in acks])
+        return len(acks)
+
+
+@pytest.mark.asyncio
+async def test_ack_buffer_flushes_by_size_and_on_close():
+    service = FakeTracOsService()
+    async with SyncAckBuffer(service, max_size=3, flush_interval=60) as buffer:
+        for number in range(1, 8):
+            await buffer.add(number, UPDATED_AT)
+        assert service.calls == [[1, 2, 3], [4, 5, 6]]
+    assert service.calls == [[1, 2, 3], [4, 5, 6], [7]]
+
+
+@pytest.mark.asyncio
+async def test_ack_buffer_flushes_on_interval():
+    service = FakeTracOsService()
+    async with SyncAckBuffer(service, max_size=100, flush_interval=0.01) as buffer:
+        await buffer.add(1, UPDATED_AT)
+        await buffer.add(2, UPDATED_AT)
+        await asyncio.sleep(0.05)
+        assert service.calls == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_ack_buffer_keeps_numbers_when_flush_fails():
+    service = FakeTracOsService(fail=True)
+    buffer = SyncAckBuffer(service, max_size=2, flush_interval=60)
+    await buffer.add(1, UPDATED_AT)
+    await buffer.add(2, UPDATED_AT)
+
+    service.fail = False
+    await buffer.close()
+    assert service.calls == [[1, 2]]
+
+
+class CountingFailingService(FakeTracOsService):
+    def __init__(self):
+        super().__init__(fail=True)
+        self.attempts = 0
+
+    async def mark_workorders_synced(self, acks):
+        self.attempts += 1
+        return await super().mark_workorders_synced(acks)
+
+
+@pytest.mark.asyncio
+async def test_ack_buffer_backs_off_after_a_failed_flush():
+    service = CountingFailingService()
+    buffer = SyncAckBuffer(service, max_size=2, flush_interval=60)
+    for number in range(1, 11):
+        await buffer.add(number, UPDATED_AT)
+    assert service.attempts == 1
+
+    service.fail = False
+    await buffer.close()
+    assert service.calls == [list(range(1, 11))]
+
+
+@pytest.mark.asyncio
+async def test_ack_buffer_holds_writers_once_full():
+    service = CountingFailingService()
+    buffer = SyncAckBuffer(service, max_size=2, flush_interval=0.01, max_pending=4)
+    for number in range(1, 5):
+        await buffer.add(number, UPDATED_AT)
+
+    blocked = asyncio.create_task(buffer.add(5, UPDATED_AT))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    assert len(buffer._pending) == 4
+
+    service.fail = False
+    await asyncio.wait_for(blocked, 1)
+    await buffer.close()
+    assert service.calls == [[1, 2, 3, 4], [5]]
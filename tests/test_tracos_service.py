@@ -1,8 +1,11 @@
 import pytest
 from datetime import datetime, timezone
 from bson import ObjectId
-from src.services.tracos_service import TracOsService
+from src.services.tracos_service import TracOsService, find_collection_scans
 from src.schemas.tracos_schema import TracOSWorkorderSchema
+from src.services.workorder_cache import WorkorderCache
+from src.services.resilience import Resilience, RetryPolicy
+from pymongo.errors import AutoReconnect
 
 @pytest.fixture
 async def tracos_service():
@@ -58,3 +61,248 @@ async def test_update_nonexistent_workorder(tracos_service):
     # Try to update a workorder that doesn't exist
     result = await tracos_service.update_workorder(99999)
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_workorders_inserts_and_matches(tracos_service, sample_workorder):
+    workorders = [
+        sample_workorder.model_copy(update={"id": ObjectId(), "number": number})
+        for number in range(1, 6)
+    ]
+
+    results = await tracos_service.bulk_upsert_workorders(workorders, batch_size=2)
+    assert [result.number for result in results] == [1, 2, 3, 4, 5]
+    assert all(result.status == "inserted" for result in results)
+
+    results = await tracos_service.bulk_upsert_workorders(workorders[:2], batch_size=2)
+    assert all(result.status == "matched" for result in results)
+
+    changed = [workorders[0].model_copy(update={"description": "Changed description"}), workorders[1]]
+    results = await tracos_service.bulk_upsert_workorders(changed)
+    assert [result.status for result in results] == ["matched", "matched"]
+
+    db_workorder = await tracos_service.get_workorder_by_number(1)
+    assert db_workorder.description == "Changed description"
+    assert db_workorder.id == workorders[0].id
+    assert await tracos_service.collection.count_documents({}) == 5
+
+
+@pytest.mark.asyncio
+async def test_mark_workorders_synced(tracos_service, sample_workorder):
+    workorders = [
+        sample_workorder.model_copy(update={"id": ObjectId(), "number": number})
+        for number in range(1, 4)
+    ]
+    await tracos_service.bulk_upsert_workorders(workorders)
+
+    modified = await tracos_service.mark_workorders_synced(
+        [(1, workorders[0].updatedAt), (3, workorders[2].updatedAt)]
+    )
+    assert modified == 2
+
+    assert (await tracos_service.get_workorder_by_number(1)).isSynced is True
+    assert (await tracos_service.get_workorder_by_number(2)).isSynced is False
+    assert (await tracos_service.get_workorder_by_number(3)).syncedAt is not None
+
+
+@pytest.mark.asyncio
+async def test_mark_workorders_synced_skips_versions_upserted_after_the_export(tracos_service, sample_workorder):
+    exported = sample_workorder.model_copy(update={"number": 1})
+    await tracos_service.upsert_workorder(exported)
+    newer = exported.model_copy(update={"id": ObjectId(), "updatedAt": datetime(2030, 1, 1, tzinfo=timezone.utc)})
+    await tracos_service.upsert_workorder(newer)
+
+    modified = await tracos_service.mark_workorders_synced([(1, exported.updatedAt)])
+
+    assert modified == 0
+    assert (await tracos_service.collection.find_one({"number": 1}))["isSynced"] is False
+
+
+@pytest.mark.asyncio
+async def test_iter_unsynced_workorders_streams_in_id_order(tracos_service, sample_workorder):
+    workorders = [
+        sample_workorder.model_copy(update={"id": ObjectId(), "number": number})
+        for number in range(1, 6)
+    ]
+    await tracos_service.bulk_upsert_workorders(workorders)
+    await tracos_service.mark_workorders_synced([(number, workorders[number - 1].updatedAt) for number in (2, 4)])
+
+    streamed = [
+        workorder async for workorder in tracos_service.iter_unsynced_workorders(batch_size=2)
+    ]
+    assert [workorder.number for workorder in streamed] == [1, 3, 5]
+    assert all(workorder.isSynced is False for workorder in streamed)
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes(tracos_service):
+    names = await tracos_service.ensure_indexes()
+    assert set(names) == {"number_unique", "unsynced_queue", "updated_at"}
+
+    indexes = await tracos_service.collection.index_information()
+    assert indexes["number_unique"]["unique"] is True
+
+
+def test_find_collection_scans():
+    indexed_plan = {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+    scan_plan = {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+    sbe_plan = {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}}}
+
+    assert find_collection_scans(indexed_plan) == []
+    assert find_collection_scans(scan_plan) == ["COLLSCAN"]
+    assert find_collection_scans(sbe_plan) == ["COLLSCAN"]
+
+
+@pytest.mark.asyncio
+async def test_upsert_workorder_updates_existing_number(tracos_service, sample_workorder):
+    await tracos_service.ensure_indexes()
+    assert await tracos_service.upsert_workorder(sample_workorder) is not None
+
+    changed = sample_workorder.model_copy(update={"id": ObjectId(), "title": "Changed title"})
+    stored = await tracos_service.upsert_workorder(changed)
+    assert stored.id == sample_workorder.id
+    assert stored.title == "Changed title"
+
+    db_workorder = await tracos_service.get_workorder_by_number(sample_workorder.number)
+    assert db_workorder.title == "Changed title"
+    assert db_workorder.id == sample_workorder.id
+    assert await tracos_service.collection.count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_serves_reads_after_writes_and_invalidates_on_update(sample_workorder):
+    service = TracOsService(cache=WorkorderCache(max_size=10))
+    try:
+        await service.upsert_workorder(sample_workorder)
+        cached = await service.get_workorder_by_number(sample_workorder.number)
+        fingerprints = await service.get_sync_fingerprints([sample_workorder.number])
+        assert service.cache.hits == 2 and service.cache.misses == 0
+        assert cached.isSynced is False
+        assert fingerprints[sample_workorder.number]["contentHash"] == sample_workorder.contentHash
+        assert fingerprints[sample_workorder.number]["isSynced"] is False
+
+        await service.update_workorder(sample_workorder.number)
+        updated = await service.get_workorder_by_number(sample_workorder.number)
+        assert updated.isSynced is True
+        assert service.cache.misses == 1
+    finally:
+        await service.collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_read_racing_mark_synced_does_not_leave_a_stale_cached_copy(sample_workorder):
+    service = TracOsService(cache=WorkorderCache(max_size=10))
+    bulk_write = service.collection.bulk_write
+
+    async def bulk_write_after_a_racing_read(*args, **kwargs):
+        await service.get_workorder_by_number(sample_workorder.number)
+        return await bulk_write(*args, **kwargs)
+
+    try:
+        await service.upsert_workorder(sample_workorder)
+        service.collection.bulk_write = bulk_write_after_a_racing_read
+        await service.mark_workorders_synced([(sample_workorder.number, sample_workorder.updatedAt)])
+
+        assert service.cache.get(sample_workorder.number) is None
+        assert (await service.get_workorder_by_number(sample_workorder.number)).isSynced is True
+    finally:
+        await service.collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_accepts_plain_documents(tracos_service, sample_workorder):
+    document = sample_workorder.model_dump(by_alias=True)
+
+    results = await tracos_service.bulk_upsert_workorders([document])
+
+    assert [result.status for result in results] == ["inserted"]
+    stored = await tracos_service.get_workorder_by_number(sample_workorder.number)
+    assert stored.title == sample_workorder.title
+
+
+class SteppingDownCollection:
+    """Collection whose first `failures` upserts hit a primary stepping down."""
+    def __init__(self, collection, failures):
+        self.collection = collection
+        self.failures = failures
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("primary stepped down")
+        return await self.collection.find_one_and_update(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_upsert_retries_through_a_primary_election(sample_workorder):
+    resilience = Resilience("mongo", RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001))
+    service = TracOsService(resilience=resilience)
+    collection = service.collection
+    service.collection = SteppingDownCollection(collection, failures=2)
+    try:
+        assert await service.upsert_workorder(sample_workorder) is not None
+        assert resilience.retries == 2
+        assert await collection.count_documents({"number": sample_workorder.number}) == 1
+    finally:
+        await collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_get_workorders_by_numbers_reads_a_batch_with_one_find(tracos_service, sample_workorder):
+    second = sample_workorder.model_copy(update={"id": ObjectId(), "number": 12346})
+    await tracos_service.bulk_upsert_workorders([sample_workorder, second])
+
+    workorders = await tracos_service.get_workorders_by_numbers([12345, 12346, 99999])
+
+    assert sorted(workorders) == [12345, 12346]
+    assert workorders[12346].title == sample_workorder.title
+
+
+@pytest.mark.asyncio
+async def test_upsert_returns_and_caches_the_stored_workorder(sample_workorder):
+    service = TracOsService(cache=WorkorderCache(max_size=10))
+    try:
+        await service.upsert_workorder(sample_workorder)
+        changed = sample_workorder.model_copy(update={"id": ObjectId(), "title": "Changed title"})
+        stored = await service.upsert_workorder(changed)
+
+        assert (await service.get_workorder_by_number(sample_workorder.number)).model_dump() == stored.model_dump()
+        assert service.cache.hits == 1 and service.cache.misses == 0
+        verified = await service.verify_workorders([stored])
+        assert verified[sample_workorder.number].model_dump() == stored.model_dump()
+    finally:
+        await service.collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_verification_accepts_bulk_updated_workorders_with_their_stored_id(sample_workorder, caplog):
+    service = TracOsService(verify_sample_rate=1.0)
+    try:
+        await service.bulk_upsert_workorders([sample_workorder])
+        changed = sample_workorder.model_copy(update={"id": ObjectId(), "title": "Changed title"})
+        results = await service.bulk_upsert_workorders([changed])
+        assert results[0].status == "matched"
+
+        with caplog.at_level("WARNING"):
+            verified = await service.verify_workorders(service.sample_for_verification([changed]))
+
+        assert verified[changed.number].id == sample_workorder.id
+        assert verified[changed.number].title == "Changed title"
+        assert "differs from the upserted one" not in caplog.text
+    finally:
+        await service.collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_verification_samples_and_reports_missing_workorders(tracos_service, sample_workorder):
+    stored = await tracos_service.upsert_workorder(sample_workorder)
+    assert tracos_service.sample_for_verification([stored]) == []
+
+    sampling_service = TracOsService(verify_sample_rate=1.0)
+    assert sampling_service.sample_for_verification([stored]) == [stored]
+
+    await tracos_service.collection.delete_many({})
+    assert await sampling_service.verify_workorders([stored]) == {}
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from src.schemas.tracos_schema import TracOSWorkorderSchema
+from src.services.workorder_cache import WorkorderCache, as_stored
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_workorder(number):
+    return TracOSWorkorderSchema(
+        _id=ObjectId(),
+        number=number,
+        status="pending",
+        title=f"Workorder {number}",
+        description="cached",
+        createdAt=datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+        updatedAt=datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+    )
+
+
+def test_cache_evicts_least_recently_used():
+    cache = WorkorderCache(max_size=2, ttl=0)
+    for number in (1, 2):
+        cache.put(make_workorder(number))
+    assert cache.get(1).number == 1
+    cache.put(make_workorder(3))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "evictions": 1, "expirations": 0}
+
+
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = WorkorderCache(max_size=10, ttl=5, clock=clock)
+    cache.put(make_workorder(1))
+    clock.now = 4.9
+    assert cache.get(1) is not None
+    clock.now = 5.0
+    assert cache.get(1) is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_cache_invalidation_and_size_validation():
+    cache = WorkorderCache(max_size=10)
+    for number in (1, 2, 3):
+        cache.put(make_workorder(number))
+    cache.invalidate(1)
+    cache.invalidate_many([2, 99])
+    assert [cache.get(number) is not None for number in (1, 2, 3)] == [False, False, True]
+    with pytest.raises(ValueError):
+        WorkorderCache(max_size=0)
+
+
+def test_as_stored_matches_mongodb_datetimes():
+    stored = as_stored(make_workorder(1), isSynced=True)
+    assert stored.updatedAt == datetime(2025, 1, 1, 12, 0, 0, 123000)
+    assert stored.isSynced is True